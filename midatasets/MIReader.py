@@ -1,5 +1,7 @@
+import asyncio
 import logging
 import os
+import time
 from pathlib import Path
 from typing import Optional, Callable, Union, Tuple, Dict, List
 
@@ -9,25 +11,48 @@ import yaml
 from loguru import logger
 import nibabel as nib
 from midatasets import configs
-from midatasets.s3 import check_exists_s3, upload_file
+from midatasets.s3 import (
+    check_exists_s3,
+    upload_file,
+    acheck_exists_s3,
+    adownload_file,
+    aupload_file,
+)
 from midatasets.storage_backends import (
     DatasetLocalBackend,
     DatasetS3Backend,
     get_backend,
 )
+from midatasets.utils import IMAGE_EXTENSIONS
 
 try:
     import SimpleITK as sitk
     import midatasets.preprocessing
     from midatasets.preprocessing import (
         sitk_resample,
+        sitk_resample_labelmap,
+        sitk_resample_to_file,
+        LABEL_INTERPOLATORS,
         extract_vol_at_label,
         normalise_zero_one,
     )
     import midatasets.visualise as vis
     import numpy as np
     from joblib import Parallel, delayed
-    from midatasets.utils import printProgressBar, get_spacing_dirname
+    from midatasets.utils import (
+        printProgressBar,
+        get_spacing_dirname,
+        get_threads_per_worker,
+        write_image,
+        get_image_extension,
+        replace_image_extension,
+    )
+    from midatasets.slices import (
+        SliceStore,
+        is_slice_store,
+        write_case_slices,
+        write_index,
+    )
 except ImportError as e:
     sitk = None
 
@@ -40,7 +65,7 @@ class MIReaderBase:
         is_cropped: bool = False,
         crop_size: int = 64,
         dir_path: Optional[str] = None,
-        ext: str = (".nii.gz",),
+        ext: Tuple[str, ...] = IMAGE_EXTENSIONS,
         label: Optional[str] = None,
         images_only: bool = False,
         label_mappings: Optional[Dict[str, Dict]] = None,
@@ -50,8 +75,17 @@ class MIReaderBase:
         remote_backend: Optional[Union[Callable, str]] = DatasetS3Backend,
         fail_on_error: bool = False,
         dropna: bool = True,
+        output_ext: Optional[str] = None,
+        output_compression_level: Optional[int] = None,
         **kwargs,
     ):
+        """
+        :param ext: extensions of the image files to list
+        :param output_ext: format of derived outputs (resampled images, crops), one of `IMAGE_EXTENSIONS`;
+            defaults to `configs.output_ext`. Can also be set per dataset in `dataset.yaml`
+        :param output_compression_level: compression level of derived outputs; None keeps the format default
+            (see `utils.write_image`), defaults to `configs.output_compression_level`
+        """
 
         self.label_mappings = label_mappings or {}
         # make sure they are ints
@@ -71,6 +105,12 @@ class MIReaderBase:
         self.is_cropped = is_cropped
         self.crop_size = crop_size
         self.ext = ext
+        self.output_ext = output_ext or configs.output_ext
+        self.output_compression_level = (
+            output_compression_level
+            if output_compression_level is not None
+            else configs.output_compression_level
+        )
         self.dropna = dropna
         self.label = label
         self.image_key = "image"
@@ -83,6 +123,7 @@ class MIReaderBase:
         self.remote_profile = remote_profile
         self.remote_prefix = remote_prefix
         self._valid_keys = None
+        self._label_stats_cache: Dict[str, Tuple[float, Dict]] = {}
         self._deprecated_check(**kwargs)
 
         self.local_backend = DatasetLocalBackend(root_path=self.dir_path)
@@ -91,6 +132,10 @@ class MIReaderBase:
         if metadata:
             self.__dict__.update(metadata)
             logger.info("Overrode parameters using local dataset.yaml")
+        if self.output_ext not in IMAGE_EXTENSIONS:
+            raise ValueError(
+                f"output_ext {self.output_ext} not in {IMAGE_EXTENSIONS}"
+            )
 
         if spacing is None:
             raise Exception("spacing cannot be None")
@@ -370,7 +415,7 @@ class MIReaderBase:
             return os.path.join(self.dir_path, subpath)
 
     def get_image_name(self, img_idx: int):
-        return self.dataframe.index[img_idx:int]
+        return self.dataframe.index[img_idx]
 
     def get_image_path(self, img_idx: int, key: Optional[str] = None):
         key = key or self.image_key
@@ -498,6 +543,28 @@ class MIReaderExtended(MIReaderBase):
         data["spacing"] = reader.GetSpacing()
         return data
 
+    def get_label_stats(self, img_idx, labelmap: Optional["np.ndarray"] = None):
+        """
+        bounding boxes, voxel counts and centroids of all labels in a case's labelmap,
+        cached per labelmap path and invalidated when the file changes
+        :param img_idx: index or name of the case
+        :param labelmap: already loaded labelmap, avoids reading it again on a cache miss
+        :return: dict of label -> {"slices", "count", "centroid"}
+        """
+        if type(img_idx) is int:
+            path = self.get_image_path(img_idx, key=self.labelmap_key)
+        else:
+            path = self.dataframe.loc[img_idx, f"{self.labelmap_key}_path"]
+        mtime = os.path.getmtime(path)
+        cached = self._label_stats_cache.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        if labelmap is None:
+            labelmap = self._load_image(path)
+        stats = midatasets.preprocessing.compute_label_stats(labelmap)
+        self._label_stats_cache[path] = (mtime, stats)
+        return stats
+
     def extract_random_subvolume(self, img_idx, subvol_size, num):
 
         return midatasets.preprocessing.extract_random_example_array(
@@ -527,75 +594,87 @@ class MIReaderExtended(MIReaderBase):
     def extract_all_slices(self, img_idx, label=None, step=2, dim=0, is_tight=False):
         I = self.load_image(img_idx)
         L = self.load_labelmap(img_idx)
+        stats = self.get_label_stats(img_idx, labelmap=L) if label else None
         return midatasets.preprocessing.extract_all_slices_at_label(
-            I, L, label, step, dim, is_tight
+            I, L, label, step, dim, is_tight, stats=stats
         )
 
     def extract_mid_slices(self, img_idx, label=None, offset=0, is_tight=False):
         I = self.load_image(img_idx)
+        stats = None
         if label is None:
             L = []
         else:
             L = self.load_labelmap(img_idx)
+            stats = self.get_label_stats(img_idx, labelmap=L)
         return midatasets.preprocessing.extract_alldims_mid_slices_at_label(
-            I, L, label, offset, is_tight
+            I, L, label, offset, is_tight, stats=stats
         )
 
-    def export_2d_slices(self, out_path=None, label=1, step=5):
-        allimages = []
-        alllabelmaps = []
-        if out_path is None:
-            out_path = self.dir_path
-
-        for img_idx in range(len(self)):
-            printProgressBar(
-                img_idx, len(self) - 1, prefix="Progress:", suffix="Complete", length=50
-            )
-            name = self.get_image_name(img_idx)
-            (images, labelmaps) = self.extract_all_slices(
-                img_idx, label=label, step=step
-            )
-            allimages += images
-            alllabelmaps += labelmaps
-
-        if not os.path.exists(out_path):
-            os.mkdir(out_path)
+    def _get_2d_slices_path(self, label, out_path=None):
         s = self.spacing
         try:
             s = s[0]
         except:
             pass
-        np.savez_compressed(
-            os.path.join(
-                out_path,
-                self.name
-                + "_label"
-                + str(label)
-                + "_spacing"
-                + str(s)
-                + "_2dslices.npz",
-            ),
-            images=allimages,
-            labelmaps=alllabelmaps,
+        return os.path.join(
+            out_path or self.dir_path,
+            self.name + "_label" + str(label) + "_spacing" + str(s) + "_2dslices",
         )
 
-    def load2d_slices(self, label):
-        s = self.spacing
-        try:
-            s = s[0]
-        except:
-            pass
-        path = os.path.join(
-            self.dir_path,
-            self.name + "_label" + str(label) + "_spacing" + str(s) + "_2dslices.npz",
-        )
-        if os.path.exists(path):
-            slices = np.load(path)
+    def export_2d_slices(
+        self,
+        out_path=None,
+        label=1,
+        step=5,
+        parallel: bool = True,
+        num_workers: int = -1,
+    ):
+        """
+        export 2D slices through `label` to a slice store on disk. Slices are written per case as they are
+        extracted, so memory is bounded by a single case rather than the whole dataset.
+        :return: path to the slice store, readable with `load2d_slices`
+        """
+        store_path = self._get_2d_slices_path(label, out_path)
+        Path(store_path).mkdir(parents=True, exist_ok=True)
+        tasks = [
+            dict(
+                store_path=store_path,
+                name=name,
+                image_path=self.get_image_path(i),
+                labelmap_path=self.get_image_path(i, key=self.labelmap_key),
+                label=label,
+                step=step,
+            )
+            for i, name in enumerate(self.get_image_names())
+        ]
+        if parallel:
+            counts = Parallel(n_jobs=num_workers)(
+                delayed(_export_case_2d_slices)(**task) for task in tasks
+            )
         else:
+            counts = []
+            for i, task in enumerate(tasks):
+                printProgressBar(
+                    i + 1, len(tasks), prefix="Progress:", suffix="Complete", length=50
+                )
+                counts.append(_export_case_2d_slices(**task))
+
+        write_index(store_path, dict(zip(self.get_image_names(), counts)))
+        return store_path
+
+    def load2d_slices(self, label):
+        """
+        lazily load the 2D slices exported by `export_2d_slices`, exporting them first if needed
+        :return: SliceStore; `store[i]` gives an (image, labelmap) pair and `store["images"]` a lazy view
+        """
+        path = self._get_2d_slices_path(label)
+        if os.path.exists(path + ".npz"):
+            return np.load(path + ".npz")
+        if not is_slice_store(path):
             logger.info("{} does not exist. Extracting...".format(path))
             self.export_2d_slices(self.dir_path, label)
-            slices = np.load(path)
-        return slices
+        return SliceStore(path)
 
     def generate_resampled(
         self,
@@ -607,9 +686,32 @@ class MIReaderExtended(MIReaderBase):
         overwrite: bool = False,
         cast8bit: bool = False,
         names: Optional[List[str]] = None,
+        num_threads: Optional[int] = None,
+        labelmap_mode: str = "nearest",
+        slab_size: Optional[int] = None,
+        output_ext: Optional[str] = None,
+        compression_level: Optional[int] = None,
     ):
+        """
+        resample images to `spacing`, either isotropic or per axis (e.g. [0.8, 0.8, 3])
+        :param num_threads: SimpleITK threads per resampling; defaults to splitting the CPUs between workers
+            when `parallel` is set
+        :param labelmap_mode: labelmap interpolation, one of "nearest", "linear" or "gaussian"
+            (see `sitk_resample_labelmap`)
+        :param slab_size: if set, resample out-of-core in slabs of this many output slices, streaming to disk
+            (see `sitk_resample_to_file`), to bound memory for very large volumes. Only used for NIfTI outputs
+            and not with `cast8bit`.
+        :param output_ext: format of the resampled images; defaults to the reader's `output_ext`
+        :param compression_level: compression level of the resampled images; defaults to the reader's
+            `output_compression_level`
+        """
+        output_ext = output_ext or self.output_ext
+        if compression_level is None:
+            compression_level = self.output_compression_level
         if names:
             names = set(names)
+        if num_threads is None and parallel:
+            num_threads = get_threads_per_worker(num_workers)
 
         if from_spacing is None:
             from_spacing = self.spacing
@@ -629,12 +731,15 @@ class MIReaderExtended(MIReaderBase):
 
                     if image_types and image_type not in image_types:
                         continue
-                    if not isinstance(path, str) or not path.endswith(".nii.gz"):
+                    if not isinstance(path, str) or get_image_extension(path) is None:
                         continue
-                    output_path = path.replace(
-                        get_spacing_dirname(src_spacing),
-                        ("8bit" if cast8bit else "")
-                        + get_spacing_dirname(target_spacing),
+                    output_path = replace_image_extension(
+                        path.replace(
+                            get_spacing_dirname(src_spacing),
+                            ("8bit" if cast8bit else "")
+                            + get_spacing_dirname(target_spacing),
+                        ),
+                        output_ext,
                     )
                     if Path(output_path).exists() and not overwrite:
                         logger.info(
@@ -642,24 +747,48 @@ class MIReaderExtended(MIReaderBase):
                         )
                         continue
                     Path(output_path).parent.mkdir(exist_ok=True, parents=True)
+                    if (
+                        slab_size
+                        and not cast8bit
+                        and output_ext in (".nii", ".nii.gz")
+                    ):
+                        logger.info(
+                            f"[{image_type}/{Path(output_path).name}] resampling out-of-core "
+                            f"to {target_spacing} in slabs of {slab_size}"
+                        )
+                        sitk_resample_to_file(
+                            path,
+                            output_path,
+                            spacing,
+                            interpolation=sitk.sitkLinear
+                            if "image" in image_type
+                            else LABEL_INTERPOLATORS[labelmap_mode],
+                            slab_size=slab_size,
+                            compression_level=compression_level,
+                        )
+                        continue
                     sitk_image = sitk.ReadImage(path)
-                    interpolation = (
-                        sitk.sitkLinear
-                        if "image" in image_type
-                        else sitk.sitkNearestNeighbor
-                    )
                     interpolation_str = (
-                        "sitk.sitkLinear"
-                        if "image" in image_type
-                        else "sitk.sitkNearestNeighbor"
+                        "sitk.sitkLinear" if "image" in image_type else labelmap_mode
                     )
                     logger.info(
                         f"[{image_type}/{Path(output_path).name}] resampling from {sitk_image.GetSpacing()} "
                         f"to {target_spacing} using {interpolation_str}"
                     )
-                    sitk_image: sitk.Image = sitk_resample(
-                        sitk_image, spacing, interpolation=interpolation
-                    )
+                    if "image" in image_type:
+                        sitk_image: sitk.Image = sitk_resample(
+                            sitk_image,
+                            spacing,
+                            interpolation=sitk.sitkLinear,
+                            num_threads=num_threads,
+                        )
+                    else:
+                        sitk_image: sitk.Image = sitk_resample_labelmap(
+                            sitk_image,
+                            spacing,
+                            mode=labelmap_mode,
+                            num_workers=num_threads,
+                        )
                     if cast8bit:
                         img = sitk.GetArrayFromImage(sitk_image)
                         img = (255 * normalise_zero_one(img)).astype("uint8")
@@ -670,7 +799,9 @@ class MIReaderExtended(MIReaderBase):
 
                         sitk_image = sitk_output
 
-                    sitk.WriteImage(sitk_image, output_path)
+                    write_image(
+                        sitk_image, output_path, compression_level=compression_level
+                    )
                 except:
                     logger.exception(f"{image_type}: {path}")
 
@@ -683,89 +814,119 @@ class MIReaderExtended(MIReaderBase):
         else:
             [resample(paths, from_spacing, spacing, logger) for paths in data.values()]
 
-    def extract_crop(self, i, label=None, vol_size=(64, 64, 64)):
-        def get_output(oname):
-            name_suffix = oname + str(vol_size[0])
-            output_image = self.get_imagetype_path(name_suffix)
-            if not os.path.exists(output_image):
-                os.makedirs(output_image)
-            return output_image, name_suffix
+    def _get_crop_outputs(self, vol_size=(64, 64, 64)):
+        outputs = []
+        for prefix in [configs.images_crop_prefix, configs.labelmaps_crop_prefix]:
+            name_suffix = prefix + str(vol_size[0])
+            output_dir = self.get_imagetype_path(name_suffix)
+            os.makedirs(output_dir, exist_ok=True)
+            outputs.append((output_dir, name_suffix))
+        return outputs
 
+    def extract_crop(
+        self,
+        i,
+        label=None,
+        vol_size=(64, 64, 64),
+        compression_level: Optional[int] = None,
+    ):
+        """
+        extract crops of size `vol_size` centred at every label (or only `label`) of case `i`
+        :param compression_level: compression level of written crops; defaults to the reader's
+            `output_compression_level`
+        :return: dict with the case name, number of crops and time taken
+        """
         name = self.get_image_name(i)
-        logger.info(name)
-        output_image, image_name_suffix = get_output(configs.images_crop_prefix)
-        output_labelmap, labelmap_name_suffix = get_output(
-            configs.labelmaps_crop_prefix
+        labelmap_path = self.get_image_path(i, key=self.labelmap_key)
+        lmap = self._load_image(labelmap_path)
+        return _extract_case_crops(
+            name=name,
+            image_path=self.get_image_path(i),
+            labelmap_path=labelmap_path,
+            outputs=self._get_crop_outputs(vol_size),
+            label=label,
+            vol_size=vol_size,
+            output_ext=self.output_ext,
+            compression_level=self.output_compression_level
+            if compression_level is None
+            else compression_level,
+            labelmap=lmap,
+            stats=self.get_label_stats(i, labelmap=lmap),
         )
 
-        lmap = self.load_labelmap(i)
-        if label is not None:
-            labels = [label]
-        else:
-            labels = list(np.unique(lmap).flatten())
-            labels.remove(0)
-
-        sitk_image = self.load_sitk_image(i)
-        spacing = sitk_image.GetSpacing()
-        img = self.get_array_from_sitk_image(sitk_image)
-        for l in labels:
-            image, labelmap = extract_vol_at_label(
-                img, self.load_labelmap(i), label=l, vol_size=vol_size
-            )
-            labelmap = (labelmap == l).astype(np.uint8)
-
-            image = sitk.GetImageFromArray(image)
-            labelmap = sitk.GetImageFromArray(labelmap)
-            image.SetSpacing(spacing)
-            labelmap.SetSpacing(spacing)
-
-            suffix = "_" + str(l)
-
-            sitk.WriteImage(
-                image,
-                os.path.join(
-                    output_image, name + suffix + "_" + image_name_suffix + ".nii.gz"
-                ),
-            )
-            sitk.WriteImage(
-                labelmap,
-                os.path.join(
-                    output_labelmap,
-                    name + suffix + "_" + labelmap_name_suffix + ".nii.gz",
-                ),
+    def extract_crops(
+        self,
+        vol_size=(64, 64, 64),
+        label=None,
+        parallel=False,
+        num_workers: int = -1,
+        backend: str = "loky",
+        compression_level: Optional[int] = None,
+    ):
+        """
+        extract label crops for all cases. Each case is read once and all its crops are computed from a single
+        label statistics pass. Workers only receive file paths, not the reader.
+        :param num_workers: number of parallel workers (joblib `n_jobs`)
+        :param backend: joblib backend
+        :param compression_level: compression level of written crops; defaults to the reader's
+            `output_compression_level`
+        :return: DataFrame with the number of crops and time taken per case
+        """
+        outputs = self._get_crop_outputs(vol_size)
+        if compression_level is None:
+            compression_level = self.output_compression_level
+        tasks = [
+            dict(
+                name=name,
+                image_path=self.get_image_path(i),
+                labelmap_path=self.get_image_path(i, key=self.labelmap_key),
+                outputs=outputs,
+                label=label,
+                vol_size=vol_size,
+                output_ext=self.output_ext,
+                compression_level=compression_level,
             )
-
-    def extract_crops(self, vol_size=(64, 64, 64), label=None, parallel=False):
+            for i, name in enumerate(self.get_image_names())
+        ]
 
         if not parallel:
-            for i in range(len(self)):
-                printProgressBar(i + 1, len(self))
-                self.extract_crop(i, label, vol_size)
-
+            results = []
+            for i, task in enumerate(tasks):
+                printProgressBar(i + 1, len(tasks))
+                results.append(_extract_case_crops(**task))
         else:
-            from joblib import Parallel, delayed
-
-            Parallel(n_jobs=6)(
-                delayed(self.extract_crop)(i, label, vol_size) for i in range(len(self))
+            results = Parallel(n_jobs=num_workers, backend=backend)(
+                delayed(_extract_case_crops)(**task) for task in tasks
             )
+        return pd.DataFrame(results, columns=["name", "crops", "time"]).set_index(
+            "name"
+        )
 
-    def load_image_crop(self, img_idx, vol_size=(64, 64, 64), label=1):
+    def _get_crop_path(self, img_idx, prefix, vol_size=(64, 64, 64), label=1):
         name = self.get_image_name(img_idx)
-        name_suffix = configs.images_crop_prefix + str(vol_size[0])
+        name_suffix = prefix + str(vol_size[0])
         output = self.get_imagetype_path(name_suffix)
-        path = os.path.join(
-            output, name + "_" + str(label) + "_" + name_suffix + ".nii.gz"
+        filename = name + "_" + str(label) + "_" + name_suffix
+        # crops written with a different `output_ext` (e.g. before it was changed) are still found
+        for ext in (self.output_ext,) + IMAGE_EXTENSIONS:
+            path = os.path.join(output, filename + ext)
+            if os.path.exists(path):
+                return path
+        return os.path.join(output, filename + self.output_ext)
+
+    def load_image_crop(self, img_idx, vol_size=(64, 64, 64), label=1):
+        return self._load_image(
+            self._get_crop_path(
+                img_idx, configs.images_crop_prefix, vol_size=vol_size, label=label
+            )
         )
-        return self._load_image(path)
 
     def load_labelmap_crop(self, img_idx, vol_size=(64, 64, 64), label=1):
-        name = self.get_image_name(img_idx)
-        name_suffix = configs.labelmaps_crop_prefix + str(vol_size[0])
-        output = self.get_imagetype_path(name_suffix)
-        path = os.path.join(
-            output, name + "_" + str(label) + "_" + name_suffix + ".nii.gz"
+        return self._load_image(
+            self._get_crop_path(
+                img_idx, configs.labelmaps_crop_prefix, vol_size=vol_size, label=label
+            )
         )
-        return self._load_image(path)
 
     def view_slices(self, img_idx, label=None, step=3, dim=0):
         if label is None:
@@ -775,6 +936,83 @@ class MIReaderExtended(MIReaderBase):
         vis.display_slices(image, step=step, dim=dim)
 
 
+def _export_case_2d_slices(
+    store_path: str,
+    name: str,
+    image_path: str,
+    labelmap_path: str,
+    label=1,
+    step: int = 5,
+):
+    image = MIReaderExtended._load_image(image_path)
+    labelmap = MIReaderExtended._load_image(labelmap_path)
+    try:
+        images, labelmaps = midatasets.preprocessing.extract_all_slices_at_label(
+            image, labelmap, label, step
+        )
+    except ValueError as e:
+        logger.warning(f"[{name}] {e}")
+        return 0
+    return write_case_slices(store_path, name, images, labelmaps)
+
+
+def _extract_case_crops(
+    name: str,
+    image_path: str,
+    labelmap_path: str,
+    outputs: List[Tuple[str, str]],
+    label=None,
+    vol_size=(64, 64, 64),
+    output_ext: str = ".nii.gz",
+    compression_level: Optional[int] = None,
+    labelmap: Optional["np.ndarray"] = None,
+    stats: Optional[Dict] = None,
+):
+    start_time = time.perf_counter()
+    (output_image, image_name_suffix), (output_labelmap, labelmap_name_suffix) = outputs
+
+    sitk_image = sitk.ReadImage(image_path)
+    spacing = sitk_image.GetSpacing()
+    img = MIReaderExtended.get_array_from_sitk_image(sitk_image)
+    if labelmap is None:
+        labelmap = MIReaderExtended._load_image(labelmap_path)
+    if stats is None:
+        stats = midatasets.preprocessing.compute_label_stats(
+            labelmap, labels=None if label is None else [label], centroids=False
+        )
+    labels = [label] if label is not None else list(stats.keys())
+
+    for l in labels:
+        image, slabelmap = extract_vol_at_label(
+            img, labelmap, label=l, vol_size=vol_size, stats=stats
+        )
+        image = sitk.GetImageFromArray(image)
+        slabelmap = sitk.GetImageFromArray((slabelmap == l).astype(np.uint8))
+        image.SetSpacing(spacing)
+        slabelmap.SetSpacing(spacing)
+
+        suffix = "_" + str(l)
+        write_image(
+            image,
+            os.path.join(
+                output_image, name + suffix + "_" + image_name_suffix + output_ext
+            ),
+            compression_level=compression_level,
+        )
+        write_image(
+            slabelmap,
+            os.path.join(
+                output_labelmap,
+                name + suffix + "_" + labelmap_name_suffix + output_ext,
+            ),
+            compression_level=compression_level,
+        )
+
+    elapsed = time.perf_counter() - start_time
+    logger.info(f"[{name}] extracted {len(labels)} crops in {elapsed:.2f}s")
+    return {"name": name, "crops": len(labels), "time": elapsed}
+
+
 if sitk:
     MIReader = MIReaderExtended
 else:
@@ -852,6 +1090,7 @@ class S3Object:
                         ".yml",
                         ".csv",
                         ".nrrd",
+                        ".mha",
                     }
                 ]
             )
@@ -889,12 +1128,38 @@ class S3Object:
         upload_file(self.local_path, bucket=self.bucket, prefix=self.prefix)
         logger.info(f"[Uploaded] {self.s3_path}")
 
+    async def adownload(self, overwrite: bool = False):
+        """
+        async counterpart of `download`, sharing a pooled S3 client with bounded concurrency
+        """
+        target = Path(self.local_path)
+        if target.exists() and not overwrite:
+            logger.info(f"[already exists] {target}, skipping download.")
+            return
+        target.parent.mkdir(parents=True, exist_ok=True)
+
+        logger.info(f"[Downloading] {self.s3_path} -> {target}")
+        await adownload_file(self.bucket, self.prefix, target)
+
+    async def aupload(self, overwrite: bool = False):
+        """
+        async counterpart of `upload`
+        """
+        if not overwrite and await self.aexists_remote():
+            logger.info(f"[Upload] {self.s3_path} exists -- skipping")
+            return
+        await aupload_file(self.local_path, bucket=self.bucket, prefix=self.prefix)
+        logger.info(f"[Uploaded] {self.s3_path}")
+
     def exists_local(self):
         return os.path.exists(self.local_path)
 
     def exists_remote(self):
         return check_exists_s3(self.bucket, self.prefix)
 
+    async def aexists_remote(self):
+        return await acheck_exists_s3(self.bucket, self.prefix)
+
     def delete(self):
         try:
             os.remove(self.local_path)
@@ -1010,6 +1275,16 @@ class MImageIterator:
     def __len__(self):
         return len(self.data)
 
+    async def __aiter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    async def adownload(self, overwrite: bool = False):
+        """
+        download all images concurrently
+        """
+        await asyncio.gather(*[image.adownload(overwrite) for image in self])
+
 
 class MImageMultiIterator:
     def __init__(self, dataset: MIReader, keys: List[str], remote: bool = True):
@@ -19,6 +19,8 @@ class Configs(BaseSettings):
     aws_s3_bucket: Optional[str] = None
     aws_s3_profile: Optional[str] = None
     aws_endpoint_url: Optional[str] = None
+    # concurrent S3 requests of the async API, also the size of the S3 connection pool
+    s3_max_concurrency: int = 32
     remap_dirs: Dict = {"images": "image", "labelmaps": "labelmap"}
     primary_type: str = "image"
     data_types: List[Dict] = [
@@ -29,6 +31,10 @@ class Configs(BaseSettings):
         {"dirname": "metadata", "name": "metadata"},
     ]
     database: str = "yaml"
+    # format of derived outputs (resampled images, crops): one of ".nii.gz", ".nii", ".nrrd" or ".mha"
+    output_ext: str = ".nii.gz"
+    # None keeps the format default (gzip for .nii.gz, raw for the others), 0 disables compression
+    output_compression_level: Optional[int] = None
 
     class Config:
         extra = "ignore"
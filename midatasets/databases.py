@@ -1,11 +1,22 @@
 import json
 import os
+import pickle
+import re
+import sqlite3
+import stat
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
+from decimal import Decimal
 from enum import Enum
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Tuple
 
 import boto3
 import yaml
+from boto3.dynamodb.conditions import Attr, Key
 from botocore.exceptions import ClientError
 
 # from bson import ObjectId
@@ -13,11 +24,17 @@ from loguru import logger
 from pydantic import BaseModel, BaseSettings, Field
 
 try:
-    from pymongo import MongoClient
+    from pymongo import DeleteOne, MongoClient, UpdateOne
 except:
     MongoClient = None
 from smart_open import smart_open
 
+from midatasets.s3 import get_s3_client
+
+# C-accelerated (libyaml) loader/dumper when available
+YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+YamlDumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
 
 # class PyObjectId(ObjectId):
 #     @classmethod
@@ -58,8 +75,18 @@ class DBBase:
         primary_key: str = "name"
         path: str = ""
         host: Optional[str] = None
+        profile: Optional[str] = None
+        region: Optional[str] = None
+        cache_ttl: float = 5.0
+        scan_segments: int = 1
 
-    def find_all(self, selector: Optional[Dict] = None):
+    def find_all(
+        self, selector: Optional[Dict] = None, projection: Optional[List[str]] = None
+    ):
+        """
+        :param selector: equality selector
+        :param projection: fields to return; None returns full items
+        """
         raise NotImplementedError
 
     def find(self, selector: Dict):
@@ -74,10 +101,147 @@ class DBBase:
     def delete(self, selector: Dict):
         raise NotImplementedError
 
+    def get_version(self):
+        """
+        cheap token that changes whenever the data changes, used to invalidate caches built on top of the DB;
+        None if the DB cannot tell (e.g. remote services)
+        """
+        return None
+
+    # generic bulk operations, overridden with native ones where the DB has them
+
+    def bulk_create(self, items: List[BaseModel]) -> int:
+        for item in items:
+            self.create(item)
+        return len(items)
+
+    def bulk_update(self, updates: List[Tuple[Dict, Dict]]) -> int:
+        """
+        :param updates: (selector, item) pairs
+        :return: number of updated items
+        """
+        return sum(self.update(selector, item) for selector, item in updates)
+
+    def bulk_delete(self, selectors: List[Dict]) -> int:
+        """
+        :return: number of deleted items
+        """
+        return sum(self.delete(selector) for selector in selectors)
+
+    @staticmethod
+    def _matches(d: Dict, selector: Dict) -> bool:
+        return all(k in d and d[k] == v for k, v in selector.items())
+
+    @staticmethod
+    def _project(items: List[Dict], projection: Optional[List[str]]) -> List[Dict]:
+        if projection is None:
+            return items
+        return [{k: d[k] for k in projection if k in d} for d in items]
+
+
+# clients shared by all DB instances of a process, created on first use
+_clients: Dict[Tuple, object] = {}
+_clients_lock = threading.Lock()
+# clients that are not thread-safe, per thread; dropped by every thread once the generation changes
+_thread_clients = threading.local()
+_clients_generation = 0
+# collections/tables already initialised (e.g. indexes created) in this process
+_initialised = set()
+_initialise_lock = threading.Lock()
+
+
+def _get_shared(key: Tuple, factory):
+    # keyed by pid too, as connections must not be shared with forked children
+    key = (os.getpid(), *key)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = factory()
+    return client
+
+
+def _get_thread_clients(name: str) -> Dict:
+    if getattr(_thread_clients, "generation", None) != _clients_generation:
+        _thread_clients.__dict__.clear()
+        _thread_clients.generation = _clients_generation
+    clients = getattr(_thread_clients, name, None)
+    if clients is None:
+        clients = {}
+        setattr(_thread_clients, name, clients)
+    return clients
+
+
+def _initialise_once(key: Tuple, fn):
+    """
+    run `fn` once per process for `key`, e.g. to create indexes
+    """
+    key = (os.getpid(), *key)
+    if key in _initialised:
+        return
+    with _initialise_lock:
+        if key not in _initialised:
+            fn()
+            _initialised.add(key)
+
+
+def get_mongo_client(host: Optional[str] = None):
+    """
+    MongoClient shared per host; it connects on the first operation and pools connections across threads
+    """
+    return _get_shared(("mongo", host), lambda: MongoClient(host=host, connect=False))
+
+
+def get_dynamodb_resource(profile: Optional[str] = None, region: Optional[str] = None):
+    """
+    DynamoDB resource shared per profile and region. boto3 resources are not thread-safe, so each thread
+    gets its own, created on first use
+    """
+    key = (os.getpid(), profile, region)
+    resources = _get_thread_clients("dynamodb")
+    resource = resources.get(key)
+    if resource is None:
+        resource = resources[key] = boto3.session.Session(
+            profile_name=profile, region_name=region
+        ).resource("dynamodb")
+    return resource
+
+
+def get_dynamodb_table(
+    table_name: str, profile: Optional[str] = None, region: Optional[str] = None
+):
+    """
+    Table of the shared DynamoDB resource of this thread
+    """
+    key = (os.getpid(), profile, region, table_name)
+    tables = _get_thread_clients("dynamodb_tables")
+    table = tables.get(key)
+    if table is None:
+        table = tables[key] = get_dynamodb_resource(profile, region).Table(table_name)
+    return table
+
+
+def clear_clients():
+    """
+    drop the shared clients, e.g. after changing credentials; the per-thread DynamoDB resources of every
+    thread are recreated on their next use
+    """
+    global _clients_generation
+    with _clients_lock, _initialise_lock:
+        _clients.clear()
+        _initialised.clear()
+        _clients_generation += 1
+
 
 if MongoClient:
 
     class DBMongodb(DBBase):
+        """
+        MongoDB collection DB. Instances share one client per host (see `get_mongo_client`), which
+        connects on the first operation; the unique index on `primary_key` is created once per process.
+        """
+
         def __init__(
             self,
             host: str = None,
@@ -86,18 +250,38 @@ if MongoClient:
             primary_key: str = None,
         ):
             config = self.Config()
+            self.host = host or config.host
             self.db_name = db_name or config.db_name
-            self.collection_name = collection_name or config.table_name
+            self.collection_name = (
+                collection_name
+                or getattr(config, "collection_name", None)
+                or config.table_name
+            )
             self.primary_key = primary_key or config.primary_key
-            self.client = MongoClient(host=host or config.host)
-            self.db = self.client[self.db_name]
-            self.collection = self.db[self.collection_name]
-            self.collection.create_index(self.primary_key, unique=True)
 
-        def find_all(self, selector=None):
+        @property
+        def client(self):
+            return get_mongo_client(self.host)
+
+        @property
+        def db(self):
+            return self.client[self.db_name]
+
+        @property
+        def collection(self):
+            collection = self.db[self.collection_name]
+            _initialise_once(
+                ("mongo", self.host, self.db_name, self.collection_name, self.primary_key),
+                lambda: collection.create_index(self.primary_key, unique=True),
+            )
+            return collection
+
+        def find_all(self, selector=None, projection=None):
             if selector is None:
                 selector = {}
-            return list(self.collection.find(selector))
+            if projection is not None:
+                projection = {"_id": 0, **{k: 1 for k in projection}}
+            return list(self.collection.find(selector, projection))
 
         def find(self, selector):
             return self.collection.find_one(selector)
@@ -111,19 +295,58 @@ if MongoClient:
         def delete(self, selector):
             return self.collection.delete_one(selector).deleted_count
 
+        def bulk_create(self, items: List[BaseModel]) -> int:
+            if not items:
+                return 0
+            return len(
+                self.collection.insert_many(
+                    [json.loads(item.json()) for item in items]
+                ).inserted_ids
+            )
+
+        def bulk_update(self, updates: List[Tuple[Dict, Dict]]) -> int:
+            if not updates:
+                return 0
+            return self.collection.bulk_write(
+                [UpdateOne(selector, {"$set": item}) for selector, item in updates]
+            ).modified_count
+
+        def bulk_delete(self, selectors: List[Dict]) -> int:
+            if not selectors:
+                return 0
+            return self.collection.bulk_write(
+                [DeleteOne(selector) for selector in selectors]
+            ).deleted_count
+
 
 class DBDict(DBBase):
+    """
+    In-memory DB of dicts, kept in a list under `collection_name`.
+
+    Items are indexed by `primary_key` and by each field of `indexes`, so equality selectors including one of
+    these fields are served from a hash lookup instead of a scan. The indexes are maintained by `create`,
+    `update` and `delete`; call `_build_index` after replacing `data` directly.
+
+    Mutations are saved immediately, or once at the end of a `batch()` block.
+    """
+
     def __init__(
         self,
         data: Optional[Dict] = None,
         collection_name: str = "datasets",
         primary_key: str = "name",
+        indexes: Optional[List[str]] = None,
     ):
         super().__init__()
         self.collection_name = collection_name
         self.data = data or {self.collection_name: []}
         self.primary_key = primary_key
+        self.indexes = [f for f in (indexes or []) if f != primary_key]
+        self._batch_depth = 0
+        self._dirty = False
+        self._version = 0
         self._load()
+        self._build_index()
 
     def _load(self):
         pass
@@ -131,65 +354,296 @@ class DBDict(DBBase):
     def _save(self):
         pass
 
-    def find_all(self, selector=None):
-        if not selector:
-            return self.data[self.collection_name]
+    def get_version(self):
+        return self._version
+
+    def _changed(self):
+        self._version += 1
+        if self._batch_depth:
+            self._dirty = True
         else:
-            return [
-                d
-                for d in self.data[self.collection_name]
-                if all([d[k] == v for k, v in selector.items()])
-            ]
+            self._save()
+
+    @contextmanager
+    def batch(self):
+        """
+        Apply many mutations and save once at the end of the block, e.g.
+
+            with db.batch():
+                for item in items:
+                    db.create(item)
+
+        Nested blocks save once, at the end of the outermost one. If the block raises, nothing is saved
+        and the data is reloaded from storage, discarding the changes (a plain `DBDict` has no storage
+        and keeps them).
+        """
+        self._batch_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._batch_depth -= 1
+            if self._batch_depth == 0 and self._dirty:
+                self._dirty = False
+                self._rollback()
+            raise
+        self._batch_depth -= 1
+        if self._batch_depth == 0 and self._dirty:
+            self._dirty = False
+            self._save()
+
+    def _rollback(self):
+        pass
+
+    @property
+    def _items(self) -> List[Dict]:
+        return self.data[self.collection_name]
+
+    def _build_index(self):
+        if not self.data or self.data.get(self.collection_name) is None:
+            self.data = {**(self.data or {}), self.collection_name: []}
+        self._version += 1
+        # key -> {id(item): item}; keys are unique unless the data was edited by hand
+        self._index: Dict = {}
+        self._secondary: Dict[str, Dict] = {field: {} for field in self.indexes}
+        for item in self._items:
+            self._add_to_index(item)
+        duplicates = [k for k, bucket in self._index.items() if len(bucket) > 1]
+        if duplicates:
+            logger.warning(f"{self.collection_name} has duplicated {self.primary_key} values {duplicates}")
+
+    def _add_to_index(self, item: Dict):
+        self._index.setdefault(item.get(self.primary_key), {})[id(item)] = item
+        for field, index in self._secondary.items():
+            try:
+                index.setdefault(item.get(field), {})[id(item)] = item
+            except TypeError:
+                pass  # unhashable values are only found by scanning
+
+    def _remove_from_index(self, item: Dict):
+        bucket = self._index.get(item.get(self.primary_key), {})
+        bucket.pop(id(item), None)
+        if not bucket:
+            self._index.pop(item.get(self.primary_key), None)
+        for field, index in self._secondary.items():
+            try:
+                bucket = index.get(item.get(field), {})
+            except TypeError:
+                continue
+            bucket.pop(id(item), None)
+            if not bucket:
+                index.pop(item.get(field), None)
+
+    def _candidates(self, selector: Dict) -> List[Dict]:
+        """
+        items that can match `selector`: from an index if the selector includes an indexed field,
+        otherwise all items
+        """
+        try:
+            if self.primary_key in selector:
+                return list(self._index.get(selector[self.primary_key], {}).values())
+            for field, value in selector.items():
+                if field in self._secondary:
+                    return list(self._secondary[field].get(value, {}).values())
+        except TypeError:
+            pass
+        return self._items
+
+    def _select(self, selector: Optional[Dict]) -> List[Dict]:
+        if not selector:
+            return self._items
+        return [d for d in self._candidates(selector) if self._matches(d, selector)]
+
+    def find_all(self, selector=None, projection=None):
+        return self._project(self._select(selector), projection)
 
     def find(self, selector):
-        for d in self.data[self.collection_name]:
-            if all([d[k] == v for k, v in selector.items()]):
-                return d
+        for d in self._select(selector):
+            return d
         return None
 
     def create(self, item: BaseModel):
-        if self.find({self.primary_key: getattr(item, self.primary_key)}) is None:
-            self.data[self.collection_name].append(json.loads(item.json()))
-            self._save()
-        else:
-            raise KeyError(f"name {getattr(item, self.primary_key)} already exists")
+        key = getattr(item, self.primary_key)
+        if key in self._index:
+            raise KeyError(f"name {key} already exists")
+        d = json.loads(item.json())
+        self._items.append(d)
+        self._add_to_index(d)
+        self._changed()
 
     def update(self, selector, item: Dict):
-        update_count = 0
-        for i, d in enumerate(self.data[self.collection_name]):
-            if all([d[k] == v for k, v in selector.items()]):
-                self.data[self.collection_name][i].update(item)
-                update_count += 1
-        if update_count > 0:
-            self._save()
-        return update_count
+        item = dict(item)
+        matches = self._select(selector)
+        new_key = item.get(self.primary_key)
+        if new_key is not None and (
+            len(matches) > 1
+            or any(
+                all(d is not m for m in matches)
+                for d in self._index.get(new_key, {}).values()
+            )
+        ):
+            raise KeyError(f"name {new_key} already exists")
+        for d in matches:
+            self._remove_from_index(d)
+            d.update(item)
+            self._add_to_index(d)
+        if matches:
+            self._changed()
+        return len(matches)
 
     def delete(self, selector):
-        del_count = 0
-        for i, d in enumerate(self.data[self.collection_name][:]):
-            if all([d[k] == v for k, v in selector.items()]):
-                del self.data[self.collection_name][i]
-                del_count += 1
-        if del_count > 0:
-            self._save()
-        return del_count
+        matches = self._select(selector)
+        if not matches:
+            return 0
+        for d in matches:
+            self._remove_from_index(d)
+        removed = {id(d) for d in matches}
+        self.data[self.collection_name] = [
+            d for d in self._items if id(d) not in removed
+        ]
+        self._changed()
+        return len(matches)
+
+    def bulk_create(self, items: List[BaseModel]) -> int:
+        with self.batch():
+            return super().bulk_create(items)
+
+    def bulk_update(self, updates: List[Tuple[Dict, Dict]]) -> int:
+        with self.batch():
+            return super().bulk_update(updates)
+
+    def bulk_delete(self, selectors: List[Dict]) -> int:
+        with self.batch():
+            return super().bulk_delete(selectors)
+
+
+_fanout_executor = None
+
+
+def _get_fanout_executor() -> ThreadPoolExecutor:
+    global _fanout_executor
+    if _fanout_executor is None:
+        _fanout_executor = ThreadPoolExecutor(
+            max_workers=16, thread_name_prefix="midatasets-db"
+        )
+    return _fanout_executor
+
+
+_scan_executor = None
+
+
+def _get_scan_executor() -> ThreadPoolExecutor:
+    # separate from the fan-out executor, whose tasks wait for the scan segments; its threads persist, so
+    # they keep their DynamoDB resources across scans
+    global _scan_executor
+    if _scan_executor is None:
+        _scan_executor = ThreadPoolExecutor(
+            max_workers=16, thread_name_prefix="midatasets-scan"
+        )
+    return _scan_executor
 
 
 class DBComposite(DBBase):
-    def __init__(self, dbs: List[DBBase]):
-        self.dbs = dbs
+    """
+    Combines several DBs. Reads query all of them concurrently, so a lookup costs the slowest DB rather
+    than the sum of all. Writes go to the first DB.
 
-    def find_all(self, selector=None):
-        result = []
-        for db in self.dbs:
-            result.extend(db.find_all(selector))
-        return result
+    Items are merged by `primary_key` with a deterministic precedence: later DBs override earlier ones,
+    and `find_all` returns each item once, in order of first appearance.
+
+    With `index=True` the merged items are kept in memory, per source. A source is re-read only when its
+    `get_version()` changes or, for DBs without versions (e.g. DynamoDB, MongoDB), after `index_ttl`
+    seconds; writes through the composite invalidate the first DB.
+    """
+
+    def __init__(
+        self,
+        dbs: List[DBBase],
+        primary_key: str = "name",
+        index: bool = False,
+        index_ttl: float = 60.0,
+    ):
+        self.dbs = dbs
+        self.primary_key = primary_key
+        self.index = index
+        self.index_ttl = index_ttl
+        # per source: (version, time loaded, {key: item})
+        self._sources: List[Optional[Tuple]] = [None] * len(dbs)
+
+    def _fan_out(self, fn, args: Optional[List] = None) -> List:
+        # `fn` on every DB (or arg) concurrently; results in DB order, whatever order the queries finish in
+        args = self.dbs if args is None else args
+        if len(args) <= 1:
+            return [fn(arg) for arg in args]
+        return list(_get_fanout_executor().map(fn, args))
+
+    def _merge(self, results: List[List[Dict]]) -> List[Dict]:
+        merged = {}
+        unkeyed = []
+        for items in results:
+            for d in items:
+                if self.primary_key in d:
+                    merged[d[self.primary_key]] = d
+                else:
+                    unkeyed.append(d)
+        return list(merged.values()) + unkeyed
+
+    def _get_source(self, i: int) -> Dict:
+        db = self.dbs[i]
+        version = db.get_version()
+        source = self._sources[i]
+        if source is not None:
+            cached_version, loaded_time, items = source
+            if version is not None and version == cached_version:
+                return items
+            if version is None and time.monotonic() - loaded_time < self.index_ttl:
+                return items
+        items = {d[self.primary_key]: d for d in db.find_all()}
+        self._sources[i] = (version, time.monotonic(), items)
+        return items
+
+    def _get_merged(self) -> Dict:
+        sources = self._fan_out(self._get_source, list(range(len(self.dbs))))
+        merged = {}
+        for items in sources:
+            merged.update(items)
+        return merged
+
+    def invalidate(self, db: Optional[DBBase] = None):
+        """
+        drop the in-memory index of `db`, or of all sources
+        """
+        for i, _db in enumerate(self.dbs):
+            if db is None or _db is db:
+                self._sources[i] = None
+
+    def find_all(self, selector=None, projection=None):
+        if self.index:
+            items = list(self._get_merged().values())
+            if selector:
+                items = [d for d in items if self._matches(d, selector)]
+            return self._project(items, projection)
+
+        # the key is needed to merge, even if not projected
+        query_projection = projection
+        if projection is not None and self.primary_key not in projection:
+            query_projection = [self.primary_key, *projection]
+        results = self._fan_out(
+            lambda db: db.find_all(selector, projection=query_projection)
+        )
+        return self._project(self._merge(results), projection)
 
     def find(self, selector):
-        result = None
-        for db in self.dbs:
-            _result = db.find(selector)
+        if self.index:
+            merged = self._get_merged()
+            if self.primary_key in selector:
+                d = merged.get(selector[self.primary_key])
+                return d if d is not None and self._matches(d, selector) else None
+            return next(
+                (d for d in merged.values() if self._matches(d, selector)), None
+            )
 
+        result = None
+        for db, _result in zip(self.dbs, self._fan_out(lambda db: db.find(selector))):
             if result is not None and _result is not None:
                 logger.warning(
                     f"Overriding dataset {result['name']} definition using one from {db.__class__}"
@@ -201,84 +655,653 @@ class DBComposite(DBBase):
 
     def create(self, item: BaseModel):
         logger.info(f"Created using {self.dbs[0].__class__}")
+        self.invalidate(self.dbs[0])
         return self.dbs[0].create(item)
 
     def update(self, selector, item: Dict):
         logger.info(f"Updated using {self.dbs[0].__class__}")
+        self.invalidate(self.dbs[0])
         return self.dbs[0].update(selector, item)
 
     def delete(self, selector):
         logger.info(f"Deleted using {self.dbs[0].__class__}")
+        self.invalidate(self.dbs[0])
         return self.dbs[0].delete(selector)
 
+    def bulk_create(self, items: List[BaseModel]) -> int:
+        logger.info(f"Created using {self.dbs[0].__class__}")
+        self.invalidate(self.dbs[0])
+        return self.dbs[0].bulk_create(items)
+
+    def bulk_update(self, updates: List[Tuple[Dict, Dict]]) -> int:
+        logger.info(f"Updated using {self.dbs[0].__class__}")
+        self.invalidate(self.dbs[0])
+        return self.dbs[0].bulk_update(updates)
+
+    def bulk_delete(self, selectors: List[Dict]) -> int:
+        logger.info(f"Deleted using {self.dbs[0].__class__}")
+        self.invalidate(self.dbs[0])
+        return self.dbs[0].bulk_delete(selectors)
+
+
+# path -> (version, time of the last version check, pickled data)
+_registry_cache: Dict[str, Tuple[object, float, bytes]] = {}
+_registry_cache_lock = threading.Lock()
+
+
+_umask = None
+
+
+def _get_umask() -> int:
+    # mode bits cleared from new files; os.umask can only be read by setting it, so read it once
+    global _umask
+    if _umask is None:
+        with _registry_cache_lock:
+            if _umask is None:
+                _umask = os.umask(0o022)
+                os.umask(_umask)
+    return _umask
+
+
+def _get_registry_version(path: str):
+    """
+    cheap version of a registry file: (mtime, size) for local files and the ETag for S3 objects;
+    None if it cannot be determined (e.g. other remote schemes), which disables caching
+    """
+    if "://" not in path:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+    if path.startswith("s3://"):
+        bucket, key = path[len("s3://"):].split("/", 1)
+        return get_s3_client().head_object(Bucket=bucket, Key=key)["ETag"]
+    return None
+
+
+def clear_registry_cache(path: Optional[str] = None):
+    """
+    drop the cached registry at `path`, or all of them
+    """
+    with _registry_cache_lock:
+        if path is None:
+            _registry_cache.clear()
+        else:
+            _registry_cache.pop(path, None)
+
 
 class DBYaml(DBDict):
+    """
+    YAML file DB, local or remote (e.g. on S3 through smart_open).
+
+    Parsed registries are cached per process, so instantiating many DBs on the same file parses it once.
+    The cache is revalidated by the file mtime (local) or ETag (S3); remote files are revalidated at most
+    every `cache_ttl` seconds, so changes made by other processes can take that long to be seen.
+    `cache=False` disables the cache.
+    """
+
     def __init__(
         self,
         path: Optional[str] = None,
         collection_name: Optional[str] = None,
         primary_key: Optional[str] = None,
+        indexes: Optional[List[str]] = None,
+        cache: bool = True,
+        cache_ttl: Optional[float] = None,
     ):
 
         config = self.Config()
         self.path = path or config.path
         self.path = os.path.expanduser(self.path)
+        self.cache = cache
+        self.cache_ttl = config.cache_ttl if cache_ttl is None else cache_ttl
         collection_name = collection_name or config.table_name
         primary_key = primary_key or config.primary_key
         super().__init__(
-            data=None, collection_name=collection_name, primary_key=primary_key
+            data=None,
+            collection_name=collection_name,
+            primary_key=primary_key,
+            indexes=indexes,
         )
 
     def _load(self):
         try:
-            with smart_open(self.path) as f:
-                self.data = yaml.safe_load(f)
+            if not self.cache:
+                self.data = self._read()
+            else:
+                self.data = self._load_cached()
         except:
             logger.error(f"No yaml db found at {self.path}")
 
+    def _read(self):
+        with smart_open(self.path) as f:
+            return yaml.load(f, Loader=YamlLoader)
+
+    def _load_cached(self):
+        # each instance gets its own copy, unpickling is much faster than parsing
+        now = time.monotonic()
+        with _registry_cache_lock:
+            entry = _registry_cache.get(self.path)
+        if entry and "://" in self.path and now - entry[1] < self.cache_ttl:
+            return pickle.loads(entry[2])
+        version = _get_registry_version(self.path)
+        if entry and version is not None and entry[0] == version:
+            with _registry_cache_lock:
+                _registry_cache[self.path] = (version, now, entry[2])
+            return pickle.loads(entry[2])
+        data = self._read()
+        if version is not None:
+            self._store_in_cache(version, data)
+        return data
+
+    def _store_in_cache(self, version, data):
+        with _registry_cache_lock:
+            _registry_cache[self.path] = (
+                version,
+                time.monotonic(),
+                pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL),
+            )
+
+    def _rollback(self):
+        self.data = None
+        self._load()
+        self._build_index()
+
+    def _dump(self, f):
+        yaml.dump(
+            self.data, f, Dumper=YamlDumper, default_flow_style=False, sort_keys=False
+        )
+
     def _save(self):
-        with smart_open(self.path, "w") as f:
-            yaml.dump(self.data, f, default_flow_style=False, sort_keys=False)
+        if "://" in self.path:
+            # remote objects (e.g. S3) are only replaced once the upload completes
+            with smart_open(self.path, "w") as f:
+                self._dump(f)
+            # the new ETag is only known by asking for it; revalidate on the next load instead
+            clear_registry_cache(self.path)
+            return
+        # write next to the target and rename, so readers never see a partial file; a symlinked registry
+        # keeps its link, and the file keeps its permissions
+        path = os.path.realpath(self.path)
+        try:
+            mode = stat.S_IMODE(os.stat(path).st_mode)
+        except FileNotFoundError:
+            mode = 0o666 & ~_get_umask()
+        tmp = tempfile.NamedTemporaryFile(
+            "w", dir=os.path.dirname(path), prefix=f".{os.path.basename(path)}.", suffix=".tmp", delete=False
+        )
+        tmp_path = tmp.name
+        try:
+            with tmp as f:
+                self._dump(f)
+            os.chmod(tmp_path, mode)
+            os.replace(tmp_path, path)
+            if self.cache:
+                self._store_in_cache(_get_registry_version(self.path), self.data)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+class DBSqlite(DBBase):
+    """
+    SQLite file DB, for a service-free registry shared by the processes of a machine.
+
+    Items are stored as JSON documents keyed by `primary_key`, in insertion order. Each field of `indexes`
+    gets an index on its JSON value, so equality selectors on the primary key or an indexed field are
+    answered by SQLite; other fields are filtered after decoding. The database runs in WAL mode, so readers
+    do not block each other nor the writer, and every write (including each bulk operation) is a single
+    transaction.
+
+    Connections are opened lazily, one per thread and process.
+    """
+
+    _field_pattern = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        table_name: Optional[str] = None,
+        primary_key: Optional[str] = None,
+        indexes: Optional[List[str]] = None,
+        timeout: float = 30.0,
+    ):
+        config = self.Config()
+        self.path = os.path.expanduser(path or config.path)
+        self.table_name = table_name or config.table_name
+        self.primary_key = primary_key or config.primary_key
+        if indexes is None:
+            indexes = getattr(config, "indexes", [])
+        for name in [self.table_name, *indexes]:
+            if not self._field_pattern.match(name):
+                raise ValueError(f"invalid table or index name {name}")
+        self.indexes = [f for f in indexes if f != self.primary_key]
+        self.timeout = timeout
+        self._local = threading.local()
+        self._is_new = not os.path.exists(self.path)
+        self._create_schema()
+
+    def _get_connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            # autocommit; writes open explicit transactions in `_transaction`
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._get_connection()
+        # take the write lock upfront, so concurrent writers wait instead of failing to upgrade
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        # bump the version for `get_version`, shared by all connections
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        conn.execute(f"PRAGMA user_version = {(version + 1) % (1 << 31)}")
+        conn.execute("COMMIT")
+
+    def _create_schema(self):
+        conn = self._get_connection()
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table_name} (pk PRIMARY KEY, data TEXT NOT NULL)"
+        )
+        for field in self.indexes:
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {self.table_name}_{field} "
+                f"ON {self.table_name} ({self._json_path(field)})"
+            )
+
+    @staticmethod
+    def _json_path(field: str) -> str:
+        # literal path, so that SQLite can match the expression to its index
+        return f"json_extract(data, '$.{field}')"
+
+    def get_version(self):
+        return self._get_connection().execute("PRAGMA user_version").fetchone()[0]
+
+    @staticmethod
+    def _is_scalar(value) -> bool:
+        return isinstance(value, (str, int, float)) and not isinstance(value, bool)
+
+    def _where(self, selector: Optional[Dict]) -> Tuple[str, List]:
+        """
+        SQL condition for the scalar values of `selector` on the primary key or indexed fields;
+        the remaining fields are checked with `_matches`
+        """
+        clauses, params = [], []
+        for field, value in (selector or {}).items():
+            if not self._is_scalar(value):
+                continue
+            if field == self.primary_key:
+                clauses.append("pk = ?")
+            elif field in self.indexes:
+                clauses.append(f"{self._json_path(field)} = ?")
+            else:
+                continue
+            params.append(value)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def _select(self, selector: Optional[Dict], conn=None) -> List[Tuple[object, Dict]]:
+        where, params = self._where(selector)
+        rows = (conn or self._get_connection()).execute(
+            f"SELECT pk, data FROM {self.table_name}{where} ORDER BY rowid", params
+        )
+        items = [(pk, json.loads(data)) for pk, data in rows]
+        if selector:
+            items = [(pk, d) for pk, d in items if self._matches(d, selector)]
+        return items
+
+    def find_all(self, selector=None, projection=None):
+        if projection is not None and set(projection) == {self.primary_key}:
+            where, params = self._where(selector)
+            if len(params) == len(selector or {}):
+                # keys only, without decoding the documents
+                rows = self._get_connection().execute(
+                    f"SELECT pk FROM {self.table_name}{where} ORDER BY rowid", params
+                )
+                return [{self.primary_key: pk} for pk, in rows]
+        return self._project([d for _, d in self._select(selector)], projection)
+
+    def find(self, selector):
+        for _, d in self._select(selector):
+            return d
+        return None
+
+    @staticmethod
+    def _dumps(d: Dict) -> str:
+        return json.dumps(d, default=str)
+
+    def _insert(self, conn, items: List[BaseModel]):
+        rows = []
+        for item in items:
+            d = json.loads(item.json())
+            rows.append((d.get(self.primary_key), self._dumps(d)))
+        try:
+            conn.executemany(f"INSERT INTO {self.table_name} (pk, data) VALUES (?, ?)", rows)
+        except sqlite3.IntegrityError:
+            existing = {
+                pk
+                for pk, in conn.execute(f"SELECT pk FROM {self.table_name}")
+            }
+            keys = [pk for pk, _ in rows]
+            duplicates = {k for k in keys if k in existing or keys.count(k) > 1}
+            raise KeyError(f"name {', '.join(map(str, duplicates))} already exists")
+
+    def create(self, item: BaseModel):
+        with self._transaction() as conn:
+            self._insert(conn, [item])
+
+    def _update(self, conn, selector: Dict, item: Dict) -> int:
+        matches = self._select(selector, conn)
+        new_key = item.get(self.primary_key)
+        if new_key is not None and matches:
+            if len(matches) > 1 or (
+                matches[0][0] != new_key
+                and conn.execute(
+                    f"SELECT 1 FROM {self.table_name} WHERE pk = ?", (new_key,)
+                ).fetchone()
+            ):
+                raise KeyError(f"name {new_key} already exists")
+        rows = []
+        for pk, d in matches:
+            d.update(item)
+            rows.append((d.get(self.primary_key), self._dumps(d), pk))
+        conn.executemany(
+            f"UPDATE {self.table_name} SET pk = ?, data = ? WHERE pk = ?", rows
+        )
+        return len(matches)
+
+    def update(self, selector, item: Dict):
+        with self._transaction() as conn:
+            return self._update(conn, selector, dict(item))
+
+    def _delete(self, conn, selector: Dict) -> int:
+        keys = [(pk,) for pk, _ in self._select(selector, conn)]
+        conn.executemany(f"DELETE FROM {self.table_name} WHERE pk = ?", keys)
+        return len(keys)
+
+    def delete(self, selector):
+        with self._transaction() as conn:
+            return self._delete(conn, selector)
+
+    def bulk_create(self, items: List[BaseModel]) -> int:
+        with self._transaction() as conn:
+            self._insert(conn, items)
+        return len(items)
+
+    def bulk_update(self, updates: List[Tuple[Dict, Dict]]) -> int:
+        with self._transaction() as conn:
+            return sum(self._update(conn, selector, dict(item)) for selector, item in updates)
+
+    def bulk_delete(self, selectors: List[Dict]) -> int:
+        with self._transaction() as conn:
+            return sum(self._delete(conn, selector) for selector in selectors)
+
+    def import_yaml(
+        self,
+        path: str,
+        collection_name: Optional[str] = None,
+        overwrite: bool = False,
+    ) -> int:
+        """
+        copy the items of a YAML registry (see `DBYaml`), e.g. to migrate from `~/.midatasets.yaml`
+        :param path: path of the YAML registry
+        :param collection_name: list of items in the YAML file, defaults to `table_name`
+        :param overwrite: replace existing items with the same key, otherwise they are kept
+        :return: number of imported items
+        """
+        items = DBYaml(
+            path=path,
+            collection_name=collection_name or self.table_name,
+            primary_key=self.primary_key,
+            cache=False,
+        ).find_all()
+        rows = [
+            (d.get(self.primary_key), self._dumps(d))
+            for d in items
+            if d.get(self.primary_key) is not None
+        ]
+        verb = "INSERT OR REPLACE" if overwrite else "INSERT OR IGNORE"
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(f"{verb} INTO {self.table_name} (pk, data) VALUES (?, ?)", rows)
+            imported = conn.total_changes - before
+        logger.info(f"imported {imported} items from {path} into {self.path}")
+        return imported
+
+
+def _to_dynamodb(value):
+    # DynamoDB numbers are Decimals, boto3 rejects floats
+    if isinstance(value, BaseModel):
+        return json.loads(value.json(), parse_float=Decimal)
+    return json.loads(json.dumps(value, default=str), parse_float=Decimal)
+
+
+def _from_dynamodb(value):
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, dict):
+        return {k: _from_dynamodb(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_from_dynamodb(v) for v in value]
+    return value
 
 
 class DBDynamodb(DBBase):
+    """
+    DynamoDB table DB with `primary_key` as the partition key.
+
+    `find_all` pushes selectors down to DynamoDB: a selector on the partition key, or on the partition key
+    of a global secondary index, becomes a `Query` and any other fields a `FilterExpression`. Other
+    selectors scan with a `FilterExpression`, in `scan_segments` parallel segments. Only indexes that project
+    all attributes are queried.
+
+    Instances share the DynamoDB resource of their profile and region (see `get_dynamodb_resource`),
+    created on first use. Floats are stored as Decimals and numbers are read back as int or float.
+    """
+
+    # retries of unprocessed batch_get keys, and the delay (seconds) before the first one
+    max_retries = 8
+    retry_delay = 0.05
+
     def __init__(
         self,
         table_name: str = None,
         primary_key: str = None,
+        scan_segments: Optional[int] = None,
+        profile: Optional[str] = None,
+        region: Optional[str] = None,
     ):
         config = self.Config()
         self.table_name = table_name or config.table_name
         self.primary_key = primary_key or config.primary_key
-        self.client = boto3.resource("dynamodb")
-        self.table = self.client.Table(self.table_name)
-
-    def find_all(self, selector: Optional[Dict] = None):
-        response = self.table.scan()
+        self.scan_segments = scan_segments or getattr(config, "scan_segments", 1)
+        self.profile = profile or getattr(config, "profile", None)
+        self.region = region or getattr(config, "region", None)
+        self._index_keys = None
+
+    @property
+    def client(self):
+        return get_dynamodb_resource(self.profile, self.region)
+
+    @property
+    def table(self):
+        return get_dynamodb_table(self.table_name, self.profile, self.region)
+
+    @property
+    def index_keys(self) -> Dict[str, str]:
+        """
+        partition key attribute -> name of the global secondary index, from the table description,
+        described once per process; a failed description is retried on the next call
+        """
+        if self._index_keys is None:
+            key = (os.getpid(), "dynamodb_index_keys", self.profile, self.region, self.table_name)
+            index_keys = _clients.get(key)
+            if index_keys is None:
+                # described without holding the lock, which would block every other client lookup
+                index_keys = self._describe_index_keys()
+                if index_keys is None:
+                    return {}
+                with _clients_lock:
+                    index_keys = _clients.setdefault(key, index_keys)
+            self._index_keys = index_keys
+        return self._index_keys
+
+    def _describe_index_keys(self) -> Optional[Dict[str, str]]:
+        index_keys = {}
+        try:
+            indexes = self.table.global_secondary_indexes or []
+        except ClientError as e:
+            logger.warning(f"Cannot describe {self.table_name}, scanning instead of using its indexes: {e}")
+            return None
+        for index in indexes:
+            # a query on an index that does not project all attributes would return partial items
+            if index.get("Projection", {}).get("ProjectionType") != "ALL":
+                continue
+            for key in index["KeySchema"]:
+                if key["KeyType"] == "HASH":
+                    index_keys.setdefault(key["AttributeName"], index["IndexName"])
+        return index_keys
+
+    @staticmethod
+    def _get_filter(selector: Dict):
+        condition = None
+        for k, v in selector.items():
+            condition = Attr(k).eq(v) if condition is None else condition & Attr(k).eq(v)
+        return condition
+
+    def _paginate(self, method, table=None, **kwargs) -> List[Dict]:
+        table = table or self.table
+        response = getattr(table, method)(**kwargs)
         data = response["Items"]
-
         while "LastEvaluatedKey" in response:
-            response = self.table.scan(ExclusiveStartKey=response["LastEvaluatedKey"])
+            response = getattr(table, method)(
+                ExclusiveStartKey=response["LastEvaluatedKey"], **kwargs
+            )
             data.extend(response["Items"])
+        return data
 
+    def _scan_segment(self, segment: int, total_segments: int, **kwargs) -> List[Dict]:
+        # runs in a scan thread, so `table` resolves to that thread's resource
+        return self._paginate(
+            "scan", Segment=segment, TotalSegments=total_segments, **kwargs
+        )
+
+    def _scan(self, segments: int, **kwargs) -> List[Dict]:
+        if segments <= 1:
+            return self._paginate("scan", **kwargs)
+        results = _get_scan_executor().map(
+            lambda segment: self._scan_segment(segment, segments, **kwargs),
+            range(segments),
+        )
+        return [item for items in results for item in items]
+
+    def find_all(
+        self,
+        selector: Optional[Dict] = None,
+        projection: Optional[List[str]] = None,
+        segments: Optional[int] = None,
+    ):
+        """
+        :param selector: equality selector
+        :param projection: fields to return, as a `ProjectionExpression`; None returns full items
+        :param segments: number of parallel scan segments when the selector cannot use a key;
+            defaults to `scan_segments`
+        """
+        selector = _to_dynamodb(selector or {})
+        key_name = index_name = None
+        if self.primary_key in selector:
+            key_name = self.primary_key
+        else:
+            for k in selector:
+                if k in self.index_keys:
+                    key_name, index_name = k, self.index_keys[k]
+                    break
+
+        kwargs = {}
+        if key_name is not None:
+            kwargs["KeyConditionExpression"] = Key(key_name).eq(selector.pop(key_name))
+            if index_name:
+                kwargs["IndexName"] = index_name
         if selector:
-            return [d for d in data if all([d[k] == v for k, v in selector.items()])]
+            kwargs["FilterExpression"] = self._get_filter(selector)
+        if projection is not None:
+            names = {f"#p{i}": k for i, k in enumerate(projection)}
+            kwargs["ProjectionExpression"] = ", ".join(names)
+            kwargs["ExpressionAttributeNames"] = names
+
+        if key_name is not None:
+            return _from_dynamodb(self._paginate("query", **kwargs))
+        return _from_dynamodb(self._scan(segments or self.scan_segments, **kwargs))
+
+    def batch_get(self, keys: List, projection: Optional[List[str]] = None) -> List[Dict]:
+        """
+        get many items by primary key, in requests of up to 100 keys; unprocessed keys are retried with
+        exponential backoff, up to `max_retries` times
+        :param keys: primary key values, or key dicts
+        :param projection: fields to return, as a `ProjectionExpression`; None returns full items
+        """
+        keys = [_to_dynamodb(k if isinstance(k, dict) else {self.primary_key: k}) for k in keys]
+        kwargs = {}
+        if projection is not None:
+            names = {f"#p{i}": k for i, k in enumerate(projection)}
+            kwargs["ProjectionExpression"] = ", ".join(names)
+            kwargs["ExpressionAttributeNames"] = names
+        items = []
+        for start in range(0, len(keys), 100):
+            request = {self.table_name: {"Keys": keys[start:start + 100], **kwargs}}
+            for attempt in range(self.max_retries + 1):
+                if attempt:
+                    # unprocessed keys are throttled reads, back off before retrying them
+                    time.sleep(min(self.retry_delay * 2 ** (attempt - 1), 5.0))
+                response = self.client.batch_get_item(RequestItems=request)
+                items.extend(response["Responses"].get(self.table_name, []))
+                request = response.get("UnprocessedKeys")
+                if not request:
+                    break
+            else:
+                raise RuntimeError(
+                    f"{len(request[self.table_name]['Keys'])} keys of {self.table_name} still unprocessed "
+                    f"after {self.max_retries} retries"
+                )
+        return _from_dynamodb(items)
 
-        return data
+    def batch_write(
+        self, items: Optional[List] = None, delete_keys: Optional[List] = None
+    ):
+        """
+        put and delete many items with batched writes (retrying unprocessed items)
+        :param items: models or dicts to put
+        :param delete_keys: primary key values, or key dicts, to delete
+        """
+        with self.table.batch_writer() as batch:
+            for item in items or []:
+                batch.put_item(Item=_to_dynamodb(item))
+            for key in delete_keys or []:
+                batch.delete_item(
+                    Key=_to_dynamodb(key if isinstance(key, dict) else {self.primary_key: key})
+                )
 
     def find(self, selector: Dict):
         try:
-            response = self.table.get_item(Key=selector)
+            response = self.table.get_item(Key=_to_dynamodb(selector))
         except ClientError as e:
             logger.error(e.response["Error"]["Message"])
         else:
             if "Item" in response:
-                return response["Item"]
+                return _from_dynamodb(response["Item"])
             else:
                 raise Exception(f"{selector} does not exist")
 
     def create(self, item: BaseModel):
-        response = self.table.put_item(Item=json.loads(item.json()))
+        response = self.table.put_item(Item=_to_dynamodb(item))
         return response
 
     def update(self, selector: Dict, item: Dict):
@@ -286,7 +1309,7 @@ class DBDynamodb(DBBase):
         return self.table.update_item(
             Key={self.primary_key: selector.get(self.primary_key)},
             UpdateExpression=expression,
-            ExpressionAttributeValues=dict(values),
+            ExpressionAttributeValues=_to_dynamodb(values),
             ExpressionAttributeNames=dict(names),
         )
 
@@ -303,14 +1326,41 @@ class DBDynamodb(DBBase):
         return "".join(update_expression)[:-1], update_names, update_values
 
     def delete(self, selector: Dict):
-        response = self.table.delete_item(Key=selector)
+        response = self.table.delete_item(Key=_to_dynamodb(selector))
         return response
 
+    def bulk_create(self, items: List[BaseModel]) -> int:
+        self.batch_write(items=items)
+        return len(items)
+
+    def bulk_delete(self, selectors: List[Dict]) -> int:
+        # deletes are batched by key, and batched deletes do not report whether the item existed: key
+        # selectors are checked with batch_get, other selectors are resolved to existing keys with find_all
+        keys = {}
+        lookup = []
+        for selector in selectors:
+            if set(selector) == {self.primary_key}:
+                lookup.append(selector[self.primary_key])
+            else:
+                keys.update(
+                    (d[self.primary_key], None)
+                    for d in self.find_all(selector, projection=[self.primary_key])
+                )
+        lookup = [k for k in dict.fromkeys(lookup) if k not in keys]
+        keys.update(
+            (d[self.primary_key], None) for d in self.batch_get(lookup, projection=[self.primary_key])
+        )
+        self.batch_write(delete_keys=list(keys))
+        return len(keys)
+
 
 class MIDatasetDBDynamodb(DBDynamodb):
     class Config(BaseSettings):
         table_name: str = "datasets"
         primary_key: str = "name"
+        scan_segments: int = 1
+        profile: Optional[str] = None
+        region: Optional[str] = None
 
         class Config:
             env_prefix = "midatasets_dynamodb_"
@@ -321,11 +1371,37 @@ class MIDatasetDBYaml(DBYaml):
         path: str = "~/.midatasets.yaml"
         table_name: str = "datasets"
         primary_key: str = "name"
+        cache_ttl: float = 5.0
 
         class Config:
             env_prefix = "midatasets_yaml_"
 
 
+class MIDatasetDBSqlite(DBSqlite):
+    """
+    SQLite dataset registry. A new database imports the datasets of the YAML registry at `migrate_from`,
+    if it exists; set `MIDATASETS_SQLITE_MIGRATE_FROM=""` to start empty.
+    """
+
+    class Config(BaseSettings):
+        path: str = "~/.midatasets.sqlite"
+        table_name: str = "datasets"
+        primary_key: str = "name"
+        indexes: List[str] = ["aws_s3_bucket"]
+        migrate_from: Optional[str] = "~/.midatasets.yaml"
+
+        class Config:
+            env_prefix = "midatasets_sqlite_"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        migrate_from = self.Config().migrate_from
+        if self._is_new and migrate_from:
+            migrate_from = os.path.expanduser(migrate_from)
+            if os.path.exists(migrate_from):
+                self.import_yaml(migrate_from)
+
+
 if MongoClient:
 
     class MIDatasetMongodb(DBMongodb):
@@ -350,5 +1426,6 @@ class MIDatasetDBComposite(DBComposite):
 class MIDatasetDBTypes(DBBase, Enum):
     composite = MIDatasetDBComposite
     yaml = MIDatasetDBYaml
+    sqlite = MIDatasetDBSqlite
     mongo = MIDatasetMongodb
     dynamodb = MIDatasetDBDynamodb
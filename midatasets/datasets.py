@@ -1,6 +1,12 @@
 import datetime
+import hashlib
+import json
 import os
-from typing import Optional, Dict, Union
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Dict, Tuple, Union
 
 from loguru import logger
 
@@ -8,6 +14,7 @@ from midatasets import configs
 from midatasets.MIReader import MIReader
 from midatasets.databases import DBBase, MIDatasetDBTypes, MIDatasetModel
 from midatasets.storage_backends import DatasetS3Backend, DatasetLocalBackend
+from midatasets.utils import IMAGE_EXTENSIONS, get_spacing_dirname
 
 _midataset_store = None
 
@@ -21,16 +28,45 @@ def get_db(db: Optional[Union[DBBase, str]] = None) -> DBBase:
         return MIDatasetDBTypes[configs.database].value()
 
 
+def _get_reader_key(name: str, spacing, kwargs: Dict) -> Tuple:
+    kwargs_hash = hashlib.md5(
+        json.dumps(kwargs, sort_keys=True, default=repr).encode()
+    ).hexdigest()
+    return name, json.dumps(spacing, default=repr), kwargs_hash
+
+
 class MIDatasetStore:
-    def __init__(self, db: Optional[Union[DBBase, str]] = None):
+    """
+    Registry of datasets.
+
+    `load(cache=True)` keeps an LRU cache of readers keyed by name, spacing and kwargs. A cached reader is
+    shared by every caller that loads it, so it must be treated as read-only. It is reused while the registry entry's `modified_time` and the local listing (`dataset.yaml`, data type and
+    spacing dirs) are unchanged, so warm loads skip re-reading the manifest and re-listing files.
+
+    :param db: database or database type
+    :param reader_cache_size: maximum number of cached readers, 0 disables the cache
+    :param reader_cache_ttl: seconds a cached reader is returned without re-checking the registry and
+        the listing, e.g. to avoid a DynamoDB round trip per load. 0 checks on every load
+    """
+
+    def __init__(
+        self,
+        db: Optional[Union[DBBase, str]] = None,
+        reader_cache_size: int = 32,
+        reader_cache_ttl: float = 0.0,
+    ):
         self._db: DBBase = get_db(db)
+        self.reader_cache_size = reader_cache_size
+        self.reader_cache_ttl = reader_cache_ttl
+        self._readers = OrderedDict()
+        self._readers_lock = threading.Lock()
 
     def get_info_all(self, selector: Optional[Dict] = None, names_only: bool = False):
-        datasets = self._db.find_all(selector=selector)
         if names_only:
+            datasets = self._db.find_all(selector=selector, projection=["name"])
             return [d["name"] for d in datasets]
         else:
-            return datasets
+            return self._db.find_all(selector=selector)
 
     def get_info(self, name: str):
         return self._db.find(selector={"name": name})
@@ -41,7 +77,7 @@ class MIDatasetStore:
         if remote:
             return DatasetS3Backend(prefix=info['aws_s3_prefix'], bucket=info['aws_s3_bucket'])
         else:
-            return DatasetLocalBackend(root_path=f"{os.path.expandvars(configs.root_path)}/{name}")
+            return DatasetLocalBackend(root_path=self.get_local_path(name))
 
     def create(self, dataset: MIDatasetModel):
         return self._db.create(item=dataset)
@@ -69,14 +105,117 @@ class MIDatasetStore:
         )
         return os.path.expandvars(path)
 
-    def load(self, name: str, spacing=0, **kwargs) -> MIReader:
-        dataset = self.get_info(name)
+    def compute_stats(
+        self,
+        name: str,
+        spacing=0,
+        remote: bool = False,
+        bins: int = 256,
+        value_range: Tuple[float, float] = (-1024.0, 3072.0),
+        num_workers: int = -1,
+    ) -> Dict:
+        """
+        Compute dataset statistics and store them in the registry entry under "stats".
+
+        Case counts and bytes per data type are taken from the listing of every spacing; intensity
+        histograms (of the images) and label voxel counts (of the labelmaps) are computed from the volumes
+        at `spacing`, in parallel. Per-case results are cached in the local dataset dir, so re-runs only
+        read cases whose files changed (mtime locally, ETag on S3).
+
+        :param name: name of the dataset
+        :param spacing: spacing of the volumes to read
+        :param remote: use the S3 listing and volumes instead of the local copy
+        :param bins: number of intensity histogram bins
+        :param value_range: range of the intensity histogram; values outside are counted in the end bins
+        :param num_workers: number of worker processes (joblib `n_jobs`)
+        :return: the statistics, see `stats.compute_dataset_stats`
+        """
+        # needs the optional ITK dependencies
+        from midatasets.stats import CACHE_DIRNAME, compute_dataset_stats
+
+        files = self.get_storage_backend(name, remote=remote).list_files(
+            ext=IMAGE_EXTENSIONS, grouped=True
+        )
+        cache_path = (
+            Path(self.get_local_path(name))
+            / CACHE_DIRNAME
+            / ("remote.json" if remote else "local.json")
+        )
+        stats = compute_dataset_stats(
+            files,
+            spacing_dirname=get_spacing_dirname(spacing),
+            cache_path=cache_path,
+            bins=bins,
+            value_range=value_range,
+            num_workers=num_workers,
+        )
+        self.update(name, {"stats": stats})
+        return stats
+
+    @staticmethod
+    def _get_reader_version(dataset: Dict, reader: MIReader) -> Tuple:
+        return (
+            dataset.get("modified_time"),
+            reader.local_backend.get_listing_version(reader.spacing),
+        )
+
+    def _get_dataset(self, name: str, spacing, **kwargs) -> Dict:
+        info = self.get_info(name)
+        if info is None:
+            raise Exception(f"Dataset {name} not found")
+        dataset = dict(info)
         dataset["spacing"] = spacing
         dataset["dir_path"] = os.path.join(
             configs.root_path, dataset.get("subpath", None) or dataset["name"]
         )
         dataset.update(kwargs)
-        return MIReader.from_dict(**dataset)
+        return dataset
+
+    def load(self, name: str, spacing=0, cache: bool = False, **kwargs) -> MIReader:
+        """
+        load a dataset reader
+        :param name: name of the dataset
+        :param spacing: spacing of the images
+        :param cache: reuse a cached reader if the dataset is unchanged. Cached readers are shared with
+            other callers and must not be modified (e.g. their `dataframe` or `spacing`, or by `download`)
+        :param kwargs: overrides of the registry entry passed to `MIReader`
+        :return: MIReader, shared with other callers when cached
+        """
+        if not cache or self.reader_cache_size <= 0:
+            return MIReader.from_dict(**self._get_dataset(name, spacing, **kwargs))
+
+        key = _get_reader_key(name, spacing, kwargs)
+        with self._readers_lock:
+            entry = self._readers.get(key)
+            if entry is not None:
+                self._readers.move_to_end(key)
+        if entry is not None and time.monotonic() - entry[1] < self.reader_cache_ttl:
+            return entry[2]
+
+        dataset = self._get_dataset(name, spacing, **kwargs)
+        reader = None
+        if entry is not None:
+            version = self._get_reader_version(dataset, entry[2])
+            if version == entry[0]:
+                reader = entry[2]
+        if reader is None:
+            reader = MIReader.from_dict(**dataset)
+            version = self._get_reader_version(dataset, reader)
+        with self._readers_lock:
+            self._readers[key] = (version, time.monotonic(), reader)
+            self._readers.move_to_end(key)
+            while len(self._readers) > self.reader_cache_size:
+                self._readers.popitem(last=False)
+        return reader
+
+    def clear_reader_cache(self, name: Optional[str] = None):
+        """
+        drop the cached readers of `name`, or all of them
+        """
+        with self._readers_lock:
+            for key in list(self._readers):
+                if name is None or key[0] == name:
+                    del self._readers[key]
 
 
 def get_midataset_store():
@@ -91,20 +230,18 @@ def set_midataset_store(db):
     _midataset_store = db
 
 
-def _load_dataset_from_db(name, **kwargs) -> MIReader:
-    dataset = get_midataset_store().get_info(name)
-    if dataset is None:
-        raise Exception(f'Dataset {name} not found')
-
-    dataset["dir_path"] = os.path.join(
-        configs.root_path, dataset.get("subpath", None) or dataset["name"]
-    )
-    dataset.update(kwargs)
-    return MIReader.from_dict(**dataset)
+def _load_dataset_from_db(name, spacing=0, **kwargs) -> MIReader:
+    return get_midataset_store().load(name, spacing=spacing, **kwargs)
 
 
 def load_dataset(name, spacing=0, dataset_path=None, **kwargs) -> MIReader:
+    """
+    load a dataset reader from `dataset_path` or, by name, from the registry.
+    Readers loaded from the registry with `cache=True` are cached and shared by the store, see
+    `MIDatasetStore.load`.
+    """
     if dataset_path:
+        kwargs.pop("cache", None)
         return MIReader(name=name, spacing=spacing, dir_path=dataset_path, **kwargs)
     else:
         return _load_dataset_from_db(name, spacing=spacing, **kwargs)
@@ -0,0 +1,157 @@
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Union
+
+import pandas as pd
+import SimpleITK as sitk
+from joblib import Parallel, delayed
+from loguru import logger
+
+from midatasets.metrics import (
+    OVERLAP_METRICS,
+    SURFACE_METRICS,
+    confusion_matrix,
+    metrics_from_confusion_matrix,
+    present_labels,
+    surface_metrics,
+)
+from midatasets.utils import load_json_cache, save_json_cache
+
+METRICS = OVERLAP_METRICS + SURFACE_METRICS
+
+CACHE_DIRNAME = ".evaluation"
+
+
+def evaluate_case(
+    name: str,
+    pred_path: str,
+    gt_path: str,
+    labels: Optional[Sequence[int]] = None,
+    metrics: Sequence[str] = OVERLAP_METRICS,
+) -> List[Dict]:
+    """
+    score one case
+    :param labels: labels to score; None scores every non-background label present in either volume
+    :return: one row per label with the case name, label and metric values
+    """
+    sitk_labelmap = sitk.ReadImage(gt_path)
+    predictions = sitk.GetArrayFromImage(sitk.ReadImage(pred_path))
+    labelmap = sitk.GetArrayFromImage(sitk_labelmap)
+    if labels is None:
+        labels = [int(l) for l in present_labels(predictions, labelmap) if l != 0]
+    cm = confusion_matrix(predictions, labelmap, labels=labels)
+    overlap = [m for m in metrics if m in OVERLAP_METRICS]
+    surface = [m for m in metrics if m in SURFACE_METRICS]
+    results = metrics_from_confusion_matrix(cm, labels=range(len(labels)), metrics=overlap)
+    if surface:
+        results.update(
+            surface_metrics(
+                predictions,
+                labelmap,
+                labels=labels,
+                spacing=sitk_labelmap.GetSpacing(),
+                metrics=surface,
+            )
+        )
+    return [
+        {"name": name, "label": int(l), **{k: float(v[i]) for k, v in results.items()}}
+        for i, l in enumerate(labels)
+    ]
+
+
+def _get_signature(pred_path: str, gt_path: str, labels, metrics) -> List:
+    return [
+        pred_path,
+        os.path.getmtime(pred_path),
+        gt_path,
+        os.path.getmtime(gt_path),
+        None if labels is None else [int(l) for l in labels],
+        list(metrics),
+    ]
+
+
+def get_cache_path(reader, pred_key: str, gt_key: str) -> Path:
+    filename = f"{pred_key}_{gt_key}".replace("/", "-") + ".json"
+    return Path(reader.dir_path) / CACHE_DIRNAME / filename
+
+
+def evaluate(
+    reader,
+    pred_key: str = "output",
+    gt_key: str = "labelmap",
+    labels: Optional[Sequence[int]] = None,
+    metrics: Sequence[str] = OVERLAP_METRICS,
+    num_workers: int = -1,
+    cache: Union[bool, str, Path] = True,
+) -> pd.DataFrame:
+    """
+    Score the `pred_key` data type of a dataset against `gt_key` for every case having both.
+
+    Cases are scored in a process pool and collected as they finish; workers only receive file paths.
+    Results are cached per case, keyed on the file paths and modification times, so re-runs only score
+    new or changed cases.
+
+    :param reader: MIReader of the dataset
+    :param pred_key: data type of the predictions, e.g. "output" or "output/l1"
+    :param gt_key: data type of the ground truth
+    :param labels: labels to score; None scores every non-background label present in each case
+    :param metrics: any of `metrics.OVERLAP_METRICS` and `metrics.SURFACE_METRICS`;
+        surface distances are in the units of the image spacing
+    :param num_workers: number of worker processes (joblib `n_jobs`)
+    :param cache: True to cache in the dataset directory, a path to a cache file, or False to disable
+    :return: DataFrame indexed by (name, label) with one column per metric;
+        e.g. `df.groupby("label").mean()` gives per-label averages
+    """
+    unknown = set(metrics) - set(METRICS)
+    if unknown:
+        raise ValueError(f"unknown metrics {unknown}, expected {METRICS}")
+    columns = [f"{pred_key}_path", f"{gt_key}_path"]
+    for column in columns:
+        if column not in reader.dataframe.columns:
+            raise KeyError(f"{column[:-5]} is not a data type of {reader.name}")
+    pairs = reader.dataframe[columns].dropna()
+    if len(pairs) < len(reader.dataframe):
+        logger.warning(
+            f"[{reader.name}] {len(reader.dataframe) - len(pairs)} cases without both {pred_key} and {gt_key}"
+        )
+
+    cache_path = None
+    if cache:
+        cache_path = (
+            get_cache_path(reader, pred_key, gt_key) if cache is True else Path(cache)
+        )
+    cached = load_json_cache(cache_path) if cache_path else {}
+
+    rows = []
+    tasks = []
+    updated = {}
+    for name, (pred_path, gt_path) in pairs.iterrows():
+        signature = _get_signature(pred_path, gt_path, labels, metrics)
+        entry = cached.get(name)
+        if entry and entry["signature"] == signature:
+            rows.extend(entry["rows"])
+            updated[name] = entry
+        else:
+            tasks.append((name, pred_path, gt_path, signature))
+    logger.info(
+        f"[{reader.name}] scoring {len(tasks)} cases, {len(pairs) - len(tasks)} cached"
+    )
+
+    try:
+        results = Parallel(n_jobs=num_workers, return_as="generator")(
+            delayed(evaluate_case)(name, pred_path, gt_path, labels, metrics)
+            for name, pred_path, gt_path, _ in tasks
+        )
+        for (name, _, _, signature), case_rows in zip(tasks, results):
+            rows.extend(case_rows)
+            updated[name] = {"signature": signature, "rows": case_rows}
+    finally:
+        # keep what was scored, even if interrupted
+        if cache_path and tasks:
+            save_json_cache(cache_path, updated)
+
+    return (
+        pd.DataFrame(rows, columns=["name", "label", *metrics])
+        .set_index(["name", "label"])
+        .sort_index()
+    )
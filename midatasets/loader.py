@@ -0,0 +1,177 @@
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+import SimpleITK as sitk
+from loguru import logger
+
+from midatasets.MIReader import MIReaderExtended
+
+BACKENDS = {"threading": ThreadPoolExecutor, "process": ProcessPoolExecutor}
+
+
+def load_case(
+    name: str, paths: Dict[str, str], transform: Optional[Callable] = None
+) -> List[Dict]:
+    """
+    load the images of one case as arrays, oriented as `MIReader.load_image`
+    :param paths: data type key -> image path
+    :param transform: optional callable applied to the sample dict, returning a sample or a list of samples
+        (e.g. patches)
+    :return: list of samples, each a dict with the case `name` and one array per key
+    """
+    sample = {"name": name}
+    for key, path in paths.items():
+        sample[key] = MIReaderExtended.get_array_from_sitk_image(sitk.ReadImage(path))
+    if transform is not None:
+        sample = transform(sample)
+    return sample if isinstance(sample, (list, tuple)) else [sample]
+
+
+def collate(samples: List[Dict]) -> Dict:
+    """
+    stack the arrays of samples into batches; other values are collected in lists
+    """
+    batch = {}
+    for key in samples[0]:
+        values = [s[key] for s in samples]
+        batch[key] = (
+            np.stack(values) if isinstance(values[0], np.ndarray) else values
+        )
+    return batch
+
+
+class CaseLoader:
+    """
+    Framework-agnostic prefetching iterator over the cases of an `MIReader`.
+
+    Upcoming cases are decoded (and transformed) in a thread or process pool while the current batch is
+    consumed. At most `prefetch` cases are in flight, so memory stays bounded. Batches are yielded in order
+    as dicts of stacked numpy arrays plus the case names.
+
+    Shuffling is deterministic given `seed` and the epoch set with `set_epoch`, so every worker of a
+    distributed job sees the same order.
+
+    `stats` reports how often the consumer had to wait for a case (queue starvation) and for how long;
+    frequent starvation means more workers or a larger `prefetch` are needed.
+
+    :param reader: MIReader of the dataset
+    :param keys: data types to load, e.g. ("image", "labelmap")
+    :param transform: optional picklable callable applied to each sample dict, e.g. patch sampling; it can
+        return a list of samples
+    :param batch_size: number of samples per batch
+    :param shuffle: shuffle the cases every epoch
+    :param seed: base seed of the shuffling
+    :param num_workers: number of decoding workers
+    :param backend: "threading" or "process"
+    :param prefetch: maximum number of cases decoded ahead
+    :param drop_last: drop the last incomplete batch
+    """
+
+    def __init__(
+        self,
+        reader,
+        keys: Sequence[str] = ("image", "labelmap"),
+        transform: Optional[Callable] = None,
+        batch_size: int = 1,
+        shuffle: bool = False,
+        seed: int = 0,
+        num_workers: int = 2,
+        backend: str = "threading",
+        prefetch: Optional[int] = None,
+        drop_last: bool = False,
+    ):
+        if backend not in BACKENDS:
+            raise ValueError(f"backend {backend} not in {list(BACKENDS)}")
+        columns = [f"{key}_path" for key in keys]
+        missing = [c for c in columns if c not in reader.dataframe.columns]
+        if missing:
+            raise KeyError(f"{missing} not in {reader.name}")
+        cases = reader.dataframe[columns].dropna()
+        if len(cases) < len(reader.dataframe):
+            logger.warning(
+                f"[{reader.name}] skipping {len(reader.dataframe) - len(cases)} cases without all of {keys}"
+            )
+        self.names = list(cases.index)
+        self.paths = [dict(zip(keys, row)) for row in cases.itertuples(index=False)]
+        self.transform = transform
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.seed = seed
+        self.epoch = 0
+        self.num_workers = max(num_workers, 1)
+        self.backend = backend
+        self.prefetch = prefetch or 2 * self.num_workers
+        self.drop_last = drop_last
+        self.stats = {}
+
+    def set_epoch(self, epoch: int):
+        self.epoch = epoch
+
+    def get_order(self) -> np.ndarray:
+        if not self.shuffle:
+            return np.arange(len(self.names))
+        return np.random.default_rng([self.seed, self.epoch]).permutation(
+            len(self.names)
+        )
+
+    def __len__(self):
+        """
+        number of batches, assuming one sample per case
+        """
+        if self.drop_last:
+            return len(self.names) // self.batch_size
+        return -(-len(self.names) // self.batch_size)
+
+    def _reset_stats(self):
+        self.stats = {"cases": 0, "batches": 0, "starved": 0, "wait_time": 0.0}
+
+    def _iter_samples(self, executor) -> Iterator[Dict]:
+        order = iter(self.get_order())
+        pending = deque()
+
+        def submit():
+            i = next(order, None)
+            if i is not None:
+                pending.append(
+                    executor.submit(load_case, self.names[i], self.paths[i], self.transform)
+                )
+
+        for _ in range(self.prefetch):
+            submit()
+        while pending:
+            future = pending.popleft()
+            if not future.done():
+                self.stats["starved"] += 1
+                start = time.perf_counter()
+                samples = future.result()
+                self.stats["wait_time"] += time.perf_counter() - start
+            else:
+                samples = future.result()
+            submit()
+            self.stats["cases"] += 1
+            yield from samples
+
+    def __iter__(self) -> Iterator[Dict]:
+        self._reset_stats()
+        executor = BACKENDS[self.backend](max_workers=self.num_workers)
+        try:
+            batch = []
+            for sample in self._iter_samples(executor):
+                batch.append(sample)
+                if len(batch) == self.batch_size:
+                    self.stats["batches"] += 1
+                    yield collate(batch)
+                    batch = []
+            if batch and not self.drop_last:
+                self.stats["batches"] += 1
+                yield collate(batch)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            if self.stats["cases"]:
+                logger.debug(
+                    f"starved on {self.stats['starved']}/{self.stats['cases']} cases, "
+                    f"waited {self.stats['wait_time']:.2f}s"
+                )
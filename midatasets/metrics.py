@@ -3,6 +3,220 @@ from __future__ import absolute_import
 from __future__ import print_function
 
 import numpy as np
+from joblib import Parallel, delayed
+from scipy import ndimage
+
+
+_BLOCK_SIZE = 1 << 20
+
+OVERLAP_METRICS = ("dice", "jaccard", "avd", "precision", "recall")
+
+
+def _as_labels(labels):
+    # an int is the number of classes, as accepted by the previous `num_classes` arguments
+    if isinstance(labels, (int, np.integer)):
+        return tuple(range(labels))
+    return tuple(labels)
+
+
+# largest value for which present labels are found by counting rather than sorting
+_MAX_DENSE_VALUE = 1 << 16
+
+
+def _as_index_array(array, name):
+    # integer view of a labelmap, rejecting non-integral values instead of truncating them
+    if array.dtype == bool:
+        return array.view(np.uint8)
+    if np.issubdtype(array.dtype, np.integer):
+        return array
+    if np.issubdtype(array.dtype, np.floating) and np.array_equal(array, np.round(array)):
+        return array.astype(np.int64)
+    raise ValueError(f"{name} must hold integer labels, got non-integral {array.dtype} values")
+
+
+def present_labels(*arrays):
+    """Finds the labels occurring in any of the arrays.
+    Args:
+        arrays (np.ndarray): integer (or integer valued) labelmaps
+    Returns:
+        np.ndarray: sorted labels
+    """
+    present = []
+    for i, array in enumerate(arrays):
+        array = _as_index_array(np.asarray(array).reshape(-1), f"array {i}")
+        if array.size == 0:
+            continue
+        vmin, vmax = int(array.min()), int(array.max())
+        if vmin >= 0 and vmax < _MAX_DENSE_VALUE:
+            counts = np.zeros(vmax + 1, dtype=np.int64)
+            for start in range(0, array.size, _BLOCK_SIZE):
+                counts += np.bincount(array[start:start + _BLOCK_SIZE], minlength=vmax + 1)
+            present.append(np.flatnonzero(counts))
+        else:
+            present.append(np.unique(array))
+    return np.unique(np.concatenate(present)) if present else np.array([], dtype=np.int64)
+
+
+def _get_integer_range(*arrays):
+    # (min, max) over integer arrays, None if any is not integer
+    if not all(np.issubdtype(a.dtype, np.integer) for a in arrays):
+        return None
+    arrays = [a for a in arrays if a.size]
+    if not arrays:
+        return 0, 0
+    return int(min(a.min() for a in arrays)), int(max(a.max() for a in arrays))
+
+
+def _map_to_labels(block, sorted_labels, order):
+    # position of each value in `labels`, len(labels) for any other value
+    index = np.searchsorted(sorted_labels, block)
+    np.clip(index, 0, len(sorted_labels) - 1, out=index)
+    found = sorted_labels[index] == block
+    return np.where(found, order[index], len(sorted_labels))
+
+
+def confusion_matrix(predictions, labelmap, num_classes=None, labels=None):
+    """Calculates the confusion matrix between predictions and labelmap in a
+        single pass with `np.bincount` over the combined index `pred * K + gt`.
+        Volumes are processed in blocks, so memory does not grow with the
+        number of voxels.
+    Args:
+        predictions (np.ndarray): integer predictions
+        labelmap (np.ndarray): integer labelmap
+        num_classes (int): size K of the matrix; defaults to the largest
+            value in predictions or labelmap + 1. Ignored with `labels`
+        labels (tuple): labels to count; values are compared for equality
+            (so float volumes are supported) and every other value is
+            counted in a last "other" class. The matrix size then depends
+            only on the number of labels, not on the values in the volumes
+    Returns:
+        np.ndarray: (K, K) counts, or (len(labels) + 1, len(labels) + 1)
+            with `labels`; rows are predicted and columns true labels
+    """
+    if predictions.shape != labelmap.shape:
+        raise ValueError(
+            f"predictions {predictions.shape} and labelmap {labelmap.shape} shapes differ"
+        )
+    predictions = predictions.reshape(-1)
+    labelmap = labelmap.reshape(-1)
+    if labels is not None:
+        labels = np.asarray(_as_labels(labels))
+        if len(np.unique(labels)) != len(labels):
+            raise ValueError(f"labels {labels.tolist()} are not unique")
+        num_classes = len(labels) + 1
+        # masks as 0/1 indices; other values are matched against `labels` as they are
+        if predictions.dtype == bool:
+            predictions = predictions.view(np.uint8)
+        if labelmap.dtype == bool:
+            labelmap = labelmap.view(np.uint8)
+        value_range = _get_integer_range(predictions, labelmap)
+        if value_range is not None and value_range[0] >= 0 and value_range[1] < _MAX_DENSE_VALUE:
+            # lookup table from value to position in `labels`
+            lut = np.full(value_range[1] + 1, len(labels), dtype=np.int64)
+            for position, label in enumerate(labels):
+                if label == int(label) and 0 <= label <= value_range[1]:
+                    lut[int(label)] = position
+
+            def to_index(block):
+                return lut[block]
+        else:
+            order = np.argsort(labels, kind="stable")
+            sorted_labels = labels[order]
+
+            def to_index(block):
+                return _map_to_labels(block, sorted_labels, order)
+    else:
+        predictions = _as_index_array(predictions, "predictions")
+        labelmap = _as_index_array(labelmap, "labelmap")
+        if predictions.size and min(predictions.min(), labelmap.min()) < 0:
+            raise ValueError("predictions and labelmap must be non-negative")
+        max_value = int(max(predictions.max(), labelmap.max())) if predictions.size else 0
+        if num_classes is None:
+            num_classes = max_value + 1
+        elif max_value >= num_classes:
+            raise ValueError(f"value {max_value} is out of range for {num_classes} classes")
+
+        def to_index(block):
+            return block.astype(np.int64)
+
+    counts = np.zeros(num_classes * num_classes, dtype=np.int64)
+    for start in range(0, predictions.size, _BLOCK_SIZE):
+        index = to_index(predictions[start:start + _BLOCK_SIZE])
+        index *= num_classes
+        index += to_index(labelmap[start:start + _BLOCK_SIZE])
+        counts += np.bincount(index, minlength=num_classes * num_classes)
+    return counts.reshape(num_classes, num_classes)
+
+
+def _safe_ratio(num, den, empty):
+    # num / den, with `empty` where den is 0
+    out = np.full(num.shape, empty, dtype=np.float64)
+    np.divide(num, den, out=out, where=den > 0)
+    return out
+
+
+def metrics_from_confusion_matrix(cm, labels=(0, 1), metrics=OVERLAP_METRICS):
+    """Derives overlap metrics for `labels` from a confusion matrix.
+        Labels missing from both predictions and labelmap score 1 for
+        dice, jaccard, precision and recall.
+    Args:
+        cm (np.ndarray): confusion matrix from `confusion_matrix`
+        labels (tuple): labels to calculate the metrics for
+        metrics (tuple): any of "dice", "jaccard", "avd", "precision", "recall"
+    Returns:
+        dict: metric name -> np.ndarray with one value per label
+    """
+    labels = _as_labels(labels)
+    unknown = set(metrics) - set(OVERLAP_METRICS)
+    if unknown:
+        raise ValueError(f"unknown metrics {unknown}, expected {OVERLAP_METRICS}")
+    # labels beyond the matrix do not occur in either volume
+    index = np.array([l for l in labels if l < cm.shape[0]], dtype=np.int64)
+    present = np.array([l < cm.shape[0] for l in labels])
+
+    tp = np.zeros(len(labels))
+    pred_count = np.zeros(len(labels))
+    gt_count = np.zeros(len(labels))
+    tp[present] = cm[index, index]
+    pred_count[present] = cm.sum(axis=1)[index]
+    gt_count[present] = cm.sum(axis=0)[index]
+    both_empty = (pred_count + gt_count) == 0
+
+    results = {}
+    for metric in metrics:
+        if metric == "dice":
+            value = _safe_ratio(2.0 * tp, pred_count + gt_count, 1.0)
+        elif metric == "jaccard":
+            value = _safe_ratio(tp, pred_count + gt_count - tp, 1.0)
+        elif metric == "avd":
+            value = np.abs(pred_count - gt_count) / (gt_count + 1e-6)
+        elif metric == "precision":
+            value = _safe_ratio(tp, pred_count, 0.0)
+            value[both_empty] = 1.0
+        else:
+            value = _safe_ratio(tp, gt_count, 0.0)
+            value[both_empty] = 1.0
+        results[metric] = value.astype(np.float32)
+    return results
+
+
+def overlap_metrics(predictions, labelmap, labels=(0, 1), metrics=OVERLAP_METRICS):
+    """Calculates several overlap metrics per class from a single confusion
+        matrix pass over the volumes.
+    Args:
+        predictions (np.ndarray): predictions
+        labelmap (np.ndarray): labelmap
+        labels (tuple): labels to calculate the metrics for
+        metrics (tuple): any of "dice", "jaccard", "avd", "precision", "recall"
+    Returns:
+        dict: metric name -> np.ndarray with one value per label
+    """
+    labels = _as_labels(labels)
+    unique_labels = list(dict.fromkeys(labels))
+    cm = confusion_matrix(predictions, labelmap, labels=unique_labels)
+    # rows/columns of `cm` are the positions in `unique_labels`
+    positions = [unique_labels.index(l) for l in labels]
+    return metrics_from_confusion_matrix(cm, labels=positions, metrics=metrics)
 
 
 def dice(predictions, labelmap, labels=(0, 1)):
@@ -11,61 +225,219 @@ def dice(predictions, labelmap, labels=(0, 1)):
     Args:
         predictions (np.ndarray): predictions
         labelmap (np.ndarray): labelmap
-        num_classes (int): number of classes to calculate the dice
-            coefficient for
+        labels (tuple): labels to calculate the dice coefficient for
     Returns:
         np.ndarray: dice coefficient per class
     """
-    num_classes = len(labels)
-    dice_scores = np.zeros((num_classes))
-    for i, l in enumerate(labels):
-        tmp_den = (np.sum(predictions == l) + np.sum(labelmap == l))
-        tmp_dice = 2. * np.sum((predictions == l) * (labelmap == l)) / \
-                   tmp_den if tmp_den > 0 else 1.
-        dice_scores[i] = tmp_dice
-    return dice_scores.astype(np.float32)
+    return overlap_metrics(predictions, labelmap, labels, metrics=("dice",))["dice"]
 
 
-def jaccard(predictions, labels, num_classes):
-    dice_overlap = dice(predictions, labels, num_classes)
-    return dice_overlap / (2 - dice_overlap)
+def jaccard(predictions, labelmap, labels=(0, 1)):
+    """Calculates the Jaccard index for each class between labelmap and
+        predictions.
+    Args:
+        predictions (np.ndarray): predictions
+        labelmap (np.ndarray): labelmap
+        labels (tuple or int): labels, or number of classes, to calculate
+            the index for
+    Returns:
+        np.ndarray: jaccard index per class
+    """
+    return overlap_metrics(predictions, labelmap, labels, metrics=("jaccard",))[
+        "jaccard"
+    ]
 
 
-def abs_vol_difference(predictions, labels, num_classes):
+def abs_vol_difference(predictions, labelmap, labels=(0, 1)):
     """Calculates the absolute volume difference for each class between
-        labels and predictions.
+        labelmap and predictions.
     Args:
         predictions (np.ndarray): predictions
-        labels (np.ndarray): labels
-        num_classes (int): number of classes to calculate avd for
+        labelmap (np.ndarray): labelmap
+        labels (tuple or int): labels, or number of classes, to calculate
+            avd for
     Returns:
         np.ndarray: avd per class
     """
+    return overlap_metrics(predictions, labelmap, labels, metrics=("avd",))["avd"]
+
+
+SURFACE_METRICS = ("hausdorff95", "assd")
+
+
+def _union_bbox(pred_box, gt_box, shape, margin):
+    boxes = [b for b in (pred_box, gt_box) if b is not None]
+    return tuple(
+        slice(max(min(b[d].start for b in boxes) - margin, 0),
+              min(max(b[d].stop for b in boxes) + margin, shape[d]))
+        for d in range(len(shape))
+    )
 
-    avd = np.zeros((num_classes))
-    eps = 1e-6
-    for i in range(num_classes):
-        avd[i] = np.abs(np.sum(predictions == i) - np.sum(labels == i)
-                        ) / (np.float(np.sum(labels == i)) + eps)
 
-    return avd.astype(np.float32)
+def _surface(mask):
+    return mask & ~ndimage.binary_erosion(mask, border_value=0)
 
 
-def crossentropy(predictions, labels, logits=True):
-    """Calculates the crossentropy loss between predictions and labels
+def _label_surface_distances(pred_mask, gt_mask, sampling):
+    # distances from each surface voxel of one mask to the surface of the other
+    pred_surface = _surface(pred_mask)
+    gt_surface = _surface(gt_mask)
+    pred_to_gt = ndimage.distance_transform_edt(~gt_surface, sampling=sampling)[pred_surface]
+    gt_to_pred = ndimage.distance_transform_edt(~pred_surface, sampling=sampling)[gt_surface]
+    return pred_to_gt, gt_to_pred
+
+
+def _label_surface_metrics(pred_mask, gt_mask, sampling, metrics):
+    if not pred_mask.any() or not gt_mask.any():
+        return {m: np.inf for m in metrics}
+    pred_to_gt, gt_to_pred = _label_surface_distances(pred_mask, gt_mask, sampling)
+    results = {}
+    for metric in metrics:
+        if metric == "hausdorff95":
+            results[metric] = max(np.percentile(pred_to_gt, 95), np.percentile(gt_to_pred, 95))
+        else:
+            results[metric] = (pred_to_gt.sum() + gt_to_pred.sum()) / (pred_to_gt.size + gt_to_pred.size)
+    return results
+
+
+def surface_metrics(predictions, labelmap, labels=(1,), spacing=None, metrics=SURFACE_METRICS, num_workers=1):
+    """Calculates surface distance metrics per class. The distance transforms
+        are restricted to the bounding box of each label in predictions and
+        labelmap, so their cost depends on the label size rather than the
+        volume size.
     Args:
-        prediction (np.ndarray): predictions
-        labels (np.ndarray): labels
-        logits (bool): flag whether predictions are logits or probabilities
+        predictions (np.ndarray): integer predictions
+        labelmap (np.ndarray): integer labelmap
+        labels (tuple): labels to calculate the metrics for
+        spacing (tuple): voxel spacing as returned by SimpleITK's `GetSpacing`
+            (x, y, z), for arrays from `sitk.GetArrayFromImage` (z, y, x);
+            None uses unit spacing
+        metrics (tuple): any of "hausdorff95", "assd"
+        num_workers (int): number of labels processed in parallel
+    Returns:
+        dict: metric name -> np.ndarray with one distance per label; 0 if the
+            label is in neither volume and inf if it is missing from one
+    """
+    labels = _as_labels(labels)
+    unknown = set(metrics) - set(SURFACE_METRICS)
+    if unknown:
+        raise ValueError(f"unknown metrics {unknown}, expected {SURFACE_METRICS}")
+    if predictions.shape != labelmap.shape:
+        raise ValueError(
+            f"predictions {predictions.shape} and labelmap {labelmap.shape} shapes differ"
+        )
+    if 0 in labels:
+        raise ValueError("surface metrics are not defined for the background label 0")
+    sampling = None if spacing is None else tuple(spacing)[::-1]
+    # bounding boxes of all labels in one pass per volume
+    pred_boxes = ndimage.find_objects(_as_index_array(predictions, "predictions"))
+    gt_boxes = ndimage.find_objects(_as_index_array(labelmap, "labelmap"))
+
+    def get_box(boxes, label):
+        return boxes[label - 1] if label <= len(boxes) else None
+
+    def compute(label):
+        pred_box, gt_box = get_box(pred_boxes, label), get_box(gt_boxes, label)
+        if pred_box is None and gt_box is None:
+            return {m: 0.0 for m in metrics}
+        box = _union_bbox(pred_box, gt_box, predictions.shape, margin=1)
+        return _label_surface_metrics(predictions[box] == label, labelmap[box] == label, sampling, metrics)
+
+    results = Parallel(n_jobs=num_workers, backend="threading")(delayed(compute)(l) for l in labels)
+    return {m: np.array([r[m] for r in results], dtype=np.float32) for m in metrics}
+
+
+def hausdorff95(predictions, labelmap, labels=(1,), spacing=None, num_workers=1):
+    """Calculates the 95th percentile symmetric Hausdorff distance for each
+        class between labelmap and predictions.
+    Args:
+        predictions (np.ndarray): predictions
+        labelmap (np.ndarray): labelmap
+        labels (tuple): labels to calculate the distance for
+        spacing (tuple): SimpleITK (x, y, z) voxel spacing
+        num_workers (int): number of labels processed in parallel
     Returns:
-        float: crossentropy error
+        np.ndarray: hausdorff95 per class
     """
+    return surface_metrics(predictions, labelmap, labels, spacing, ("hausdorff95",), num_workers)["hausdorff95"]
+
 
-    if logits:
-        maxes = np.amax(predictions, axis=-1, keepdims=True)
-        softexp = np.exp(predictions - maxes)
-        softm = softexp / np.sum(softexp, axis=-1, keepdims=True)
+def assd(predictions, labelmap, labels=(1,), spacing=None, num_workers=1):
+    """Calculates the average symmetric surface distance for each class
+        between labelmap and predictions.
+    Args:
+        predictions (np.ndarray): predictions
+        labelmap (np.ndarray): labelmap
+        labels (tuple): labels to calculate the distance for
+        spacing (tuple): SimpleITK (x, y, z) voxel spacing
+        num_workers (int): number of labels processed in parallel
+    Returns:
+        np.ndarray: assd per class
+    """
+    return surface_metrics(predictions, labelmap, labels, spacing, ("assd",), num_workers)["assd"]
+
+
+def crossentropy(predictions, labels, logits=True, per_class=False, block_size=_BLOCK_SIZE):
+    """Calculates the crossentropy loss between predictions and labels.
+        The volume is processed in blocks of voxels in float32, with a
+        log-sum-exp softmax for logits, so memory does not grow with the
+        volume size.
+    Args:
+        prediction (np.ndarray): predictions with classes on the last axis
+        labels (np.ndarray): one-hot (or soft) labels with the same shape as
+            predictions, or an integer labelmap with the shape of predictions
+            without the class axis
+        logits (bool): flag whether predictions are logits or probabilities
+        per_class (bool): also return the mean loss of the voxels of each class
+        block_size (int): number of values processed at once
+    Returns:
+        float: crossentropy error, and np.ndarray of per class losses (nan
+            for classes without voxels) if `per_class`
+    """
+    num_classes = predictions.shape[-1]
+    if labels.shape == predictions.shape[:-1]:
+        is_integer = True
+        labels = labels.reshape(-1)
+    elif labels.shape == predictions.shape:
+        is_integer = False
+        labels = labels.reshape(-1, num_classes)
     else:
-        softm = predictions
-    loss = np.mean(-1. * np.sum(labels * np.log(softm + 1e-8), axis=-1))
-    return loss.astype(np.float32)
+        raise ValueError(
+            f"labels {labels.shape} must have the shape of predictions {predictions.shape} "
+            f"with or without the class axis"
+        )
+    predictions = predictions.reshape(-1, num_classes)
+    num_voxels = predictions.shape[0]
+
+    total = 0.
+    class_loss = np.zeros(num_classes)
+    class_weight = np.zeros(num_classes)
+    rows = max(block_size // num_classes, 1)
+    for start in range(0, num_voxels, rows):
+        # log probabilities of the block
+        log_p = predictions[start:start + rows].astype(np.float32)
+        if logits:
+            log_p -= np.amax(log_p, axis=-1, keepdims=True)
+            log_p -= np.log(np.sum(np.exp(log_p), axis=-1, keepdims=True))
+        else:
+            log_p += 1e-8
+            np.log(log_p, out=log_p)
+
+        if is_integer:
+            block_labels = labels[start:start + rows].astype(np.intp, copy=False)
+            loss = -log_p[np.arange(len(block_labels)), block_labels]
+            class_loss += np.bincount(block_labels, weights=loss, minlength=num_classes)
+            class_weight += np.bincount(block_labels, minlength=num_classes)
+        else:
+            block_labels = labels[start:start + rows].astype(np.float32, copy=False)
+            loss = -(block_labels * log_p)
+            class_loss += np.sum(loss, axis=0)
+            class_weight += np.sum(block_labels, axis=0)
+        total += np.sum(loss, dtype=np.float64)
+
+    loss = np.float32(total / num_voxels)
+    if not per_class:
+        return loss
+    per_class_loss = np.full(num_classes, np.nan)
+    np.divide(class_loss, class_weight, out=per_class_loss, where=class_weight > 0)
+    return loss, per_class_loss.astype(np.float32)
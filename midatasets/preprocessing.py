@@ -2,55 +2,150 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import gzip
+import itertools
 import math
+import os
+import shutil
+import tempfile
+import threading
 from typing import Optional
 
 import SimpleITK as sitk
+import nibabel as nib
 import numpy as np
+from joblib import Parallel, delayed
 from scipy import ndimage
 from skimage.morphology import skeletonize
 
 
-def whitening(image):
-    image = image.astype(np.float32)
-    return (image - np.mean(image)) / (np.std(image) + np.finfo(float).eps)
+_BLOCK_SIZE = 1 << 18
 
 
-def mat2gray(im):
-    im = im.astype(np.float32)
-    return (im - np.min(im)) / (np.max(im) - np.min(im))
+def _iter_blocks(image, block_size=_BLOCK_SIZE):
+    flat = np.ravel(image)
+    for start in range(0, flat.size, block_size):
+        yield flat[start:start + block_size]
 
 
-def normalise_zero_one(image, vmin=None, vmax=None):
-    if vmax is None:
-        vmax = np.max(image)
-    if vmin is None:
-        vmin = np.min(image)
+def min_max(image):
+    """
+    Computes min and max in a single pass over the image, reducing cache-sized blocks for both.
+    """
+    vmin, vmax = None, None
+    for block in _iter_blocks(image):
+        bmin, bmax = block.min(), block.max()
+        vmin = bmin if vmin is None or bmin < vmin else vmin
+        vmax = bmax if vmax is None or bmax > vmax else vmax
+    return vmin, vmax
+
+
+def merge_moments(a, b):
+    """
+    Merges two (count, mean, M2) moments, where M2 is the sum of squared deviations from the mean
+    (Chan et al.). Numerically stable, unlike accumulating sums of squares.
+    """
+    n_a, mean_a, m2_a = a
+    n_b, mean_b, m2_b = b
+    n = n_a + n_b
+    if n == 0:
+        return 0, 0., 0.
+    delta = mean_b - mean_a
+    return n, mean_a + delta * n_b / n, m2_a + m2_b + delta * delta * n_a * n_b / n
+
+
+def moments(image):
+    """
+    Computes (count, mean, M2) in a single pass, merging float64 moments of cache-sized blocks.
+    Moments of different arrays can be combined with `merge_moments`.
+    """
+    result = (0, 0., 0.)
+    for block in _iter_blocks(image):
+        block = block.astype(np.float64)
+        mean = block.mean()
+        block -= mean
+        result = merge_moments(result, (block.size, mean, np.dot(block, block)))
+    return result
+
+
+def mean_std(image):
+    """
+    Computes mean and standard deviation in a single pass, see `moments`.
+    """
+    n, mean, m2 = moments(image)
+    return mean, math.sqrt(m2 / n)
+
+
+def _subtract_scale(image, offset, scale, out=None):
+    """
+    Computes `(image - offset) * scale` as float32 into `out` (allocated if None) without extra temporaries.
+    `out` may be `image` itself for in-place operation on float32 arrays.
+    """
+    if out is None:
+        out = np.empty(image.shape, dtype=np.float32)
+    np.subtract(image, offset, out=out, casting='unsafe')
+    out *= scale
+    return out
+
+
+def whitening(image, out=None):
+    mean, std = mean_std(image)
+    return _subtract_scale(image, mean, 1. / (std + np.finfo(float).eps), out=out)
+
 
-    image = image.astype(np.float32)
-    return np.clip((image - vmin) / (vmax - vmin + np.finfo(float).eps), 0, 1)
+def mat2gray(im, out=None):
+    vmin, vmax = min_max(im)
+    return _subtract_scale(im, vmin, np.float64(1.) / (np.float64(vmax) - np.float64(vmin)), out=out)
 
 
-def normalise_one_one(image, vmin=None, vmax=None):
-    if vmax is None:
-        vmax = np.max(image)
-    if vmin is None:
-        vmin = np.min(image)
+def normalise_zero_one(image, vmin=None, vmax=None, out=None):
+    """
+    Normalises to [0, 1] using vmin/vmax, computed in a single pass over the image if not given.
+    Pass `out` (e.g. `out=image` for float32 images) to write the result without allocating.
+    """
+    if vmin is None or vmax is None:
+        image_min, image_max = min_max(image)
+        vmin = image_min if vmin is None else vmin
+        vmax = image_max if vmax is None else vmax
+    vmin, vmax = float(vmin), float(vmax)
+    out = _subtract_scale(image, vmin, 1. / (vmax - vmin + np.finfo(float).eps), out=out)
+    return np.clip(out, 0, 1, out=out)
+
 
-    return 2 * normalise_zero_one(image, vmin, vmax) - 1
+def normalise_one_one(image, vmin=None, vmax=None, out=None):
+    out = normalise_zero_one(image, vmin, vmax, out=out)
+    out *= 2
+    out -= 1
+    return out
 
 
-def normalise_range(image, nrange=(-1, 1), vmin=None, vmax=None):
+def normalise_range(image, nrange=(-1, 1), vmin=None, vmax=None, out=None):
     u = nrange[0]
     v = nrange[1]
-    return (v - u) * normalise_zero_one(image, vmin, vmax) - (v - u) / 2
+    out = normalise_zero_one(image, vmin, vmax, out=out)
+    out *= v - u
+    out -= (v - u) / 2
+    return out
 
 
-def clip_outliers(image, percentile_lower=0.5, percentile_upper=99.5):
-    cut_off_lower = np.percentile(image, percentile_lower)
-    cut_off_upper = np.percentile(image, percentile_upper)
+def percentiles(image, q):
+    """
+    Linearly interpolated percentiles (as `np.percentile`) from a single `np.partition` of one copy of the image
+    in its own dtype, selecting all required ranks at once.
+    """
+    flat = np.ravel(image)
+    ranks = np.asarray(q, dtype=np.float64) / 100. * (flat.size - 1)
+    lower, upper = np.floor(ranks).astype(np.intp), np.ceil(ranks).astype(np.intp)
+    partitioned = np.partition(flat, np.unique(np.concatenate([lower, upper])))
+    lower_values = partitioned[lower].astype(np.float64)
+    upper_values = partitioned[upper].astype(np.float64)
+    return lower_values + (upper_values - lower_values) * (ranks - lower)
+
 
-    return np.clip(image, cut_off_lower, cut_off_upper)
+def clip_outliers(image, percentile_lower=0.5, percentile_upper=99.5, out=None):
+    cut_off_lower, cut_off_upper = percentiles(image, [percentile_lower, percentile_upper])
+
+    return np.clip(image, cut_off_lower, cut_off_upper, out=out)
 
 
 def pad_image_to_size(image, img_size=(64, 64, 64), loc=(2, 2, 2), **kwargs):
@@ -115,35 +210,380 @@ def resize_image_with_crop_or_pad(image, img_size=(64, 64, 64), loc=(2, 2, 2), *
     return np.pad(image[tuple(slicer)], to_padding, **kwargs)
 
 
-def sitk_resample(sitk_image, min_spacing, interpolation=sitk.sitkLinear):
-    resampleSliceFilter = sitk.ResampleImageFilter()
+_resample_filters = threading.local()
+_MAX_CACHED_FILTERS = 16
+
+
+def set_sitk_num_threads(num_threads: int):
+    """
+    Sets the default number of threads used by SimpleITK filters in this process.
+    Use 1 (or a small number) when resampling many images in parallel workers to avoid oversubscription.
+    """
+    sitk.ProcessObject.SetGlobalDefaultNumberOfThreads(num_threads)
 
-    # Resample slice to isotropic
+
+def get_resample_geometry(sitk_image, spacing=None, size=None):
+    """
+    Computes the output spacing and size for resampling `sitk_image` (or an `sitk.ImageFileReader` after
+    `ReadImageInformation`) to either a target `spacing` (isotropic scalar or per axis, e.g. [0.8, 0.8, 3])
+    or a target `size` (per axis), keeping the physical extent.
+    """
     original_spacing = sitk_image.GetSpacing()
     original_size = sitk_image.GetSize()
+    ndims = len(original_size)
+    if size is not None:
+        size = [int(s) for s in size]
+        new_spacing = [original_spacing[i] * original_size[i] / size[i] for i in range(ndims)]
+        return new_spacing, size
+    if spacing is None:
+        raise ValueError("Either spacing or size must be given")
+    if isinstance(spacing, (int, float)):
+        spacing = [spacing] * ndims
+    new_spacing = [float(s) for s in spacing]
+    new_size = [max(1, int(round(original_size[i] * (original_spacing[i] / new_spacing[i])))) for i in range(ndims)]
+    return new_spacing, new_size
+
+
+def _get_resample_filter(key):
+    """
+    Returns a ResampleImageFilter configured for `key`, reused across calls with the same output grid.
+    Filters are cached per thread since a filter cannot execute concurrently.
+    """
+    filters = getattr(_resample_filters, "filters", None)
+    if filters is None:
+        filters = _resample_filters.filters = {}
+    resample_filter = filters.pop(key, None)
+    if resample_filter is None:
+        spacing, size, interpolation, default_value, num_threads = key
+        resample_filter = sitk.ResampleImageFilter()
+        resample_filter.SetOutputSpacing(spacing)
+        resample_filter.SetSize(size)
+        resample_filter.SetInterpolator(interpolation)
+        resample_filter.SetTransform(sitk.Transform())
+        resample_filter.SetDefaultPixelValue(default_value)
+        if num_threads is not None:
+            resample_filter.SetNumberOfThreads(num_threads)
+        if len(filters) >= _MAX_CACHED_FILTERS:
+            filters.pop(next(iter(filters)))
+    filters[key] = resample_filter
+    return resample_filter
+
+
+def sitk_resample(sitk_image, min_spacing=None, interpolation=sitk.sitkLinear, size=None, default_value=0.,
+                  num_threads: Optional[int] = None):
+    """
+    Resamples `sitk_image` to a new grid with the same origin and direction.
+
+    Parameters
+    ----------
+    sitk_image: sitk.Image
+        image to resample
+    min_spacing: float or list
+        target spacing, isotropic if scalar or per axis (e.g. [0.8, 0.8, 3])
+    interpolation: int
+        SimpleITK interpolator
+    size: list, optional
+        target size per axis, used instead of `min_spacing`
+    default_value: float
+        value of voxels mapped outside the input image
+    num_threads: int, optional
+        number of SimpleITK threads; defaults to the global SimpleITK setting
+
+    Returns
+    -------
+    sitk.Image
+        resampled image
+    """
+    new_spacing, new_size = get_resample_geometry(sitk_image, spacing=min_spacing, size=size)
+    key = (tuple(new_spacing), tuple(new_size), interpolation, float(default_value), num_threads)
+    resample_filter = _get_resample_filter(key)
+    resample_filter.SetOutputDirection(sitk_image.GetDirection())
+    resample_filter.SetOutputOrigin(sitk_image.GetOrigin())
+    return resample_filter.Execute(sitk_image)
 
-    new_spacing = [min_spacing, min_spacing, min_spacing]
-    new_size = [int(round(original_size[0] * (original_spacing[0] / min_spacing))),
-                int(round(original_size[1] * (original_spacing[1] / min_spacing))),
-                int(round(original_size[2] * (original_spacing[2] / min_spacing)))]
 
-    resampleSliceFilter.SetOutputSpacing(new_spacing)
-    resampleSliceFilter.SetSize(new_size)
-    resampleSliceFilter.SetInterpolator(interpolation)
-    resampleSliceFilter.SetOutputDirection(sitk_image.GetDirection())
-    resampleSliceFilter.SetOutputOrigin(sitk_image.GetOrigin())
-    resampleSliceFilter.SetTransform(sitk.Transform())
-    resampleSliceFilter.SetDefaultPixelValue(sitk_image.GetPixelIDValue())
+LABEL_INTERPOLATORS = {
+    "nearest": sitk.sitkNearestNeighbor,
+    "linear": sitk.sitkLabelLinear,
+    "gaussian": sitk.sitkLabelGaussian,
+}
 
-    return resampleSliceFilter.Execute(sitk_image)
+
+def _get_slab_geometry(reference, input_slices, new_spacing, new_size, z_start, num_slices, margin):
+    """
+    Output origin and size of the z-slab starting at output slice `z_start`, and the input z range
+    (with `margin` extra slices) needed to resample it. `reference` is any image with the input geometry.
+    """
+    direction = np.array(reference.GetDirection()).reshape(3, 3)
+    origin = np.array(reference.GetOrigin()) + direction[:, 2] * new_spacing[2] * z_start
+    slab_size = list(new_size)
+    slab_size[2] = min(num_slices, new_size[2] - z_start)
+
+    input_z = []
+    for corner in itertools.product(*[(0, s - 1) for s in slab_size]):
+        point = origin + direction @ (np.array(corner) * np.array(new_spacing))
+        input_z.append(reference.TransformPhysicalPointToContinuousIndex(point.tolist())[2])
+    z0 = int(np.clip(math.floor(min(input_z)) - margin, 0, input_slices - 1))
+    z1 = int(np.clip(math.ceil(max(input_z)) + margin + 1, z0 + 1, input_slices))
+    return origin.tolist(), slab_size, z0, z1
+
+
+def _resample_slab(image, new_spacing, slab_size, origin, interpolation, default_value=0.):
+    resample_filter = sitk.ResampleImageFilter()
+    resample_filter.SetOutputSpacing(new_spacing)
+    resample_filter.SetSize(slab_size)
+    resample_filter.SetOutputDirection(image.GetDirection())
+    resample_filter.SetOutputOrigin(origin)
+    resample_filter.SetInterpolator(interpolation)
+    resample_filter.SetTransform(sitk.Transform())
+    resample_filter.SetDefaultPixelValue(default_value)
+    resample_filter.SetNumberOfThreads(1)
+    return sitk.GetArrayFromImage(resample_filter.Execute(image))
+
+
+def _get_slab_margin(input_spacing, new_spacing):
+    # enough input slices around each slab for the interpolation kernel
+    return 3 + int(math.ceil(new_spacing[2] / input_spacing[2]))
+
+
+def _resample_labelmap_slab(labelmap, new_spacing, new_size, z_start, num_slices, interpolation, margin):
+    origin, slab_size, z0, z1 = _get_slab_geometry(
+        labelmap, labelmap.GetSize()[2], new_spacing, new_size, z_start, num_slices, margin
+    )
+    return _resample_slab(labelmap[:, :, z0:z1], new_spacing, slab_size, origin, interpolation)
+
+
+def sitk_resample_labelmap(labelmap, min_spacing=None, size=None, mode: str = "linear", slab_size: int = 32,
+                           num_workers: Optional[int] = None):
+    """
+    Resamples a multi-label labelmap without the aliasing of nearest neighbour interpolation.
+
+    With `mode="linear"` or `"gaussian"` each label is interpolated separately and every output voxel takes
+    the label with the highest interpolated value (ITK's label interpolators, so no one-hot volume is built).
+    The output is processed in z-slabs of `slab_size` output slices, bounding the temporary memory per slab,
+    and slabs are resampled in parallel by `num_workers` threads. Nearest neighbour is resampled in one go.
+
+    Parameters
+    ----------
+    labelmap: sitk.Image
+        integer labelmap
+    min_spacing: float or list
+        target spacing, isotropic if scalar or per axis
+    size: list, optional
+        target size per axis, used instead of `min_spacing`
+    mode: str
+        one of "nearest", "linear" or "gaussian"
+    slab_size: int
+        number of output slices resampled at once; None resamples the whole volume in one go
+    num_workers: int, optional
+        number of threads resampling slabs in parallel (or SimpleITK threads when resampling in one go);
+        defaults to the global SimpleITK setting
+
+    Returns
+    -------
+    sitk.Image
+        resampled labelmap
+    """
+    if mode not in LABEL_INTERPOLATORS:
+        raise ValueError(f"mode {mode} not in {list(LABEL_INTERPOLATORS.keys())}")
+    interpolation = LABEL_INTERPOLATORS[mode]
+    new_spacing, new_size = get_resample_geometry(labelmap, spacing=min_spacing, size=size)
+    if mode == "nearest" or labelmap.GetDimension() != 3 or slab_size is None or slab_size >= new_size[2]:
+        return sitk_resample(labelmap, new_spacing, interpolation=interpolation, num_threads=num_workers)
+
+    margin = _get_slab_margin(labelmap.GetSpacing(), new_spacing)
+    tasks = [
+        delayed(_resample_labelmap_slab)(labelmap, new_spacing, new_size, z_start, slab_size, interpolation, margin)
+        for z_start in range(0, new_size[2], slab_size)
+    ]
+    if num_workers is None:
+        num_workers = sitk.ProcessObject.GetGlobalDefaultNumberOfThreads()
+    slabs = Parallel(n_jobs=num_workers, backend="threading")(tasks)
+
+    output = sitk.GetImageFromArray(np.concatenate(slabs, axis=0))
+    output.SetSpacing(new_spacing)
+    output.SetOrigin(labelmap.GetOrigin())
+    output.SetDirection(labelmap.GetDirection())
+    return output
+
+
+def _get_nifti_header(reference, new_spacing, new_size, dtype):
+    """
+    NIfTI header matching the geometry SimpleITK would write, converting ITK's LPS to NIfTI's RAS coordinates.
+    """
+    lps_to_ras = np.diag([-1., -1., 1.])
+    affine = np.eye(4)
+    affine[:3, :3] = lps_to_ras @ np.array(reference.GetDirection()).reshape(3, 3) @ np.diag(new_spacing)
+    affine[:3, 3] = lps_to_ras @ np.array(reference.GetOrigin())
+
+    header = nib.Nifti1Header()
+    header.set_data_dtype(dtype)
+    header.set_data_shape(new_size)
+    header.set_xyzt_units("mm", "sec")
+    header.set_qform(affine, code=1)
+    header.set_sform(affine, code=1)
+    header.set_zooms(new_spacing)
+    header.set_data_offset(352)
+    return header
+
+
+def sitk_resample_to_file(input_path, output_path, min_spacing=None, size=None, interpolation=sitk.sitkLinear,
+                          slab_size: int = 32, default_value=0., compression_level: Optional[int] = None):
+    """
+    Out-of-core resampling for volumes that do not fit in memory.
+
+    The input is read in z-slabs (with enough overlap for the interpolation kernel) and each resampled slab is
+    appended to the output NIfTI (`.nii` or `.nii.gz`) as soon as it is computed, so peak memory is bounded by
+    `slab_size` output slices plus the corresponding input slices rather than by the whole volume.
+    A `.nii.gz` input is first decompressed to a temporary `.nii` next to the output, since every slab read from
+    a gzip stream decompresses from the start of the file; other compressed inputs (e.g. gzip encoded `.nrrd`
+    or compressed `.mha`) are not streamable and are decoded for every slab.
+    Voxel values match resampling the whole image in memory with `sitk_resample`; with non-identity directions
+    the slab grid coordinates can round differently in the last bit, so linear values may differ by an ulp.
+
+    Parameters
+    ----------
+    input_path: str
+        image readable by SimpleITK; uncompressed `.nii`, `.nrrd` and `.mha` files, and `.nii.gz`, are streamed
+    output_path: str
+        output `.nii` or `.nii.gz` path
+    min_spacing: float or list
+        target spacing, isotropic if scalar or per axis
+    size: list, optional
+        target size per axis, used instead of `min_spacing`
+    interpolation: int
+        SimpleITK interpolator, e.g. `sitk.sitkLinear` or `LABEL_INTERPOLATORS["linear"]`
+    slab_size: int
+        number of output slices computed and written at once
+    default_value: float
+        value of voxels mapped outside the input image
+    compression_level: int, optional
+        gzip level (1-9) for `.nii.gz` outputs; None uses level 6
+    """
+    output_path = str(output_path)
+    if not output_path.endswith((".nii", ".nii.gz")):
+        raise ValueError(f"{output_path}: out-of-core resampling only writes .nii or .nii.gz")
+
+    if not str(input_path).endswith(".nii.gz"):
+        return _resample_to_file(input_path, output_path, min_spacing, size, interpolation, slab_size,
+                                 default_value, compression_level)
+    with tempfile.NamedTemporaryFile(suffix=".nii", dir=os.path.dirname(os.path.abspath(output_path))) as tmp:
+        with gzip.open(input_path, "rb") as f:
+            shutil.copyfileobj(f, tmp, 1 << 20)
+        tmp.flush()
+        return _resample_to_file(tmp.name, output_path, min_spacing, size, interpolation, slab_size,
+                                 default_value, compression_level)
+
+
+def _resample_to_file(input_path, output_path, min_spacing, size, interpolation, slab_size, default_value,
+                      compression_level):
+    reader = sitk.ImageFileReader()
+    reader.SetFileName(str(input_path))
+    reader.ReadImageInformation()
+    input_size = reader.GetSize()
+    if len(input_size) != 3:
+        raise ValueError(f"{input_path}: out-of-core resampling only supports 3D images")
+    new_spacing, new_size = get_resample_geometry(reader, spacing=min_spacing, size=size)
+    margin = _get_slab_margin(reader.GetSpacing(), new_spacing)
+
+    # 1-voxel image carrying the input geometry, used for index/physical point conversions
+    reference = sitk.Image([1, 1, 1], reader.GetPixelID())
+    reference.SetSpacing(reader.GetSpacing())
+    reference.SetOrigin(reader.GetOrigin())
+    reference.SetDirection(reader.GetDirection())
+
+    if output_path.endswith(".gz"):
+        f = gzip.open(output_path, "wb", compresslevel=6 if compression_level is None else compression_level)
+    else:
+        f = open(output_path, "wb")
+    with f:
+        for z_start in range(0, new_size[2], slab_size):
+            origin, output_slab_size, z0, z1 = _get_slab_geometry(
+                reference, input_size[2], new_spacing, new_size, z_start, slab_size, margin
+            )
+            reader.SetExtractIndex([0, 0, z0])
+            reader.SetExtractSize([input_size[0], input_size[1], z1 - z0])
+            input_slab = reader.Execute()
+            # the reader computes the extracted origin in single precision; use the exact one
+            input_slab.SetOrigin(reference.TransformIndexToPhysicalPoint([0, 0, z0]))
+            slab = _resample_slab(input_slab, new_spacing, output_slab_size, origin, interpolation, default_value)
+            if z_start == 0:
+                header = _get_nifti_header(reference, new_spacing, new_size, slab.dtype)
+                # single-file NIfTI header including the empty extension flag, data follows at offset 352
+                header.write_to(f)
+            f.write(np.ascontiguousarray(slab).tobytes())
+
+
+def compute_label_stats(labelmap, labels=None, centroids=True):
+    """
+    Computes bounding boxes, voxel counts and centroids for all labels of an integer labelmap in a single pass.
+    Background (0) is ignored.
+
+    Parameters
+    ----------
+    labelmap: np.ndarray
+        integer (or integer valued) labelmap
+    labels: list or tuple, optional
+        restrict the returned statistics to these labels
+    centroids: bool
+        whether to compute the centroid of each label (computed within its bounding box)
+
+    Returns
+    -------
+    dict
+        {label: {"slices": tuple of slices, "count": int, "centroid": tuple of floats or None}}
+    """
+    labelmap = np.asarray(labelmap)
+    if labelmap.dtype.kind not in "iu":
+        labelmap = labelmap.astype(np.intp)
+    counts = np.bincount(labelmap.ravel())
+    if labels is not None:
+        labels = set(int(l) for l in labels)
+
+    stats = {}
+    for label, slices in enumerate(ndimage.find_objects(labelmap), start=1):
+        if slices is None or (labels is not None and label not in labels):
+            continue
+        centroid = None
+        if centroids:
+            coords = np.argwhere(labelmap[slices] == label)
+            centroid = tuple(float(c + s.start) for c, s in zip(coords.mean(axis=0), slices))
+        stats[label] = {"slices": slices, "count": int(counts[label]), "centroid": centroid}
+    return stats
+
+
+def get_label_slices(labelmap, label, stats=None):
+    """
+    Returns the bounding box slices of `label`, or None if the label is not present.
+    If `stats` from `compute_label_stats` are given they are used instead of scanning the labelmap.
+    """
+    is_int_label = label > 0 and int(label) == label
+    if stats is not None and is_int_label:
+        return stats[label]["slices"] if label in stats else None
+    if not is_int_label:
+        # background and non-integer labels are not tracked by find_objects on the integer labelmap
+        slices = ndimage.find_objects(labelmap == label)
+        return slices[0] if len(slices) > 0 else None
+    labelmap = np.asarray(labelmap)
+    if labelmap.dtype.kind not in "iu":
+        labelmap = labelmap.astype(np.intp)
+    slices = ndimage.find_objects(labelmap, max_label=int(label))
+    return slices[int(label) - 1] if len(slices) >= label else None
+
+
+def _get_label_slices_or_raise(labelmap, label, stats=None):
+    slices = get_label_slices(labelmap, label, stats=stats)
+    if slices is None:
+        raise ValueError(f"label {label} not found in labelmap")
+    return slices
 
 
 def extract_alldims_mid_slices_at_label(image, labelmap: Optional[np.ndarray] = None, label: Optional[str] = None,
-                                        offset=0, is_tight=False):
+                                        offset=0, is_tight=False, stats: Optional[dict] = None):
     if labelmap is None or label is None:
         label = None
     if label is not None:
-        slices = ndimage.find_objects(labelmap == label)[0]
+        slices = _get_label_slices_or_raise(labelmap, label, stats=stats)
     else:
         slices = []
         for i in range(3):
@@ -168,13 +608,12 @@ def extract_alldims_mid_slices_at_label(image, labelmap: Optional[np.ndarray] =
         return (images,)
 
 
-def extract_vol_at_label(image, labelmap, label=None, vol_size=[32, 32, 32], offset=[0, 0, 0], is_rand=False):
+def extract_vol_at_label(image, labelmap, label=None, vol_size=[32, 32, 32], offset=[0, 0, 0], is_rand=False,
+                         stats: Optional[dict] = None):
     ndims = len(image.shape)
     if label is not None:
-        slices = ndimage.find_objects(labelmap == label)
-        if len(slices) > 0:
-            slices = slices[0]
-        else:
+        slices = get_label_slices(labelmap, label, stats=stats)
+        if slices is None:
             slices = [slice(0, image.shape[i]) for i in range(ndims)]
             # print('No valid label!')
     else:
@@ -232,10 +671,10 @@ def extract_vol_at_label(image, labelmap, label=None, vol_size=[32, 32, 32], off
 
 
 def extract_vol_at_label_along_skel(image, labelmap, label=None, vol_size=(32, 32, 32), offset=(0, 0, 0),
-                                    is_rand=False):
+                                    is_rand=False, stats: Optional[dict] = None):
     ndims = len(image.shape)
     if label is not None:
-        slices = ndimage.find_objects(labelmap == label)[0]
+        slices = _get_label_slices_or_raise(labelmap, label, stats=stats)
     else:
         slices = []
         for i in range(ndims):
@@ -305,9 +744,10 @@ def extract_vol_at_label_along_skel(image, labelmap, label=None, vol_size=(32, 3
     return simage, slabelmap
 
 
-def extract_mid_slice_at_label(image, labelmap, label=None, offset=0, is_tight=False, dim=0):
+def extract_mid_slice_at_label(image, labelmap, label=None, offset=0, is_tight=False, dim=0,
+                               stats: Optional[dict] = None):
     if label is not None:
-        slices = ndimage.find_objects(labelmap == label)[0]
+        slices = _get_label_slices_or_raise(labelmap, label, stats=stats)
     else:
         slices = []
         for i in range(3):
@@ -331,9 +771,10 @@ def extract_mid_slice_at_label(image, labelmap, label=None, offset=0, is_tight=F
     return simage, slabelmap, mid
 
 
-def extract_all_slices_at_label(image, labelmap, label=None, step=2, dim=0, is_tight=False):
+def extract_all_slices_at_label(image, labelmap, label=None, step=2, dim=0, is_tight=False,
+                                stats: Optional[dict] = None):
     if label is not None:
-        slices = ndimage.find_objects(labelmap == label)[0]
+        slices = _get_label_slices_or_raise(labelmap, label, stats=stats)
     else:
         slices = []
         for i in range(3):
@@ -353,9 +794,62 @@ def extract_all_slices_at_label(image, labelmap, label=None, step=2, dim=0, is_t
     return images, labelmaps
 
 
-def extract_max_area_slice_at_label(image, labelmap, label=1, offset=0, is_tight=False, dim=0):
+def _slice_areas(mask):
+    """
+    Per-slice foreground areas along every axis of a 3D mask, sharing the partial reduction between axes.
+    """
+    areas_01 = mask.sum(axis=2, dtype=np.int64)
+    return [areas_01.sum(axis=1), areas_01.sum(axis=0), mask.sum(axis=(0, 1), dtype=np.int64)]
+
+
+def find_max_area_slices(labelmap, labels=None, stats: Optional[dict] = None):
+    """
+    Finds, for each label and each axis, the slice with the largest label area.
+    Areas are computed with vectorised reductions over the label's bounding box only.
+
+    Parameters
+    ----------
+    labelmap: np.ndarray
+        3D integer labelmap
+    labels: list or tuple, optional
+        labels to process; defaults to all labels present
+    stats: dict, optional
+        precomputed statistics from `compute_label_stats`
+
+    Returns
+    -------
+    dict
+        {label: [(slice_index, area) for each axis]}
+    """
+    if stats is None:
+        stats = compute_label_stats(labelmap, labels=labels, centroids=False)
+    if labels is None:
+        labels = list(stats.keys())
+
+    result = {}
+    for label in labels:
+        slices = _get_label_slices_or_raise(labelmap, label, stats=stats)
+        areas = _slice_areas(labelmap[slices] == label)
+        best = []
+        for axis, axis_areas in enumerate(areas):
+            idx = int(np.argmax(axis_areas))
+            best.append((idx + slices[axis].start, int(axis_areas[idx])))
+        result[label] = best
+    return result
+
+
+def _extract_slice(image, labelmap, slices, dim, index, is_tight):
+    slicesc = list(slices)
+    slicesc[dim] = index
+    if not is_tight:
+        slicesc = [slicesc[j] if j == dim else slice(None) for j in range(3)]
+    return image[slicesc[0], slicesc[1], slicesc[2]], labelmap[slicesc[0], slicesc[1], slicesc[2]]
+
+
+def extract_max_area_slice_at_label(image, labelmap, label=1, offset=0, is_tight=False, dim=0,
+                                    stats: Optional[dict] = None):
     if label is not None:
-        slices = ndimage.find_objects(labelmap == label)[0]
+        slices = _get_label_slices_or_raise(labelmap, label, stats=stats)
     else:
         slices = []
         for i in range(3):
@@ -363,28 +857,34 @@ def extract_max_area_slice_at_label(image, labelmap, label=1, offset=0, is_tight
 
     assert (dim <= len(image.shape))
 
-    i = dim
+    other_axes = tuple(j for j in range(3) if j != dim)
+    areas = np.sum(labelmap[tuple(slices)] == label, axis=other_axes)
+    max_slice = slices[dim].start + int(np.argmax(areas)) if np.any(areas > 0) else -1
 
-    max_area = 0
-    max_slice = -1
-    for si in range(slices[i].start, slices[i].stop):
-        slicesc = list(slices)
-        slicesc[i] = si
+    simage, slabelmap = _extract_slice(image, labelmap, slices, dim, max_slice, is_tight)
 
-        slabelmap = labelmap[slicesc[0], slicesc[1], slicesc[2]]
-        area = np.sum(slabelmap == label)
-        if area > max_area:
-            max_area = area
-            max_slice = si
+    return simage, slabelmap, max_slice
 
-    slicesc = list(slices)
-    slicesc[i] = max_slice
-    if not is_tight:
-        slicesc = [slicesc[j] if j == i else slice(None) for j in range(3)]
-    simage = image[slicesc[0], slicesc[1], slicesc[2]]
-    slabelmap = labelmap[slicesc[0], slicesc[1], slicesc[2]]
 
-    return simage, slabelmap, max_slice
+def extract_max_area_slices_at_labels(image, labelmap, labels=None, is_tight=False, stats: Optional[dict] = None):
+    """
+    Multi-label, multi-axis variant of `extract_max_area_slice_at_label`.
+
+    Returns
+    -------
+    dict
+        {label: [(image_slice, labelmap_slice, slice_index) for each axis]}
+    """
+    if stats is None:
+        stats = compute_label_stats(labelmap, labels=labels, centroids=False)
+    result = {}
+    for label, best in find_max_area_slices(labelmap, labels=labels, stats=stats).items():
+        slices = stats[label]["slices"]
+        result[label] = [
+            _extract_slice(image, labelmap, slices, dim, index, is_tight) + (index,)
+            for dim, (index, _) in enumerate(best)
+        ]
+    return result
 
 
 def extract_class_balanced_example_array(image, label, example_size=(1, 64, 64), n_examples=1, classes=2,
@@ -1,22 +1,46 @@
 from pathlib import Path
-from typing import Union, List
+from typing import Union, List, Optional
 
 from joblib import Parallel, delayed
 from loguru import logger
 from midatasets.MIReader import MImage
-from midatasets.preprocessing import sitk_resample
-from midatasets.utils import get_spacing_dirname
+from midatasets.preprocessing import sitk_resample, sitk_resample_labelmap
+from midatasets import configs
+from midatasets.utils import (
+    get_spacing_dirname,
+    get_threads_per_worker,
+    replace_image_extension,
+    write_image,
+)
 import SimpleITK as sitk
 
 
 def resample_mimage(
-    image: MImage, target_spacing: Union[float, int], overwrite: bool = False
+    image: MImage,
+    target_spacing: Union[float, int, List[float]],
+    overwrite: bool = False,
+    num_threads: Optional[int] = None,
+    labelmap_mode: str = "nearest",
+    output_ext: Optional[str] = None,
+    compression_level: Optional[int] = None,
 ):
-    output_path = image.local_path.replace(
-        image.resolution_dir, get_spacing_dirname(target_spacing)
+    """
+    resample `image` to `target_spacing`, writing it next to the original under the spacing directory
+    :param output_ext: format of the output; defaults to `configs.output_ext`
+    :param compression_level: compression level of the output; defaults to `configs.output_compression_level`
+    """
+    output_ext = output_ext or configs.output_ext
+    if compression_level is None:
+        compression_level = configs.output_compression_level
+    output_path = replace_image_extension(
+        image.local_path.replace(
+            image.resolution_dir, get_spacing_dirname(target_spacing)
+        ),
+        output_ext,
     )
-    prefix = image.prefix.replace(
-        image.resolution_dir, get_spacing_dirname(target_spacing)
+    prefix = replace_image_extension(
+        image.prefix.replace(image.resolution_dir, get_spacing_dirname(target_spacing)),
+        output_ext,
     )
     if not overwrite and Path(output_path).exists():
         return MImage(
@@ -27,21 +51,24 @@ def resample_mimage(
             validate_key=False,
         )
     sitk_image = sitk.ReadImage(image.local_path)
-    interpolation = (
-        sitk.sitkLinear if "image" in image.key else sitk.sitkNearestNeighbor
-    )
-    interpolation_str = (
-        "sitk.sitkLinear" if "image" in image.key else "sitk.sitkNearestNeighbor"
-    )
+    interpolation_str = "sitk.sitkLinear" if "image" in image.key else labelmap_mode
     logger.info(
         f"[{image.key}/{Path(output_path).name}] resampling from {sitk_image.GetSpacing()} "
         f"to {target_spacing} using {interpolation_str}"
     )
-    sitk_image: sitk.Image = sitk_resample(
-        sitk_image, target_spacing, interpolation=interpolation
-    )
+    if "image" in image.key:
+        sitk_image: sitk.Image = sitk_resample(
+            sitk_image,
+            target_spacing,
+            interpolation=sitk.sitkLinear,
+            num_threads=num_threads,
+        )
+    else:
+        sitk_image: sitk.Image = sitk_resample_labelmap(
+            sitk_image, target_spacing, mode=labelmap_mode, num_workers=num_threads
+        )
     Path(output_path).parent.mkdir(parents=True, exist_ok=True)
-    sitk.WriteImage(sitk_image, output_path)
+    write_image(sitk_image, output_path, compression_level=compression_level)
     return MImage(
         bucket=image.bucket,
         prefix=prefix,
@@ -53,10 +80,25 @@ def resample_mimage(
 
 def resample_mimage_parallel(
     images: List[MImage],
-    target_spacing: Union[float, int],
+    target_spacing: Union[float, int, List[float]],
     overwrite: bool = False,
     n_jobs: int = -1,
+    num_threads: Optional[int] = None,
+    labelmap_mode: str = "nearest",
+    output_ext: Optional[str] = None,
+    compression_level: Optional[int] = None,
 ):
+    if num_threads is None:
+        num_threads = get_threads_per_worker(n_jobs)
     Parallel(n_jobs=n_jobs)(
-        delayed(resample_mimage)(image, target_spacing, overwrite) for image in images
+        delayed(resample_mimage)(
+            image,
+            target_spacing,
+            overwrite,
+            num_threads,
+            labelmap_mode,
+            output_ext,
+            compression_level,
+        )
+        for image in images
     )
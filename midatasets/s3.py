@@ -1,15 +1,48 @@
+import asyncio
+import functools
 import logging
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
 import boto3
+from botocore.config import Config
 from botocore.exceptions import ClientError
 import os
 from midatasets import configs
 
-s3_client = boto3.client("s3", endpoint_url=configs.aws_endpoint_url)
+_s3_client = None
+_s3_client_lock = threading.Lock()
+
+
+def get_s3_client():
+    """
+    Shared S3 client, created on first use so credentials are resolved when needed rather than at import.
+    botocore clients are thread-safe; the connection pool is sized for the async API below.
+    """
+    global _s3_client
+    if _s3_client is None:
+        with _s3_client_lock:
+            if _s3_client is None:
+                _s3_client = boto3.client(
+                    "s3",
+                    endpoint_url=configs.aws_endpoint_url,
+                    config=Config(max_pool_connections=configs.s3_max_concurrency),
+                )
+    return _s3_client
+
+
+def __getattr__(name):
+    # `s3_client` used to be created at import, keep it importable
+    if name == "s3_client":
+        return get_s3_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 def check_exists_s3(bucket: str, prefix: str):
 
     try:
-        s3_client.head_object(Bucket=bucket, Key=prefix)
+        get_s3_client().head_object(Bucket=bucket, Key=prefix)
         return True
     except ClientError:
         return False
@@ -31,8 +64,56 @@ def upload_file(file_name, bucket, prefix=None):
     # Upload the file
 
     try:
-        response = s3_client.upload_file(file_name, bucket, prefix)
+        response = get_s3_client().upload_file(file_name, bucket, prefix)
     except ClientError as e:
         logging.error(e)
         return False
     return True
+
+
+_executor = None
+_semaphores = weakref.WeakKeyDictionary()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=configs.s3_max_concurrency, thread_name_prefix="midatasets-s3"
+        )
+    return _executor
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    # semaphores are bound to an event loop, so keep one per loop
+    loop = asyncio.get_running_loop()
+    if loop not in _semaphores:
+        _semaphores[loop] = asyncio.Semaphore(configs.s3_max_concurrency)
+    return _semaphores[loop]
+
+
+async def run_async(fn, *args, **kwargs):
+    """
+    Run a blocking S3 call without blocking the event loop.
+
+    Calls share the pooled `get_s3_client()` connections and run on a dedicated thread pool; at most
+    `configs.s3_max_concurrency` calls per event loop are in flight, the others wait on a semaphore.
+    """
+    async with _get_semaphore():
+        return await asyncio.get_running_loop().run_in_executor(
+            _get_executor(), functools.partial(fn, *args, **kwargs)
+        )
+
+
+async def acheck_exists_s3(bucket: str, prefix: str):
+    return await run_async(check_exists_s3, bucket, prefix)
+
+
+async def aupload_file(file_name, bucket, prefix=None):
+    """Async counterpart of `upload_file`"""
+    return await run_async(upload_file, file_name, bucket, prefix)
+
+
+async def adownload_file(bucket: str, prefix: str, file_name):
+    """Download an S3 object to `file_name` without blocking the event loop"""
+    await run_async(get_s3_client().download_file, bucket, prefix, str(file_name))
@@ -0,0 +1,115 @@
+import os
+from pathlib import Path
+from typing import Dict, List, Union
+
+import numpy as np
+import pandas as pd
+
+INDEX_FILENAME = "index.csv"
+KEYS = ("images", "labelmaps")
+
+
+def write_case_slices(
+    store_path: Union[str, Path], name: str, images: List, labelmaps: List
+) -> int:
+    """
+    Write the 2D slices of one case as `.npy` shards of a slice store
+    :param store_path: root directory of the store
+    :param name: case name, used as the shard filename
+    :param images: list of 2D image slices
+    :param labelmaps: list of 2D labelmap slices
+    :return: number of slices written
+    """
+    for key, slices in zip(KEYS, (images, labelmaps)):
+        shard_dir = Path(store_path) / key
+        shard_dir.mkdir(parents=True, exist_ok=True)
+        if len(slices) > 0:
+            np.save(shard_dir / f"{name}.npy", np.stack(slices))
+    return len(images)
+
+
+def write_index(store_path: Union[str, Path], counts: Dict[str, int]):
+    """
+    Write the index mapping each case shard to its number of slices. Cases without slices are dropped.
+    """
+    index = pd.DataFrame(
+        [{"name": name, "count": count} for name, count in counts.items() if count > 0],
+        columns=["name", "count"],
+    )
+    tmp_path = Path(store_path) / (INDEX_FILENAME + ".tmp")
+    index.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, Path(store_path) / INDEX_FILENAME)
+
+
+def is_slice_store(path: Union[str, Path]) -> bool:
+    return (Path(path) / INDEX_FILENAME).exists()
+
+
+class SliceStoreView:
+    """
+    Lazy, indexable view over one key (`images` or `labelmaps`) of a `SliceStore`
+    """
+
+    def __init__(self, store: "SliceStore", key: str):
+        self.store = store
+        self.key = key
+
+    def __len__(self):
+        return len(self.store)
+
+    def __getitem__(self, index: int) -> np.ndarray:
+        return self.store.get(index, self.key)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+class SliceStore:
+    """
+    Lazy reader for 2D slices exported by `MIReader.export_2d_slices`.
+
+    Slices are stored per case as `.npy` shards which are memory-mapped on first access,
+    so indexing only reads the requested slices from disk.
+
+    `store[i]` returns an `(image, labelmap)` tuple and `store["images"]`/`store["labelmaps"]`
+    return lazy per-key views, matching the keys of the previous `.npz` export.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        index = pd.read_csv(self.path / INDEX_FILENAME, dtype={"name": str})
+        self.names: List[str] = list(index["name"])
+        self.offsets = np.concatenate([[0], np.cumsum(index["count"].values)])
+        self._shards: Dict[str, Dict[str, np.ndarray]] = {key: {} for key in KEYS}
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def __getitem__(self, index: Union[int, str]):
+        if isinstance(index, str):
+            if index not in KEYS:
+                raise KeyError(f"{index} not in {KEYS}")
+            return SliceStoreView(self, index)
+        return tuple(self.get(index, key) for key in KEYS)
+
+    def _locate(self, index: int):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f"slice index {index} out of range for {len(self)} slices")
+        case_idx = int(np.searchsorted(self.offsets, index, side="right")) - 1
+        return self.names[case_idx], index - int(self.offsets[case_idx])
+
+    def get_case(self, name: str, key: str = "images") -> np.ndarray:
+        """
+        memory-mapped array with all slices of case `name`
+        """
+        shards = self._shards[key]
+        if name not in shards:
+            shards[name] = np.load(self.path / key / f"{name}.npy", mmap_mode="r")
+        return shards[name]
+
+    def get(self, index: int, key: str = "images") -> np.ndarray:
+        name, local_index = self._locate(index)
+        return np.asarray(self.get_case(name, key)[local_index])
@@ -0,0 +1,224 @@
+import os
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import SimpleITK as sitk
+from joblib import Parallel, delayed
+from loguru import logger
+
+from midatasets.preprocessing import merge_moments
+from midatasets.s3 import get_s3_client
+from midatasets.utils import load_json_cache, save_json_cache
+
+CACHE_DIRNAME = ".stats"
+
+INTENSITY_RANGE = (-1024.0, 3072.0)
+
+# small enough for blocks to stay in cache
+_BLOCK_SIZE = 1 << 18
+
+
+def _read_array(path: str) -> np.ndarray:
+    if not path.startswith("s3://"):
+        return sitk.GetArrayFromImage(sitk.ReadImage(path))
+    bucket, key = path[len("s3://"):].split("/", 1)
+    suffix = "".join(Path(key).suffixes)
+    fd, local_path = tempfile.mkstemp(suffix=suffix)
+    os.close(fd)
+    try:
+        get_s3_client().download_file(bucket, key, local_path)
+        return sitk.GetArrayFromImage(sitk.ReadImage(local_path))
+    finally:
+        os.remove(local_path)
+
+
+def intensity_stats(
+    image: np.ndarray, bins: int = 256, value_range: Tuple[float, float] = INTENSITY_RANGE
+) -> Dict:
+    """
+    intensity histogram over fixed bins, so that histograms of different cases can be summed;
+    values outside `value_range` are counted in the first and last bins
+    """
+    lo, hi = value_range
+    scale = bins / (hi - lo)
+    flat = image.reshape(-1)
+    histogram = np.zeros(bins, dtype=np.int64)
+    result = (0, 0.0, 0.0)
+    for start in range(0, flat.size, _BLOCK_SIZE):
+        block = flat[start : start + _BLOCK_SIZE].astype(np.float64)
+        # moments of the block, see `preprocessing.moments`
+        mean = block.mean()
+        block -= mean
+        result = merge_moments(result, (block.size, mean, np.dot(block, block)))
+        # bin index, in place
+        block -= lo - mean
+        block *= scale
+        np.clip(block, 0, bins - 1, out=block)
+        histogram += np.bincount(block.astype(np.intp), minlength=bins)
+    return {
+        "voxels": int(flat.size),
+        "min": float(flat.min()) if flat.size else None,
+        "max": float(flat.max()) if flat.size else None,
+        "mean": float(result[1]),
+        "m2": float(result[2]),
+        "histogram": histogram.tolist(),
+    }
+
+
+def label_counts(labelmap: np.ndarray) -> Dict[str, int]:
+    """
+    voxel count of each label; keys are strings so records stay valid JSON/BSON documents
+    """
+    flat = labelmap.reshape(-1)
+    if not np.issubdtype(flat.dtype, np.integer) or (flat.size and flat.min() < 0):
+        values, counts = np.unique(flat, return_counts=True)
+        # integral float labels as "1" rather than "1.0", valid as field names
+        return {
+            str(int(v) if float(v).is_integer() else v): int(c) for v, c in zip(values.tolist(), counts)
+        }
+    counts = np.zeros(int(flat.max()) + 1 if flat.size else 0, dtype=np.int64)
+    for start in range(0, flat.size, _BLOCK_SIZE):
+        counts += np.bincount(
+            flat[start : start + _BLOCK_SIZE].astype(np.intp), minlength=len(counts)
+        )
+    return {str(l): int(c) for l, c in enumerate(counts) if c}
+
+
+def compute_case_stats(
+    image_path: Optional[str],
+    labelmap_path: Optional[str],
+    bins: int = 256,
+    value_range: Tuple[float, float] = INTENSITY_RANGE,
+) -> Dict:
+    """
+    statistics of one case; paths can be local or on S3
+    :return: dict with "intensity" (see `intensity_stats`) and/or "labels" (see `label_counts`)
+    """
+    stats = {}
+    if image_path:
+        stats["intensity"] = intensity_stats(_read_array(image_path), bins, value_range)
+    if labelmap_path:
+        stats["labels"] = label_counts(_read_array(labelmap_path))
+    return stats
+
+
+def get_file_info(file: Dict) -> Tuple[object, int]:
+    """
+    (version, size in bytes) of a listed file: the ETag for S3 objects, the mtime for local files
+    """
+    if file.get("etag") is not None:
+        return file["etag"], file.get("size") or 0
+    stat = os.stat(file["path"])
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _aggregate_intensity(cases: List[Dict], bins: int, value_range) -> Optional[Dict]:
+    cases = [c for c in cases if c["voxels"]]
+    if not cases:
+        return None
+    voxels, mean, m2 = 0, 0.0, 0.0
+    for c in cases:
+        voxels, mean, m2 = merge_moments((voxels, mean, m2), (c["voxels"], c["mean"], c["m2"]))
+    return {
+        "bins": bins,
+        "range": list(value_range),
+        "histogram": np.sum([c["histogram"] for c in cases], axis=0).tolist(),
+        "voxels": voxels,
+        "min": min(c["min"] for c in cases),
+        "max": max(c["max"] for c in cases),
+        "mean": mean,
+        "std": (m2 / voxels) ** 0.5,
+    }
+
+
+def _aggregate_labels(cases: List[Dict]) -> Dict:
+    labels = {}
+    for counts in cases:
+        for label, count in counts.items():
+            entry = labels.setdefault(label, {"voxels": 0, "cases": 0})
+            entry["voxels"] += count
+            entry["cases"] += 1
+    return dict(sorted(labels.items(), key=lambda x: float(x[0])))
+
+
+def compute_dataset_stats(
+    files: Dict,
+    spacing_dirname: str,
+    cache_path: Optional[Path] = None,
+    image_key: str = "image",
+    labelmap_key: str = "labelmap",
+    bins: int = 256,
+    value_range: Tuple[float, float] = INTENSITY_RANGE,
+    num_workers: int = -1,
+) -> Dict:
+    """
+    Aggregate statistics of a dataset listing.
+
+    Case counts and bytes are taken from the listing of every spacing. Intensity histograms and label voxel
+    counts are computed from the volumes at `spacing_dirname`, in a process pool. Per-case results are
+    cached at `cache_path`, keyed on the file versions (mtime or ETag), so re-runs only read new or
+    changed cases.
+
+    :param files: listing grouped by spacing and case, as returned by `list_files(grouped=True)`
+    :param spacing_dirname: spacing dir of the volumes to read, e.g. "native"
+    :param cache_path: JSON file of per-case results, None disables the cache
+    :param bins: number of intensity histogram bins
+    :param value_range: range of the intensity histogram
+    :param num_workers: number of worker processes (joblib `n_jobs`)
+    :return: dict with "spacings" (list of the dirname, cases and bytes per data type of each spacing),
+        "intensity", "labels" (voxels and cases per label) and "computed_time". Spacing dirnames, e.g.
+        "subsampled1.5mm", are values rather than keys, as dotted field names are rejected by MongoDB
+    """
+    spacings = []
+    for spacing, cases in files.items():
+        data_bytes = {}
+        for case in cases.values():
+            for key, file in case.items():
+                data_bytes[key] = data_bytes.get(key, 0) + get_file_info(file)[1]
+        spacings.append({
+            "dirname": spacing,
+            "cases": sum(1 for case in cases.values() if image_key in case),
+            "bytes": data_bytes,
+            "total_bytes": sum(data_bytes.values()),
+        })
+
+    cached = load_json_cache(cache_path) if cache_path else {}
+    updated = {}
+    tasks = []
+    for name, case in files.get(spacing_dirname, {}).items():
+        paths = [case[k]["path"] if k in case else None for k in (image_key, labelmap_key)]
+        signature = [
+            None if k not in case else get_file_info(case[k])[0]
+            for k in (image_key, labelmap_key)
+        ] + [paths, bins, list(value_range)]
+        entry = cached.get(name)
+        if entry and entry["signature"] == signature:
+            updated[name] = entry
+        else:
+            tasks.append((name, paths, signature))
+    logger.info(f"computing stats of {len(tasks)} cases, {len(updated)} cached")
+
+    try:
+        results = Parallel(n_jobs=num_workers, return_as="generator")(
+            delayed(compute_case_stats)(image_path, labelmap_path, bins, value_range)
+            for _, (image_path, labelmap_path), _ in tasks
+        )
+        for (name, _, signature), case_stats in zip(tasks, results):
+            updated[name] = {"signature": signature, "stats": case_stats}
+    finally:
+        # keep what was computed, even if interrupted
+        if cache_path and (tasks or len(updated) != len(cached)):
+            save_json_cache(cache_path, updated)
+
+    case_stats = [entry["stats"] for entry in updated.values()]
+    return {
+        "spacings": spacings,
+        "intensity": _aggregate_intensity(
+            [s["intensity"] for s in case_stats if "intensity" in s], bins, value_range
+        ),
+        "labels": _aggregate_labels([s["labels"] for s in case_stats if "labels" in s]),
+        "computed_time": datetime.now().isoformat(),
+    }
@@ -51,6 +51,8 @@ class DatasetStorageBackendBase:
 
         existing_data_types = []
         for dirname in existing_data_type_dirs:
+            if dirname.startswith("."):
+                continue  # caches, e.g. of evaluation and stats
             if dirname in dirname_to_datatype:
                 existing_data_types.append(dirname_to_datatype[dirname])
             else:
@@ -183,6 +185,7 @@ class DatasetS3Backend(DatasetStorageBackendBase):
                             "path": f"s3://{self.bucket}/{k}",
                             "last_modified": v["LastModified"],
                             "size": v["Size"],
+                            "etag": v["ETag"],
                         }
                     )
         return results
@@ -329,6 +332,44 @@ class DatasetLocalBackend(DatasetStorageBackendBase):
     def get_base_dir(self):
         return str(Path(self.root_path))
 
+    def get_listing_version(self, spacing: Optional[Union[float, int]] = None) -> Tuple:
+        """
+        cheap fingerprint of the dataset listing: modification times of `dataset.yaml`, the dataset dir,
+        the data type dirs and their `<spacing>` subdirs (also one level down, e.g. `labelmaps/l1/native`).
+        Adding or removing files in these dirs changes it, without listing any files.
+        """
+        spacing_dirname = get_spacing_dirname(spacing) if spacing is not None else None
+        dirnames = {v["dirname"] for v in configs.data_types}
+
+        def subdirs(path):
+            try:
+                with os.scandir(path) as it:
+                    return [e for e in it if e.is_dir()]
+            except OSError:
+                return []
+
+        version = []
+        for path in (self.root_path, os.path.join(self.root_path, "dataset.yaml")):
+            try:
+                version.append((path, os.stat(path).st_mtime_ns))
+            except OSError:
+                pass
+        for data_type_dir in subdirs(self.root_path):
+            if data_type_dir.name not in dirnames:
+                continue
+            dirs = [data_type_dir]
+            for subdir in subdirs(data_type_dir.path):
+                dirs.append(subdir)
+                if spacing_dirname is None:
+                    dirs.extend(subdirs(subdir.path))
+                elif subdir.name != spacing_dirname:
+                    dirs.extend(
+                        e for e in subdirs(subdir.path) if e.name == spacing_dirname
+                    )
+            for d in dirs:
+                version.append((d.path, d.stat().st_mtime_ns))
+        return tuple(version)
+
     def list_files_at_dir(
         self,
         sub_path: Optional[str] = None,
@@ -1,7 +1,9 @@
+import json
 import os
+import tempfile
 from collections import defaultdict
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 try:
     import SimpleITK as sitk
@@ -36,7 +38,7 @@ def printProgressBar(
         length      - Optional  : character length of bar (Int)
         fill        - Optional  : bar fill character (Str)
     """
-    percent = ("0:." + str(decimals) + "f}").format(100 * (iteration / float(total)))
+    percent = ("{0:." + str(decimals) + "f}").format(100 * (iteration / float(total)))
     filledLength = int(length * iteration // total)
     bar = fill * filledLength + "-" * (length - filledLength)
     print("\r%s |%s| %s%% %s" % (prefix, bar, percent, suffix), end="\r")
@@ -45,6 +47,46 @@ def printProgressBar(
         print()
 
 
+def get_threads_per_worker(num_workers: int) -> int:
+    """
+    Number of threads each of `num_workers` parallel workers can use without oversubscribing the CPUs.
+    `num_workers` follows joblib's `n_jobs` convention, so -1 means one worker per CPU.
+    """
+    cpu_count = os.cpu_count() or 1
+    if num_workers < 0:
+        num_workers = max(cpu_count + 1 + num_workers, 1)
+    return max(cpu_count // max(num_workers, 1), 1)
+
+
+def load_json_cache(path: Path) -> Dict:
+    """
+    Contents of a JSON cache file; empty if it does not exist or cannot be read
+    """
+    if not path.exists():
+        return {}
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        logger.warning(f"Ignoring unreadable cache {path}")
+        return {}
+
+
+def save_json_cache(path: Path, data: Dict):
+    """
+    Write a JSON cache file, atomically so that an interrupted write keeps the previous contents
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = tempfile.NamedTemporaryFile("w", dir=path.parent, prefix=f".{path.name}.", delete=False)
+    try:
+        with tmp as f:
+            json.dump(data, f)
+        os.replace(tmp.name, path)
+    finally:
+        if os.path.exists(tmp.name):
+            os.remove(tmp.name)
+
+
 def read_rtstruct(structure):
     contours = []
     for i in range(len(structure.ROIContourSequence)):
@@ -108,6 +150,48 @@ def safe_sitk_dicom_read(img_list, *args, **kwargs):
     return sitk.ReadImage(s_img_list, *args, **kwargs)
 
 
+IMAGE_EXTENSIONS = (".nii.gz", ".nii", ".nrrd", ".mha")
+
+
+def get_image_extension(path) -> Optional[str]:
+    """
+    image extension of `path` from `IMAGE_EXTENSIONS`, or None if it is not an image
+    """
+    for ext in IMAGE_EXTENSIONS:
+        if str(path).endswith(ext):
+            return ext
+    return None
+
+
+def replace_image_extension(path, ext: str) -> str:
+    """
+    replace the image extension of `path` with `ext`, e.g. `a/b.nii.gz` -> `a/b.nrrd`
+    """
+    current = get_image_extension(path)
+    if current is None:
+        raise ValueError(f"{path} does not have one of {IMAGE_EXTENSIONS}")
+    return str(path)[: -len(current)] + ext
+
+
+def write_image(sitk_image, path, compression_level: Optional[int] = None):
+    """
+    Write a SimpleITK image in the format given by the extension of `path`.
+
+    `compression_level` None keeps SimpleITK's default: gzip for `.nii.gz` and raw encoding for `.nii`, `.nrrd`
+    and `.mha`. A level > 0 compresses with that level (gzip for `.nii.gz`/`.nrrd`, zlib for `.mha`) and 0
+    disables compression where the format allows it.
+    """
+    if compression_level is None:
+        sitk.WriteImage(sitk_image, str(path))
+    else:
+        sitk.WriteImage(
+            sitk_image,
+            str(path),
+            useCompression=compression_level != 0,
+            compressionLevel=compression_level,
+        )
+
+
 def read_tag_file(filename, img_size=(512, 512)):
     """
     read sliceomatic tag file
@@ -291,13 +375,13 @@ def get_spacing_dirname(spacing):
 
 
 def strip_extension(path):
-    path = Path(path)
-    remove = []
-    for e in path.suffixes:
-        if e in {".jpg", ".jpeg", ".nii", ".gz", ".json", ".yaml", ".csv", ".nrrd"}:
-            remove.append(e)
+    path = str(path)
+    for e in reversed(Path(path).suffixes):
+        if e not in {".jpg", ".jpeg", ".nii", ".gz", ".json", ".yaml", ".csv", ".nrrd", ".mha"}:
+            break
+        path = path[: -len(e)]
 
-    return str(path).rstrip("".join(path.suffixes))
+    return path
 
 
 def parse_filepaths(filepaths: List, root_prefix: str):
@@ -342,6 +426,8 @@ def parse_filepaths(filepaths: List, root_prefix: str):
                 "key": image_key,
                 "prefix": prefix,
                 "last_modified": file.get("last_modified", None),
+                "size": file.get("size", None),
+                "etag": file.get("etag", None),
                 "data_type": data_type,
             }
         )
@@ -1,9 +1,11 @@
 from pathlib import Path
 
 import boto3
+import numpy as np
+import SimpleITK as sitk
 from midatasets import storage_backends
 from midatasets.MIReader import MIReader
-from midatasets.utils import get_spacing_dirname
+from midatasets.utils import IMAGE_EXTENSIONS, get_spacing_dirname, write_image
 from moto import mock_s3
 
 
@@ -79,6 +81,75 @@ def test_local_backend_duplicate(tmpdir):
     assert len(dataset.dataframe) == 2 * 10
 
 
+def test_generate_resampled_output_ext(tmpdir):
+    p = Path(tmpdir) / "foo"
+    (p / "labelmaps" / "native").mkdir(parents=True)
+    (p / "images" / "native").mkdir(parents=True)
+    for i in range(2):
+        image = sitk.GetImageFromArray(np.random.rand(8, 10, 12).astype(np.float32))
+        labelmap = sitk.GetImageFromArray(np.ones((8, 10, 12), dtype=np.uint8))
+        sitk.WriteImage(image, str(p / "images" / "native" / f"image_{i}.nii.gz"))
+        sitk.WriteImage(labelmap, str(p / "labelmaps" / "native" / f"image_{i}.nii.gz"))
+
+    dataset = MIReader(dir_path=str(p), spacing=0, remote_backend=None, output_ext=".nrrd")
+    dataset.generate_resampled(spacing=2, parallel=False)
+    assert len(list(p.rglob(f"{get_spacing_dirname(2)}/*.nrrd"))) == 2 * 2
+
+    resampled = MIReader(dir_path=str(p), spacing=2, remote_backend=None)
+    assert len(resampled.dataframe) == 2
+    assert resampled.load_image(0).shape == (4, 5, 6)
+
+
+def test_extract_crops(tmpdir):
+    p = Path(tmpdir) / "foo"
+    (p / "labelmaps" / "native").mkdir(parents=True)
+    (p / "images" / "native").mkdir(parents=True)
+    image = np.arange(10 * 12 * 14, dtype=np.float32).reshape(10, 12, 14)
+    labelmap = np.zeros(image.shape, dtype=np.uint8)
+    labelmap[2:4, 2:4, 2:4] = 1
+    labelmap[6:8, 8:10, 10:12] = 3
+    for i in range(2):
+        sitk.WriteImage(sitk.GetImageFromArray(image), str(p / "images" / "native" / f"image_{i}.nii.gz"))
+        sitk.WriteImage(sitk.GetImageFromArray(labelmap), str(p / "labelmaps" / "native" / f"image_{i}.nii.gz"))
+    dataset = MIReader(dir_path=str(p), spacing=0, remote_backend=None)
+    assert sorted(dataset.get_image_name(i) for i in range(2)) == ["image_0", "image_1"]
+    assert dataset.get_image_name(0) == dataset.dataframe.index[0]
+
+    results = dataset.extract_crops(vol_size=(4, 4, 4), compression_level=1)
+    assert sorted(results.index) == ["image_0", "image_1"]
+    assert list(results["crops"]) == [2, 2]
+    assert (results["time"] > 0).all()
+
+    # crops are centred on each label's bounding box
+    for label, slices in [(1, np.s_[1:5, 1:5, 1:5]), (3, np.s_[5:9, 7:11, 9:13])]:
+        crop = dataset.load_image_crop(1, vol_size=(4, 4, 4), label=label)
+        np.testing.assert_array_equal(crop, image[slices])
+        np.testing.assert_array_equal(
+            dataset.load_labelmap_crop(1, vol_size=(4, 4, 4), label=label), labelmap[slices] == label
+        )
+
+    results = MIReader(dir_path=str(p), spacing=0, remote_backend=None).extract_crops(
+        vol_size=(4, 4, 4), label=3, parallel=True, num_workers=2
+    )
+    assert list(results["crops"]) == [1, 1]
+
+
+def test_write_image(tmpdir):
+    array = np.random.default_rng(0).integers(0, 4, (6, 7, 8)).astype(np.int16)
+    image = sitk.GetImageFromArray(array)
+    image.SetSpacing((0.5, 1.0, 2.0))
+    for ext in IMAGE_EXTENSIONS:
+        for level in (None, 0, 6):
+            path = Path(tmpdir) / f"image_{level}{ext}"
+            write_image(image, path, compression_level=level)
+            written = sitk.ReadImage(str(path))
+            np.testing.assert_array_equal(sitk.GetArrayFromImage(written), array)
+            assert written.GetSpacing() == (0.5, 1.0, 2.0)
+        if ext in (".nrrd", ".mha"):
+            # .nii.gz is always compressed, .nii never
+            assert (Path(tmpdir) / f"image_6{ext}").stat().st_size < (Path(tmpdir) / f"image_0{ext}").stat().st_size
+
+
 @mock_s3
 def test_s3_backend(tmpdir):
     conn = boto3.resource("s3", region_name="us-east-1")
@@ -1,13 +1,26 @@
 import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 
+import numpy as np
 import pytest
+import yaml
+import SimpleITK as sitk
+from midatasets import stats
 from midatasets.databases import (
+    DBDict,
     DBYaml,
     MIDatasetModel,
     DBComposite,
     DBMongodb,
     DBDynamodb,
+    DBSqlite,
+    MIDatasetDBSqlite,
+    clear_clients,
 )
+from midatasets import configs
 from midatasets.datasets import MIDatasetStore
 from moto import mock_dynamodb2
 
@@ -19,6 +32,20 @@ def test_datasets(tmp_path):
     assert len(datasets.get_info_all()) == 1
 
 
+def test_datasets_names_only(tmp_path):
+    os.environ["MIDATASETS_YAML_PATH"] = f"{tmp_path}/midatasets.yaml"
+    datasets = MIDatasetStore(db="yaml")
+    for name in ["foo", "bar"]:
+        datasets.create(MIDatasetModel(name=name, aws_s3_prefix="bar", aws_s3_bucket="f"))
+    assert datasets.get_info_all(names_only=True) == ["foo", "bar"]
+
+
+def test_datasets_without_itk():
+    # the registry does not need the optional ITK dependencies
+    code = "import sys; sys.modules['SimpleITK'] = None; from midatasets.datasets import MIDatasetStore"
+    subprocess.run([sys.executable, "-c", code], check=True, cwd=os.path.dirname(os.path.dirname(__file__)))
+
+
 def test_datasets_composite(tmp_path):
     os.environ["MIDATASETS_YAML_PATH"] = f"{tmp_path}/midatasets.yaml"
     datasets = MIDatasetStore(db="yaml")
@@ -26,6 +53,81 @@ def test_datasets_composite(tmp_path):
     assert len(datasets.get_info_all()) == 1
 
 
+def test_datasets_reader_cache(tmp_path, monkeypatch):
+    os.environ["MIDATASETS_YAML_PATH"] = f"{tmp_path}/midatasets.yaml"
+    monkeypatch.setattr(configs, "root_path", str(tmp_path))
+    native = tmp_path / "foo" / "images" / "native"
+    native.mkdir(parents=True)
+    (native / "a.nii.gz").touch()
+    datasets = MIDatasetStore(db="yaml", reader_cache_size=2)
+    datasets.create(MIDatasetModel(name="foo", aws_s3_prefix="bar", aws_s3_bucket="f"))
+
+    reader = datasets.load("foo", remote_backend=None, cache=True)
+    assert datasets.load("foo", remote_backend=None, cache=True) is reader
+    assert datasets.load("foo", remote_backend=None, fail_on_error=False, cache=True) is not reader
+    assert datasets.load("foo", remote_backend=None) is not reader
+    assert len(reader) == 1
+
+    # new files invalidate
+    (native / "b.nii.gz").touch()
+    os.utime(native, ns=(0, 0))
+    reader = datasets.load("foo", remote_backend=None, cache=True)
+    assert len(reader) == 2
+    assert datasets.load("foo", remote_backend=None, cache=True) is reader
+
+    # so do registry updates
+    datasets.update("foo", {"task": "x"})
+    assert datasets.load("foo", remote_backend=None, cache=True) is not reader
+
+
+def test_datasets_compute_stats(tmp_path, monkeypatch):
+    os.environ["MIDATASETS_YAML_PATH"] = f"{tmp_path}/midatasets.yaml"
+    monkeypatch.setattr(configs, "root_path", str(tmp_path))
+    image = np.arange(24, dtype=np.int16).reshape(2, 3, 4)
+    labelmap = (image % 3).astype(np.uint8)
+    for dirname, array in [("images", image), ("labelmaps", labelmap)]:
+        for spacing in ["native", "subsampled1.5mm"]:
+            (tmp_path / "foo" / dirname / spacing).mkdir(parents=True)
+            for i in range(3):
+                sitk.WriteImage(sitk.GetImageFromArray(array), str(tmp_path / "foo" / dirname / spacing / f"c{i}.nii.gz"))
+    datasets = MIDatasetStore(db="yaml")
+    datasets.create(MIDatasetModel(name="foo", aws_s3_prefix="bar", aws_s3_bucket="f"))
+
+    result = datasets.compute_stats("foo", bins=4, value_range=(0, 24), num_workers=1)
+    assert result == datasets.get_info("foo")["stats"]
+    spacings = {s["dirname"]: s for s in result["spacings"]}
+    assert spacings["subsampled1.5mm"]["cases"] == 3
+    assert spacings["native"]["total_bytes"] == sum(
+        f.stat().st_size for f in (tmp_path / "foo").glob("*/native/*")
+    )
+
+    # field names stay valid for MongoDB
+    def field_names(value):
+        if isinstance(value, dict):
+            return [k for k in value] + [n for v in value.values() for n in field_names(v)]
+        if isinstance(value, list):
+            return [n for v in value for n in field_names(v)]
+        return []
+
+    assert not [n for n in field_names(result) if "." in n]
+    assert stats.label_counts(np.array([0.0, 1.0, 1.0])) == {"0": 1, "1": 2}
+    assert result["intensity"]["histogram"] == [18, 18, 18, 18]
+    assert result["intensity"]["mean"] == pytest.approx(11.5)
+    assert result["labels"] == {str(l): {"voxels": 24, "cases": 3} for l in range(3)}
+
+    # only changed cases are read again
+    computed = []
+    compute_case_stats = stats.compute_case_stats
+    monkeypatch.setattr(stats, "compute_case_stats", lambda *args: computed.append(args) or compute_case_stats(*args))
+    sitk.WriteImage(sitk.GetImageFromArray(image * 0), str(tmp_path / "foo" / "images" / "native" / "c1.nii.gz"))
+    os.utime(tmp_path / "foo" / "images" / "native" / "c1.nii.gz", ns=(0, 0))
+    result = datasets.compute_stats("foo", bins=4, value_range=(0, 24), num_workers=1)
+    assert len(computed) == 1
+    assert result["intensity"]["histogram"] == [12 + 24, 12, 12, 12]
+    assert result["intensity"]["std"] == pytest.approx(np.std(np.concatenate([image, image, image * 0])))
+    assert [p.name for p in (tmp_path / "foo" / stats.CACHE_DIRNAME).iterdir()] == ["local.json"]
+
+
 @pytest.mark.skip(msg="TODO: mock mongo")
 def test_mongodb():
     db = DBMongodb()
@@ -49,6 +151,165 @@ def test_yaml_crud(tmp_path):
     assert len(db.find_all()) == 0
 
 
+def test_dict_indexes():
+    db = DBDict(indexes=["aws_s3_bucket"])
+    for i in range(10):
+        db.create(MIDatasetModel(name=str(i), aws_s3_bucket=f"b{i % 2}", aws_s3_prefix="s"))
+
+    with pytest.raises(KeyError):
+        db.create(MIDatasetModel(name="3", aws_s3_bucket="b", aws_s3_prefix="s"))
+    assert db.find({"name": "3"})["aws_s3_bucket"] == "b1"
+    assert [d["name"] for d in db.find_all({"aws_s3_bucket": "b0"})] == ["0", "2", "4", "6", "8"]
+    assert db.find_all({"aws_s3_bucket": "b0", "name": "1"}) == []
+
+    assert db.update({"aws_s3_bucket": "b0"}, {"aws_s3_bucket": "b2"}) == 5
+    assert db.find_all({"aws_s3_bucket": "b0"}) == []
+    assert len(db.find_all({"aws_s3_bucket": "b2"})) == 5
+    with pytest.raises(KeyError):
+        db.update({"name": "1"}, {"name": "2"})
+    assert db.update({"name": "1"}, {"name": "11"}) == 1
+    assert db.find({"name": "1"}) is None and db.find({"name": "11"}) is not None
+
+    assert db.delete({"aws_s3_bucket": "b1"}) == 5
+    assert len(db.find_all()) == 5
+    assert db.find({"name": "3"}) is None
+
+
+def test_yaml_batch(tmp_path):
+    path = tmp_path / "midatasets.yaml"
+    db = DBYaml(path=str(path))
+
+    with db.batch():
+        for i in range(100):
+            db.create(MIDatasetModel(name=str(i), aws_s3_bucket="v", aws_s3_prefix="s"))
+        db.update({"name": "0"}, {"description": "first"})
+        assert not path.exists()
+    assert len(DBYaml(path=str(path)).find_all()) == 100
+
+    with pytest.raises(ValueError):
+        with db.batch():
+            db.delete({"name": "0"})
+            raise ValueError()
+    assert db.find({"name": "0"})["description"] == "first"
+    assert len(DBYaml(path=str(path)).find_all()) == 100
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_yaml_save_keeps_link_and_mode(tmp_path):
+    target = tmp_path / "registry" / "midatasets.yaml"
+    target.parent.mkdir()
+    DBYaml(path=str(target)).create(MIDatasetModel(name="foo", aws_s3_bucket="v", aws_s3_prefix="s"))
+    os.chmod(target, 0o640)
+    link = tmp_path / "midatasets.yaml"
+    link.symlink_to(target)
+
+    # writers of the same process do not share a temporary file
+    dbs = [DBYaml(path=str(link), cache=False) for _ in range(4)]
+    with ThreadPoolExecutor(4) as executor:
+        list(executor.map(lambda db: [db._save() for _ in range(20)], dbs))
+    dbs[0].create(MIDatasetModel(name="bar", aws_s3_bucket="v", aws_s3_prefix="s"))
+    assert link.is_symlink()
+    assert os.stat(target).st_mode & 0o777 == 0o640
+    assert len(DBYaml(path=str(target), cache=False).find_all()) == 2
+    assert sorted(p.name for p in target.parent.iterdir()) == ["midatasets.yaml"]
+
+
+def test_yaml_duplicated_keys(tmp_path):
+    # hand-edited file with a copied entry
+    path = tmp_path / "midatasets.yaml"
+    items = [{"name": n, "aws_s3_bucket": b, "aws_s3_prefix": "s"} for n, b in [("foo", "a"), ("bar", "b"), ("foo", "c")]]
+    path.write_text(yaml.safe_dump({"table": items}))
+
+    db = DBYaml(path=str(path), cache=False)
+    assert [d["aws_s3_bucket"] for d in db.find_all({"name": "foo"})] == ["a", "c"]
+    assert db.find({"name": "foo"})["aws_s3_bucket"] == "a"
+    with pytest.raises(KeyError):
+        db.create(MIDatasetModel(name="foo", aws_s3_bucket="d", aws_s3_prefix="s"))
+    assert db.update({"name": "foo"}, {"description": "dup"}) == 2
+    assert db.delete({"name": "foo"}) == 2
+    assert db.find_all(projection=["name"]) == [{"name": "bar"}]
+
+
+def test_yaml_cache(tmp_path, monkeypatch):
+    path = tmp_path / "midatasets.yaml"
+    db = DBYaml(path=str(path))
+    db.create(MIDatasetModel(name="foo", aws_s3_bucket="v", aws_s3_prefix="s"))
+
+    reads = []
+    read = DBYaml._read
+    monkeypatch.setattr(DBYaml, "_read", lambda self: reads.append(1) or read(self))
+    dbs = [DBYaml(path=str(path)) for _ in range(10)]
+    assert reads == [] and all(d.find({"name": "foo"}) for d in dbs)
+    # instances do not share data
+    dbs[0].find({"name": "foo"})["description"] = "changed"
+    assert dbs[1].find({"name": "foo"})["description"] == ""
+
+    # changes by another writer are picked up from the mtime
+    path.write_text(path.read_text().replace("name: foo", "name: bar"))
+    os.utime(path, ns=(0, 0))
+    assert DBYaml(path=str(path)).find({"name": "bar"}) is not None
+    assert len(reads) == 1
+    assert DBYaml(path=str(path), cache=False).find({"name": "bar"}) is not None
+    assert len(reads) == 2
+
+
+def test_yaml_bulk(tmp_path):
+    db = DBYaml(path=f"{tmp_path}/midatasets.yaml")
+    models = [MIDatasetModel(name=str(i), aws_s3_bucket="v", aws_s3_prefix="s") for i in range(20)]
+
+    assert db.bulk_create(models) == 20
+    assert db.bulk_update([({"name": str(i)}, {"description": "even"}) for i in range(0, 20, 2)]) == 10
+    assert db.bulk_delete([{"name": str(i)} for i in range(5)]) == 5
+    db = DBYaml(path=f"{tmp_path}/midatasets.yaml")
+    assert db.find_all(projection=["name"]) == [{"name": str(i)} for i in range(5, 20)]
+    assert len(db.find_all({"description": "even"}, projection=["name", "description"])) == 7
+
+    cdb = DBComposite([db, DBYaml(path=f"{tmp_path}/midatasets2.yaml")])
+    assert cdb.bulk_create(models[:5]) == 5
+    assert len(cdb.find_all(projection=["name"])) == 20
+
+
+def test_sqlite(tmp_path):
+    db = DBSqlite(path=f"{tmp_path}/midatasets.sqlite", table_name="datasets", indexes=["aws_s3_bucket"])
+    models = [MIDatasetModel(name=str(i), aws_s3_bucket=f"b{i % 3}", aws_s3_prefix="s") for i in range(20)]
+    version = db.get_version()
+
+    assert db.bulk_create(models) == 20
+    assert db.get_version() != version
+    with pytest.raises(KeyError):
+        db.bulk_create(models[18:] + [MIDatasetModel(name="new", aws_s3_bucket="b", aws_s3_prefix="s")])
+    assert db.find({"name": "new"}) is None
+    assert db.find({"name": "3"})["aws_s3_bucket"] == "b0"
+    assert len(db.find_all({"aws_s3_bucket": "b1"})) == 7
+    assert len(db.find_all({"aws_s3_bucket": "b1", "description": ""})) == 7
+
+    assert db.bulk_update([({"name": str(i)}, {"description": "even"}) for i in range(0, 20, 2)]) == 10
+    assert db.update({"name": "0"}, {"name": "zero", "tags": ["a"]}) == 1
+    with pytest.raises(KeyError):
+        db.update({"name": "zero"}, {"name": "1"})
+    assert db.bulk_delete([{"name": str(i)} for i in range(1, 5)]) == 4
+    assert db.delete({"description": "even"}) == 8
+
+    # another connection, e.g. another process, sees the changes
+    db = DBSqlite(path=f"{tmp_path}/midatasets.sqlite", table_name="datasets")
+    assert db.find_all(projection=["name"]) == [{"name": str(i)} for i in range(5, 20, 2)]
+    assert db.find_all({"tags": ["a"]}) == []
+
+
+def test_sqlite_migration(tmp_path, monkeypatch):
+    yaml_db = DBYaml(path=f"{tmp_path}/midatasets.yaml", collection_name="datasets")
+    yaml_db.bulk_create([MIDatasetModel(name=n, aws_s3_bucket="b", aws_s3_prefix="s") for n in ["foo", "bar"]])
+    monkeypatch.setenv("MIDATASETS_SQLITE_PATH", f"{tmp_path}/midatasets.sqlite")
+    monkeypatch.setenv("MIDATASETS_SQLITE_MIGRATE_FROM", f"{tmp_path}/midatasets.yaml")
+
+    datasets = MIDatasetStore(db="sqlite")
+    assert datasets.get_info_all(names_only=True) == ["foo", "bar"]
+    datasets.delete("foo")
+    # only new databases are migrated
+    assert MIDatasetDBSqlite().find_all(projection=["name"]) == [{"name": "bar"}]
+    assert MIDatasetDBSqlite().import_yaml(f"{tmp_path}/midatasets.yaml") == 1
+
+
 def test_composite(tmp_path):
     db1 = DBYaml(path=f"{tmp_path}/midatasets1.yaml")
     db2 = DBYaml(path=f"{tmp_path}/midatasets2.yaml")
@@ -64,6 +325,51 @@ def test_composite(tmp_path):
     assert len(cdb.find_all()) == 10
 
 
+class SlowDB(DBDict):
+    def __init__(self, delay=0.2, **kwargs):
+        self.delay = delay
+        self.queries = 0
+        super().__init__(**kwargs)
+
+    def find_all(self, selector=None, projection=None):
+        self.queries += 1
+        time.sleep(self.delay)
+        return super().find_all(selector, projection)
+
+    def find(self, selector):
+        time.sleep(self.delay)
+        return super().find(selector)
+
+
+def test_composite_precedence_and_index():
+    dbs = [SlowDB(), SlowDB(), SlowDB()]
+    for i, db in enumerate(dbs):
+        db.create(MIDatasetModel(name="shared", aws_s3_bucket=f"b{i}", aws_s3_prefix="s"))
+        db.create(MIDatasetModel(name=f"only{i}", aws_s3_bucket=f"b{i}", aws_s3_prefix="s"))
+
+    cdb = DBComposite(dbs)
+    start = time.perf_counter()
+    assert cdb.find({"name": "shared"})["aws_s3_bucket"] == "b2"
+    assert time.perf_counter() - start < 0.5
+    items = cdb.find_all()
+    assert [d["name"] for d in items] == ["shared", "only0", "only1", "only2"]
+    assert items[0]["aws_s3_bucket"] == "b2"
+    assert cdb.find_all(projection=["aws_s3_bucket"])[0] == {"aws_s3_bucket": "b2"}
+
+    cdb = DBComposite(dbs, index=True)
+    assert cdb.find({"name": "only1"}) is not None
+    queries = [db.queries for db in dbs]
+    assert cdb.find({"name": "shared", "aws_s3_bucket": "b2"}) is not None
+    assert [db.queries for db in dbs] == queries
+
+    # only the changed source is re-read
+    dbs[1].update({"name": "only1"}, {"description": "changed"})
+    assert cdb.find({"name": "only1"})["description"] == "changed"
+    assert [db.queries for db in dbs] == [queries[0], queries[1] + 1, queries[2]]
+    cdb.create(MIDatasetModel(name="new", aws_s3_bucket="b", aws_s3_prefix="s"))
+    assert len(cdb.find_all()) == 5
+
+
 @mock_dynamodb2
 def test_dynamodb():
     os.environ["AWS_DEFAULT_REGION"] = "eu-west-2"
@@ -90,3 +396,183 @@ def test_dynamodb():
 
     db.delete({"name": "1"})
     assert len(db.find_all()) == 10 - 1
+
+
+@mock_dynamodb2
+def test_shared_clients():
+    os.environ["AWS_DEFAULT_REGION"] = "eu-west-2"
+    clear_clients()
+    # no connection is made until the first operation
+    mongo_dbs = [DBMongodb(host="mongodb://localhost:1", collection_name=str(i)) for i in range(100)]
+    assert len({id(db.client) for db in mongo_dbs}) == 1
+    assert DBMongodb(host="mongodb://localhost:2").client is not mongo_dbs[0].client
+
+    dynamo_dbs = [DBDynamodb(table_name="test") for _ in range(100)]
+    assert len({id(db.client) for db in dynamo_dbs}) == 1
+    # boto3 resources are not thread-safe, other threads get their own
+    with ThreadPoolExecutor(1) as executor:
+        assert executor.submit(lambda: dynamo_dbs[0].client).result() is not dynamo_dbs[0].client
+        client = dynamo_dbs[0].client
+        thread_client = executor.submit(lambda: dynamo_dbs[0].client).result()
+        clear_clients()
+        assert DBDynamodb(table_name="test").client is not client
+        # other threads drop theirs too
+        assert executor.submit(lambda: dynamo_dbs[0].client).result() is not thread_client
+
+
+@mock_dynamodb2
+def test_dynamodb_pushdown(monkeypatch):
+    os.environ["AWS_DEFAULT_REGION"] = "eu-west-2"
+    import boto3
+
+    dynamodb = boto3.resource("dynamodb", "eu-west-2")
+    dynamodb.create_table(
+        TableName="test",
+        KeySchema=[{"AttributeName": "name", "KeyType": "HASH"}],
+        AttributeDefinitions=[
+            {"AttributeName": "name", "AttributeType": "S"},
+            {"AttributeName": "aws_s3_bucket", "AttributeType": "S"},
+        ],
+        GlobalSecondaryIndexes=[
+            {
+                "IndexName": "bucket",
+                "KeySchema": [{"AttributeName": "aws_s3_bucket", "KeyType": "HASH"}],
+                "Projection": {"ProjectionType": "ALL"},
+                "ProvisionedThroughput": {"ReadCapacityUnits": 5, "WriteCapacityUnits": 5},
+            }
+        ],
+        ProvisionedThroughput={"ReadCapacityUnits": 5, "WriteCapacityUnits": 5},
+    )
+
+    db = DBDynamodb(table_name="test")
+    db.batch_write(
+        [MIDatasetModel(name=str(i), aws_s3_bucket=f"b{i % 3}", aws_s3_prefix=f"p{i % 2}") for i in range(150)]
+    )
+    assert db.index_keys == {"aws_s3_bucket": "bucket"}
+
+    assert [d["name"] for d in db.find_all({"name": "4"})] == ["4"]
+    assert db.find_all({"name": "4", "aws_s3_prefix": "p1"}) == []
+    by_bucket = db.find_all({"aws_s3_bucket": "b1", "aws_s3_prefix": "p0"})
+    assert sorted(int(d["name"]) for d in by_bucket) == [i for i in range(150) if i % 3 == 1 and i % 2 == 0]
+    assert len(db.find_all({"aws_s3_prefix": "p1"})) == 75
+    # segments run on persistent threads, which keep their resources
+    tables = set()
+    scan_segment = DBDynamodb._scan_segment
+    monkeypatch.setattr(
+        DBDynamodb, "_scan_segment", lambda self, *a, **kw: tables.add(id(self.table)) or scan_segment(self, *a, **kw)
+    )
+    for _ in range(3):
+        # moto ignores the segment, so each returns every match
+        assert len(db.find_all({"aws_s3_prefix": "p1"}, segments=4)) == 4 * 75
+    assert len(tables) <= 4
+
+    assert sorted(int(d["name"]) for d in db.batch_get([str(i) for i in range(120)])) == list(range(120))
+    db.batch_write(delete_keys=[str(i) for i in range(100)])
+    assert len(db.find_all()) == 50
+
+    names = db.find_all({"aws_s3_bucket": "b0"}, projection=["name"])
+    assert all(list(d) == ["name"] for d in names) and len(names) == 16
+    assert db.bulk_delete([{"name": "100"}, {"aws_s3_bucket": "b2"}]) == 1 + 17
+    # missing or repeated keys are not counted
+    assert db.bulk_delete([{"name": "100"}, {"name": "missing"}, {"name": "102"}, {"name": "102"}]) == 1
+    assert len(db.find_all(projection=["name"])) == 50 - 19
+
+
+@mock_dynamodb2
+def test_dynamodb_index_projection_and_retries(monkeypatch):
+    os.environ["AWS_DEFAULT_REGION"] = "eu-west-2"
+    import boto3
+
+    dynamodb = boto3.resource("dynamodb", "eu-west-2")
+    dynamodb.create_table(
+        TableName="projections",
+        KeySchema=[{"AttributeName": "name", "KeyType": "HASH"}],
+        AttributeDefinitions=[
+            {"AttributeName": "name", "AttributeType": "S"},
+            {"AttributeName": "aws_s3_bucket", "AttributeType": "S"},
+        ],
+        GlobalSecondaryIndexes=[
+            {
+                "IndexName": "bucket",
+                "KeySchema": [{"AttributeName": "aws_s3_bucket", "KeyType": "HASH"}],
+                "Projection": {"ProjectionType": "KEYS_ONLY"},
+                "ProvisionedThroughput": {"ReadCapacityUnits": 5, "WriteCapacityUnits": 5},
+            }
+        ],
+        ProvisionedThroughput={"ReadCapacityUnits": 5, "WriteCapacityUnits": 5},
+    )
+    db = DBDynamodb(table_name="projections")
+    db.batch_write([MIDatasetModel(name=str(i), aws_s3_bucket=f"b{i % 2}", aws_s3_prefix="p") for i in range(10)])
+    # the index lacks the other attributes, so it is scanned instead
+    assert db.index_keys == {}
+    items = db.find_all({"aws_s3_bucket": "b1"})
+    assert len(items) == 5 and all(d["aws_s3_prefix"] == "p" for d in items)
+
+    # unprocessed keys are retried, then given up on
+    db.retry_delay = 0
+    batch_get_item = db.client.batch_get_item
+    calls = []
+
+    def throttled(RequestItems):
+        calls.append(RequestItems)
+        if len(calls) % 3:
+            return {"Responses": {}, "UnprocessedKeys": RequestItems}
+        return batch_get_item(RequestItems=RequestItems)
+
+    monkeypatch.setattr(db.client, "batch_get_item", throttled)
+    assert len(db.batch_get(["1", "2"])) == 2 and len(calls) == 3
+    db.max_retries = 1
+    with pytest.raises(RuntimeError):
+        db.batch_get(["1"])
+
+
+@mock_dynamodb2
+def test_dynamodb_numbers():
+    os.environ["AWS_DEFAULT_REGION"] = "eu-west-2"
+    import boto3
+
+    boto3.resource("dynamodb", "eu-west-2").create_table(
+        TableName="numbers",
+        KeySchema=[{"AttributeName": "name", "KeyType": "HASH"}],
+        AttributeDefinitions=[{"AttributeName": "name", "AttributeType": "S"}],
+        ProvisionedThroughput={"ReadCapacityUnits": 5, "WriteCapacityUnits": 5},
+    )
+    db = DBDynamodb(table_name="numbers")
+    db.create(MIDatasetModel(name="foo", aws_s3_bucket="a", aws_s3_prefix="s"))
+    stats = {"intensity": {"mean": 12.5, "std": 0.1, "voxels": 10, "range": [-1024.0, 3072.0]}}
+    db.update({"name": "foo"}, {"stats": stats, "scale": 0.5})
+    db.batch_write([{"name": "bar", "stats": stats}])
+
+    assert db.find({"name": "foo"})["stats"] == stats
+    assert db.find({"name": "foo"})["scale"] == 0.5
+    assert db.find_all({"scale": 0.5}, projection=["name"]) == [{"name": "foo"}]
+    assert [d["stats"] for d in db.batch_get(["foo", "bar"])] == [stats, stats]
+    assert isinstance(db.find({"name": "bar"})["stats"]["intensity"]["voxels"], int)
+
+
+@mock_dynamodb2
+def test_dynamodb_describe_failure_not_cached():
+    os.environ["AWS_DEFAULT_REGION"] = "eu-west-2"
+    import boto3
+
+    db = DBDynamodb(table_name="described")
+    assert db.index_keys == {}
+    boto3.resource("dynamodb", "eu-west-2").create_table(
+        TableName="described",
+        KeySchema=[{"AttributeName": "name", "KeyType": "HASH"}],
+        AttributeDefinitions=[
+            {"AttributeName": "name", "AttributeType": "S"},
+            {"AttributeName": "task", "AttributeType": "S"},
+        ],
+        GlobalSecondaryIndexes=[
+            {
+                "IndexName": "task",
+                "KeySchema": [{"AttributeName": "task", "KeyType": "HASH"}],
+                "Projection": {"ProjectionType": "ALL"},
+                "ProvisionedThroughput": {"ReadCapacityUnits": 5, "WriteCapacityUnits": 5},
+            }
+        ],
+        ProvisionedThroughput={"ReadCapacityUnits": 5, "WriteCapacityUnits": 5},
+    )
+    assert db.index_keys == {"task": "task"}
+    assert DBDynamodb(table_name="described").index_keys == {"task": "task"}
@@ -0,0 +1,45 @@
+from pathlib import Path
+
+import numpy as np
+import SimpleITK as sitk
+
+from midatasets.loader import CaseLoader
+from midatasets.MIReader import MIReader
+
+
+def _dataset(tmpdir, num_cases=5):
+    p = Path(tmpdir) / "foo"
+    for dirname in ["images", "labelmaps"]:
+        (p / dirname / "native").mkdir(parents=True)
+        for i in range(num_cases):
+            array = np.full((4, 5, 6), i, dtype=np.int16)
+            sitk.WriteImage(sitk.GetImageFromArray(array), str(p / dirname / "native" / f"image_{i}.nii.gz"))
+    return MIReader(dir_path=str(p), spacing=0, remote_backend=None)
+
+
+def _patches(sample):
+    return [{**sample, "image": sample["image"][:2]}, {**sample, "image": sample["image"][2:]}]
+
+
+def test_case_loader(tmpdir):
+    reader = _dataset(tmpdir)
+    loader = CaseLoader(reader, batch_size=2, num_workers=2)
+
+    batches = list(loader)
+    assert len(batches) == len(loader) == 3
+    assert batches[0]["image"].shape == (2, 4, 5, 6)
+    assert [n for b in batches for n in b["name"]] == list(reader.dataframe.index)
+    assert loader.stats["cases"] == 5 and loader.stats["batches"] == 3
+
+
+def test_case_loader_shuffle_transform(tmpdir):
+    reader = _dataset(tmpdir)
+    loader = CaseLoader(reader, keys=("image",), transform=_patches, batch_size=2, shuffle=True, seed=1, backend="process")
+
+    names = [b["name"][0] for b in loader]
+    assert len(names) == 5 and loader.stats["batches"] == 5
+    assert names == [b["name"][0] for b in loader]
+    loader.set_epoch(1)
+    assert sorted(b["name"][0] for b in loader) == sorted(names)
+    batch = next(iter(loader))
+    assert batch["image"].shape == (2, 2, 5, 6)
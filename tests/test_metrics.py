@@ -0,0 +1,170 @@
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+import SimpleITK as sitk
+
+from midatasets import metrics
+from midatasets.evaluation import evaluate
+from midatasets.MIReader import MIReader
+
+
+def _reference_dice(predictions, labelmap, labels):
+    scores = []
+    for l in labels:
+        den = np.sum(predictions == l) + np.sum(labelmap == l)
+        scores.append(2.0 * np.sum((predictions == l) & (labelmap == l)) / den if den > 0 else 1.0)
+    return np.array(scores, dtype=np.float32)
+
+
+def _volumes():
+    rng = np.random.default_rng(0)
+    labelmap = rng.integers(0, 5, (10, 20, 30)).astype(np.uint8)
+    predictions = labelmap.copy()
+    noise = rng.random(labelmap.shape) < 0.3
+    predictions[noise] = rng.integers(0, 5, noise.sum())
+    return predictions, labelmap
+
+
+def test_confusion_matrix():
+    predictions, labelmap = _volumes()
+    cm = metrics.confusion_matrix(predictions, labelmap)
+
+    assert cm.shape == (5, 5)
+    assert cm.sum() == labelmap.size
+    assert cm[2, 3] == np.sum((predictions == 2) & (labelmap == 3))
+
+
+def test_overlap_metrics():
+    predictions, labelmap = _volumes()
+    labels = (0, 1, 4, 9)
+    results = metrics.overlap_metrics(predictions, labelmap, labels)
+
+    np.testing.assert_allclose(results["dice"], _reference_dice(predictions, labelmap, labels), rtol=1e-6)
+    np.testing.assert_allclose(results["jaccard"], results["dice"] / (2 - results["dice"]), rtol=1e-6)
+    for i, l in enumerate(labels[:3]):
+        tp = np.sum((predictions == l) & (labelmap == l))
+        np.testing.assert_allclose(results["precision"][i], tp / np.sum(predictions == l), rtol=1e-6)
+        np.testing.assert_allclose(results["recall"][i], tp / np.sum(labelmap == l), rtol=1e-6)
+    # label 9 occurs in neither volume
+    assert results["dice"][3] == 1.0 and results["avd"][3] == 0.0
+
+
+def test_confusion_matrix_labels():
+    predictions, labelmap = _volumes()
+    cm = metrics.confusion_matrix(predictions, labelmap, labels=(3, 1))
+    full = metrics.confusion_matrix(predictions, labelmap)
+    assert cm.shape == (3, 3)
+    assert cm[0, 1] == full[3, 1] and cm[1, 1] == full[1, 1]
+    assert cm.sum() == labelmap.size
+
+    with pytest.raises(ValueError):
+        metrics.confusion_matrix(predictions.astype(np.float32) + 0.5, labelmap)
+
+
+def test_sparse_large_label():
+    # the matrix size depends on the requested labels, not on the largest value
+    labelmap = np.zeros((4, 4, 4), dtype=np.uint16)
+    labelmap[0, 0, 0] = 65535
+    labelmap[1:3, 1:3, 1:3] = 1
+    predictions = labelmap.copy()
+    predictions[1, 1, 1] = 0
+    expected = _reference_dice(predictions, labelmap, (0, 1, 65535))
+    np.testing.assert_allclose(metrics.dice(predictions, labelmap, (0, 1, 65535)), expected, rtol=1e-6)
+    np.testing.assert_array_equal(metrics.present_labels(predictions, labelmap), [0, 1, 65535])
+
+
+def test_float_labels():
+    predictions, labelmap = _volumes()
+    labels = (0, 1, 4)
+    expected = _reference_dice(predictions, labelmap, labels)
+    np.testing.assert_allclose(
+        metrics.dice(predictions.astype(np.float32), labelmap.astype(np.float64), labels), expected, rtol=1e-6
+    )
+    # non-integral values are compared for equality, as elementwise, not truncated
+    shifted = predictions.astype(np.float32) + 0.25
+    np.testing.assert_allclose(
+        metrics.dice(shifted, labelmap, labels), _reference_dice(shifted, labelmap, labels), rtol=1e-6
+    )
+    with pytest.raises(ValueError):
+        metrics.surface_metrics(shifted, labelmap, (1,))
+
+
+def test_jaccard_avd_num_classes():
+    predictions, labelmap = _volumes()
+
+    np.testing.assert_allclose(metrics.jaccard(predictions, labelmap, 3), metrics.jaccard(predictions, labelmap, (0, 1, 2)))
+    avd = metrics.abs_vol_difference(predictions, labelmap, 2)
+    expected = [abs(np.sum(predictions == l) - np.sum(labelmap == l)) / (np.sum(labelmap == l) + 1e-6) for l in range(2)]
+    np.testing.assert_allclose(avd, expected, rtol=1e-6)
+
+
+def test_surface_metrics():
+    labelmap = np.zeros((20, 30, 40), dtype=np.uint8)
+    labelmap[5:15, 10:20, 10:30] = 1
+    predictions = np.zeros_like(labelmap)
+    predictions[5:15, 10:20, 12:32] = 1
+    predictions[0, 0, 0] = 2
+
+    # shifted by 2 voxels along x, which has a spacing of 0.5
+    spacing = (0.5, 1.0, 2.0)
+    np.testing.assert_allclose(metrics.hausdorff95(predictions, labelmap, (1,), spacing=spacing), [1.0])
+    results = metrics.surface_metrics(predictions, labelmap, (1, 2, 3), spacing=spacing, num_workers=2)
+    assert 0 < results["assd"][0] < 1.0
+    assert np.isinf(results["hausdorff95"][1])
+    assert results["assd"][2] == 0
+    np.testing.assert_allclose(metrics.assd(labelmap, labelmap, (1,)), [0.0])
+
+
+def test_crossentropy():
+    rng = np.random.default_rng(0)
+    logits = rng.normal(size=(6, 7, 8, 3)).astype(np.float32) * 5
+    labels = rng.integers(0, 3, logits.shape[:-1])
+    one_hot = np.eye(3, dtype=np.float32)[labels]
+    log_p = logits - np.log(np.sum(np.exp(logits.astype(np.float64)), axis=-1, keepdims=True))
+    voxel_loss = -np.take_along_axis(log_p, labels[..., None], axis=-1)[..., 0]
+
+    np.testing.assert_allclose(metrics.crossentropy(logits, one_hot, block_size=10), voxel_loss.mean(), rtol=1e-5)
+    loss, per_class = metrics.crossentropy(logits, labels, per_class=True, block_size=10)
+    np.testing.assert_allclose(loss, voxel_loss.mean(), rtol=1e-5)
+    np.testing.assert_allclose(per_class, [voxel_loss[labels == c].mean() for c in range(3)], rtol=1e-5)
+    probabilities = np.exp(log_p)
+    expected = -np.log(np.take_along_axis(probabilities, labels[..., None], axis=-1) + 1e-8).mean()
+    np.testing.assert_allclose(metrics.crossentropy(probabilities, labels, logits=False), expected, rtol=1e-5)
+
+
+def test_evaluate(tmpdir):
+    p = Path(tmpdir) / "foo"
+    predictions, labelmap = _volumes()
+    for dirname, array in [("images", labelmap), ("labelmaps", labelmap), ("outputs", predictions)]:
+        (p / dirname / "native").mkdir(parents=True)
+        for i in range(3):
+            sitk.WriteImage(sitk.GetImageFromArray(array), str(p / dirname / "native" / f"image_{i}.nii.gz"))
+    reader = MIReader(dir_path=str(p), spacing=0, remote_backend=None)
+
+    results = evaluate(reader, labels=(1, 2), num_workers=1)
+    assert list(results.index) == [(f"image_{i}", l) for i in range(3) for l in (1, 2)]
+    np.testing.assert_allclose(results.loc["image_0", "dice"], metrics.dice(predictions, labelmap, (1, 2)), rtol=1e-6)
+
+    # re-runs only score changed cases
+    sitk.WriteImage(sitk.GetImageFromArray(labelmap), str(p / "outputs" / "native" / "image_1.nii.gz"))
+    os.utime(p / "outputs" / "native" / "image_1.nii.gz", (0, 0))
+    rerun = evaluate(reader, labels=(1, 2), num_workers=1)
+    assert (rerun.loc["image_1", "dice"] == 1).all()
+    pd.testing.assert_frame_equal(rerun.loc[["image_0", "image_2"]], results.loc[["image_0", "image_2"]])
+
+
+def test_bool_masks():
+    predictions, labelmap = _volumes()
+    pred_mask, gt_mask = predictions == 1, labelmap == 1
+    expected = _reference_dice(pred_mask.astype(np.uint8), gt_mask.astype(np.uint8), (0, 1))
+    np.testing.assert_allclose(metrics.dice(pred_mask, gt_mask, (0, 1)), expected, rtol=1e-6)
+    np.testing.assert_allclose(metrics.dice(pred_mask, gt_mask.astype(np.uint8), (0, 1)), expected, rtol=1e-6)
+    np.testing.assert_allclose(
+        metrics.jaccard(pred_mask, gt_mask, (0, 1)), metrics.jaccard(pred_mask, gt_mask, 2), rtol=1e-6
+    )
+    np.testing.assert_allclose(
+        metrics.abs_vol_difference(pred_mask, gt_mask, (1,)), metrics.abs_vol_difference(pred_mask, gt_mask, 2)[1:]
+    )
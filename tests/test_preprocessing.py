@@ -0,0 +1,192 @@
+import SimpleITK as sitk
+import numpy as np
+from scipy import ndimage
+
+from midatasets.preprocessing import (
+    clip_outliers,
+    compute_label_stats,
+    extract_max_area_slice_at_label,
+    extract_max_area_slices_at_labels,
+    extract_vol_at_label,
+    find_max_area_slices,
+    get_label_slices,
+    mat2gray,
+    mean_std,
+    merge_moments,
+    min_max,
+    moments,
+    normalise_one_one,
+    normalise_zero_one,
+    percentiles,
+    sitk_resample,
+    sitk_resample_labelmap,
+    sitk_resample_to_file,
+    whitening,
+)
+
+
+def _labelmap():
+    labelmap = np.zeros((20, 30, 40), dtype=np.uint8)
+    labelmap[2:5, 3:10, 4:8] = 1
+    labelmap[10:18, 20:25, 30:39] = 3
+    return labelmap
+
+
+def test_label_stats():
+    labelmap = _labelmap()
+    stats = compute_label_stats(labelmap)
+
+    assert list(stats.keys()) == [1, 3]
+    for label in [1, 3]:
+        assert stats[label]["slices"] == ndimage.find_objects(labelmap == label)[0]
+        assert stats[label]["count"] == np.sum(labelmap == label)
+        np.testing.assert_allclose(
+            stats[label]["centroid"], ndimage.center_of_mass(labelmap == label)
+        )
+    assert get_label_slices(labelmap, 2) is None
+    assert get_label_slices(labelmap, 3) == stats[3]["slices"]
+    assert get_label_slices(labelmap, 2, stats=stats) is None
+
+
+def test_extract_vol_at_label_with_stats():
+    labelmap = _labelmap()
+    image = np.random.rand(*labelmap.shape)
+    stats = compute_label_stats(labelmap)
+    for label in [1, 3]:
+        expected = extract_vol_at_label(image, labelmap, label=label, vol_size=(8, 8, 8))
+        result = extract_vol_at_label(
+            image, labelmap, label=label, vol_size=(8, 8, 8), stats=stats
+        )
+        np.testing.assert_array_equal(expected[0], result[0])
+        np.testing.assert_array_equal(expected[1], result[1])
+
+
+def test_max_area_slices():
+    labelmap = _labelmap()
+    labelmap[3, 3:10, 4:6] = 0
+    labelmap[12, 20:25, 30:35] = 0
+    image = np.random.rand(*labelmap.shape)
+
+    best = find_max_area_slices(labelmap)
+    extracted = extract_max_area_slices_at_labels(image, labelmap)
+    for label in [1, 3]:
+        for dim in range(3):
+            areas = [
+                np.sum(np.take(labelmap, i, axis=dim) == label)
+                for i in range(labelmap.shape[dim])
+            ]
+            expected = int(np.argmax(areas))
+            assert best[label][dim] == (expected, max(areas))
+            _, _, max_slice = extract_max_area_slice_at_label(
+                image, labelmap, label=label, dim=dim
+            )
+            assert max_slice == expected
+            np.testing.assert_array_equal(
+                extracted[label][dim][0], np.take(image, expected, axis=dim)
+            )
+
+
+def test_normalisation():
+    image = (np.random.randn(10, 20, 30) * 500).astype(np.int16)
+    vmin, vmax = float(image.min()), float(image.max())
+    zero_one = (image.astype(np.float32) - vmin) / (vmax - vmin)
+
+    np.testing.assert_allclose(normalise_zero_one(image), zero_one, atol=1e-6)
+    np.testing.assert_allclose(normalise_one_one(image), 2 * zero_one - 1, atol=1e-6)
+    np.testing.assert_allclose(mat2gray(image), zero_one, atol=1e-6)
+    np.testing.assert_allclose(
+        whitening(image), (image - image.mean()) / image.std(), atol=1e-5
+    )
+    assert min_max(image) == (image.min(), image.max())
+
+    out = image.astype(np.float32)
+    assert normalise_zero_one(out, out=out) is out
+    np.testing.assert_allclose(out, zero_one, atol=1e-6)
+
+    np.testing.assert_allclose(
+        percentiles(image, [0.5, 50, 99.5]), np.percentile(image, [0.5, 50, 99.5])
+    )
+    np.testing.assert_array_equal(
+        clip_outliers(image),
+        np.clip(image, np.percentile(image, 0.5), np.percentile(image, 99.5)),
+    )
+
+
+def test_mean_std_large_offset():
+    # raw values with a large offset and a small spread cancel catastrophically with E[x^2] - mean^2
+    image = 1e8 + np.random.default_rng(0).random(3 * (1 << 18) + 5)
+    mean, std = mean_std(image)
+    np.testing.assert_allclose(mean, image.mean(), rtol=1e-12)
+    np.testing.assert_allclose(std, image.std(), rtol=1e-6)
+
+    n, mean, m2 = merge_moments(moments(image[:1000]), moments(image[1000:]))
+    assert n == image.size
+    np.testing.assert_allclose(m2 / n, image.var(), rtol=1e-6)
+
+
+def test_sitk_resample():
+    image = sitk.GetImageFromArray(np.random.rand(20, 30, 40).astype(np.float32))
+    image.SetSpacing((0.5, 0.5, 2.0))
+    image.SetOrigin((1.0, 2.0, 3.0))
+
+    resampled = sitk_resample(image, [0.8, 0.8, 3])
+    assert resampled.GetSpacing() == (0.8, 0.8, 3.0)
+    assert resampled.GetSize() == (25, 19, 13)
+    assert resampled.GetOrigin() == image.GetOrigin()
+
+    resampled = sitk_resample(image, size=(10, 10, 10), num_threads=1)
+    assert resampled.GetSize() == (10, 10, 10)
+    assert resampled.GetSpacing() == (2.0, 1.5, 4.0)
+
+
+def test_sitk_resample_labelmap():
+    labelmap = np.zeros((30, 40, 40), dtype=np.uint8)
+    labelmap[5:20, 10:30, 10:25] = 1
+    labelmap[10:28, 5:15, 20:38] = 2
+    image = sitk.GetImageFromArray(labelmap)
+    image.SetSpacing((0.7, 0.7, 2.5))
+    image.SetOrigin((1.0, -2.0, 3.0))
+
+    for mode in ["linear", "gaussian"]:
+        expected = sitk_resample_labelmap(image, 1.5, mode=mode, slab_size=None)
+        result = sitk_resample_labelmap(
+            image, 1.5, mode=mode, slab_size=8, num_workers=2
+        )
+        assert result.GetSpacing() == expected.GetSpacing()
+        assert result.GetOrigin() == expected.GetOrigin()
+        np.testing.assert_array_equal(
+            sitk.GetArrayFromImage(result), sitk.GetArrayFromImage(expected)
+        )
+        assert set(np.unique(sitk.GetArrayFromImage(result))) == {0, 1, 2}
+        # default number of threads
+        np.testing.assert_array_equal(
+            sitk.GetArrayFromImage(sitk_resample_labelmap(image, 1.5, mode=mode, slab_size=8)),
+            sitk.GetArrayFromImage(expected),
+        )
+
+
+def test_sitk_resample_to_file(tmp_path):
+    image = sitk.GetImageFromArray((np.random.rand(30, 20, 24) * 1000).astype(np.int16))
+    image.SetSpacing((0.71, 0.71, 2.5))
+    image.SetOrigin((-180.3, -170.6, -420.25))
+    input_path = str(tmp_path / "image.nii.gz")
+    sitk.WriteImage(image, input_path)
+    image = sitk.ReadImage(input_path)
+
+    for interpolation in [sitk.sitkLinear, sitk.sitkNearestNeighbor]:
+        output_path = str(tmp_path / "resampled.nii.gz")
+        sitk_resample_to_file(
+            input_path,
+            output_path,
+            [0.8, 0.8, 1.25],
+            interpolation=interpolation,
+            slab_size=8,
+        )
+        expected = sitk_resample(image, [0.8, 0.8, 1.25], interpolation=interpolation)
+        result = sitk.ReadImage(output_path)
+        assert result.GetSize() == expected.GetSize()
+        np.testing.assert_allclose(result.GetSpacing(), expected.GetSpacing())
+        np.testing.assert_allclose(result.GetOrigin(), expected.GetOrigin(), atol=1e-4)
+        np.testing.assert_array_equal(
+            sitk.GetArrayFromImage(result), sitk.GetArrayFromImage(expected)
+        )
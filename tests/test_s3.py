@@ -0,0 +1,61 @@
+import asyncio
+from pathlib import Path
+
+import boto3
+from midatasets.MIReader import S3Object
+from moto import mock_s3
+
+
+@mock_s3
+def test_s3_object_async(tmpdir):
+    s3 = boto3.client("s3", region_name="us-east-1")
+    s3.create_bucket(Bucket="mybucket")
+    for i in range(20):
+        s3.put_object(Bucket="mybucket", Key=f"datasets/foo/images/native/img_{i}.nii.gz", Body=f"{i}")
+
+    objects = [
+        S3Object(bucket="mybucket", prefix=f"datasets/foo/images/native/img_{i}.nii.gz", base_dir=str(tmpdir))
+        for i in range(20)
+    ]
+
+    async def run():
+        assert all(await asyncio.gather(*[o.aexists_remote() for o in objects]))
+        await asyncio.gather(*[o.adownload() for o in objects])
+
+        new = S3Object(bucket="mybucket", prefix="datasets/foo/images/native/new.nii.gz", base_dir=str(tmpdir))
+        assert not await new.aexists_remote()
+        Path(new.local_path).write_text("new")
+        await new.aupload()
+        assert await new.aexists_remote()
+
+    asyncio.run(run())
+    assert all(o.exists_local() for o in objects)
+
+
+def test_s3_client_alias():
+    from midatasets import s3
+    from midatasets.s3 import s3_client
+
+    assert s3_client is s3.get_s3_client()
+    assert s3.s3_client is s3_client
+
+
+def test_s3_client_created_once(monkeypatch):
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    from midatasets import s3
+
+    created = []
+    client = boto3.client
+
+    def slow_client(*args, **kwargs):
+        created.append(1)
+        time.sleep(0.05)
+        return client(*args, **kwargs)
+
+    monkeypatch.setattr(s3, "_s3_client", None)
+    monkeypatch.setattr(s3.boto3, "client", slow_client)
+    with ThreadPoolExecutor(8) as executor:
+        clients = list(executor.map(lambda _: s3.get_s3_client(), range(8)))
+    assert len(created) == 1 and all(c is clients[0] for c in clients)
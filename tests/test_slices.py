@@ -0,0 +1,26 @@
+import numpy as np
+
+from midatasets.slices import SliceStore, write_case_slices, write_index
+
+
+def test_slice_store(tmp_path):
+    cases = {
+        "a": [np.full((4, 5), i) for i in range(3)],
+        "b": [],
+        "c": [np.full((6, 7), 10 + i) for i in range(2)],
+    }
+    counts = {}
+    for name, images in cases.items():
+        counts[name] = write_case_slices(
+            tmp_path, name, images, [image > 0 for image in images]
+        )
+    write_index(tmp_path, counts)
+
+    store = SliceStore(tmp_path)
+    assert len(store) == 5
+    assert store[1][0][0, 0] == 1
+    image, labelmap = store[3]
+    assert image.shape == (6, 7) and image[0, 0] == 10
+    assert labelmap.dtype == bool
+    assert [int(im[0, 0]) for im in store["images"]] == [0, 1, 2, 10, 11]
+    assert store[-1][0][0, 0] == 11